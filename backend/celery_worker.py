@@ -1,14 +1,26 @@
 """
 Celery Worker
-Run with: celery -A celery_worker worker --loglevel=info
+Run with: python celery_worker.py --profile <conversion|llm|all>
+(or directly: celery -A celery_worker worker -Q interactive,bulk,conversion --loglevel=info)
+
+Profiles:
+    conversion  Prefork pool, low concurrency, memory-capped: Docling conversion
+                is CPU- and memory-heavy and each process keeps its own models.
+    llm         Thread pool, high concurrency: LLM tasks mostly wait on the
+                network and share one event loop and HTTP pool per process.
+    all         Every queue in one prefork pool, for local development.
 """
 
-from services.queue import celery_app
+import argparse
+
+from config import config
+from services.queue import celery_app, BULK_QUEUE, CONVERSION_QUEUE, INTERACTIVE_QUEUE, QUEUES
 
 # Import tasks to register them
 from services.queue import (
     process_book_upload,
     adapt_chapter,
+    finalize_book,
     extract_vocabulary,
     test_task,
     generate_concept_card_task,
@@ -17,5 +29,71 @@ from services.queue import (
     generate_story_task,
 )
 
+WORKER_PROFILES = {
+    'conversion': {
+        'queues': [CONVERSION_QUEUE],
+        'pool': 'prefork',
+        'concurrency': config.CONVERSION_WORKER_CONCURRENCY,
+        'max_memory_mb': config.CONVERSION_WORKER_MAX_MEMORY_MB,
+    },
+    'llm': {
+        'queues': [INTERACTIVE_QUEUE, BULK_QUEUE],
+        'pool': 'threads',
+        'concurrency': config.LLM_WORKER_CONCURRENCY,
+        'max_memory_mb': 0,  # Only enforced for prefork pools
+    },
+    'all': {
+        'queues': list(QUEUES),
+        'pool': 'prefork',
+        'concurrency': None,  # Celery default: number of CPUs
+        'max_memory_mb': config.WORKER_MAX_MEMORY_MB,
+    },
+}
+
+
+def worker_argv(profile: str, queues: list = None, concurrency: int = None) -> list:
+    """
+    Build the celery worker command line for a profile
+    
+    Args:
+        profile: Profile name from WORKER_PROFILES
+        queues: Override the profile's queues (e.g. one worker per queue)
+        concurrency: Override the profile's concurrency
+        
+    Returns:
+        Arguments for celery_app.worker_main
+    """
+    if profile not in WORKER_PROFILES:
+        raise ValueError(f"Unknown worker profile: {profile}")
+    settings = WORKER_PROFILES[profile]
+    queues = queues or settings['queues']
+    concurrency = concurrency or settings['concurrency']
+    
+    argv = [
+        'worker',
+        '--loglevel=info',
+        f"--pool={settings['pool']}",
+        f"--queues={','.join(queues)}",
+        f"--hostname={'-'.join(queues)}@%h",
+    ]
+    if concurrency:
+        argv.append(f"--concurrency={concurrency}")
+    if settings['max_memory_mb']:
+        argv.append(f"--max-memory-per-child={settings['max_memory_mb'] * 1024}")
+    return argv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start a Celery worker with a deployment profile")
+    parser.add_argument("--profile", default=config.WORKER_PROFILE, choices=sorted(WORKER_PROFILES))
+    parser.add_argument("--queues", help="Comma-separated queues (overrides the profile)")
+    parser.add_argument("--concurrency", type=int, help="Pool size (overrides the profile)")
+    
+    args, extra = parser.parse_known_args()
+    queues = args.queues.split(',') if args.queues else None
+    
+    celery_app.worker_main(worker_argv(args.profile, queues, args.concurrency) + extra)
+
+
 if __name__ == '__main__':
-    celery_app.start()
+    main()
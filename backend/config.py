@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -22,6 +23,36 @@ class Config:
     
     # Ollama
     OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    # Context window requested from Ollama (its own default silently truncates long prompts)
+    OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", 8192))
+    
+    # Context window assumed for models LiteLLM has no metadata for
+    LLM_DEFAULT_CONTEXT_WINDOW = int(os.getenv("LLM_DEFAULT_CONTEXT_WINDOW", 8192))
+    
+    # Pooled HTTP client shared by LLM calls on a worker's event loop
+    LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 64))
+    LLM_HTTP_TIMEOUT_SECONDS = float(os.getenv("LLM_HTTP_TIMEOUT_SECONDS", 600))
+    
+    # Cluster-wide LLM admission control, per inference backend (see services/admission.py)
+    LLM_ADMISSION_ENABLED = os.getenv("LLM_ADMISSION_ENABLED", "True").lower() == "true"
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))  # Hard cap on concurrent generations
+    LLM_INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", 4))  # Starting point for the adaptive limit
+    LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", 1))
+    LLM_TOKENS_PER_SECOND = float(os.getenv("LLM_TOKENS_PER_SECOND", 0))  # 0 disables the token bucket
+    LLM_TOKEN_BURST_SECONDS = float(os.getenv("LLM_TOKEN_BURST_SECONDS", 10))  # Bucket size, in seconds of tokens
+    # Per-backend overrides, e.g. {"ollama": {"max_concurrency": 8, "tokens_per_second": 2000}}
+    LLM_BACKEND_LIMITS = json.loads(os.getenv("LLM_BACKEND_LIMITS", "{}"))
+    # Fair queueing between users: weight per plan, e.g. {"free": 1, "pro": 4}
+    LLM_PLAN_WEIGHTS = json.loads(os.getenv("LLM_PLAN_WEIGHTS", '{"free": 1}'))
+    LLM_DEFAULT_PLAN = os.getenv("LLM_DEFAULT_PLAN", "free")
+    LLM_SHARED_WEIGHT = float(os.getenv("LLM_SHARED_WEIGHT", 4))  # Calls not made for a known user share one flow
+    LLM_BATCH_WEIGHT = float(os.getenv("LLM_BATCH_WEIGHT", 0.5))  # All batch jobs share one low-weight flow
+    ADMISSION_TARGET_SECONDS_PER_TOKEN = float(os.getenv("ADMISSION_TARGET_SECONDS_PER_TOKEN", 0.1))  # Slower means overloaded
+    ADMISSION_DECREASE_FACTOR = float(os.getenv("ADMISSION_DECREASE_FACTOR", 0.7))
+    ADMISSION_DECREASE_INTERVAL_SECONDS = float(os.getenv("ADMISSION_DECREASE_INTERVAL_SECONDS", 5))
+    ADMISSION_DEFAULT_OUTPUT_TOKENS = int(os.getenv("ADMISSION_DEFAULT_OUTPUT_TOKENS", 512))  # Assumed when max_tokens is unset
+    ADMISSION_POLL_SECONDS = float(os.getenv("ADMISSION_POLL_SECONDS", 0.2))
+    ADMISSION_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_TIMEOUT_SECONDS", 300))
     
     # OpenAI (optional)
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
@@ -36,14 +67,74 @@ class Config:
     MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 50 * 1024 * 1024))  # 50MB default
     ALLOWED_EXTENSIONS = {"pdf", "epub"}
     UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
+    # Resumable uploads with no writes for this long are deleted
+    RESUMABLE_UPLOAD_TTL_SECONDS = int(os.getenv("RESUMABLE_UPLOAD_TTL_SECONDS", 86400))
     
     # Celery / Redis
     REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL)
     CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", REDIS_URL)
+    PROGRESS_TTL_SECONDS = int(os.getenv("PROGRESS_TTL_SECONDS", 86400))  # Book progress snapshots in Redis
+    CANCEL_POLL_SECONDS = float(os.getenv("CANCEL_POLL_SECONDS", 5))  # How often a running LLM call checks for cancel
+    # Unacknowledged (late-acked) book tasks are redelivered after this long
+    TASK_VISIBILITY_TIMEOUT_SECONDS = int(os.getenv("TASK_VISIBILITY_TIMEOUT_SECONDS", 6 * 3600))
+    # Task results: "compact" (msgpack, compressed when large) or "json"
+    RESULT_SERIALIZER = os.getenv("RESULT_SERIALIZER", "compact")
+    RESULT_EXPIRES_SECONDS = int(os.getenv("RESULT_EXPIRES_SECONDS", 3600))
+    RESULT_COMPRESS_THRESHOLD_BYTES = int(os.getenv("RESULT_COMPRESS_THRESHOLD_BYTES", 1024))
+    RESULT_COMPRESS_LEVEL = int(os.getenv("RESULT_COMPRESS_LEVEL", 6))
+    # Identical generation requests reuse the same job (and its result) for this long
+    JOB_DEDUP_TTL_SECONDS = int(os.getenv("JOB_DEDUP_TTL_SECONDS", 600))
+    # Retries of LLM tasks on transient errors (exponential backoff with jitter)
+    TASK_MAX_RETRIES = int(os.getenv("TASK_MAX_RETRIES", 3))
+    TASK_RETRY_BASE_DELAY_SECONDS = float(os.getenv("TASK_RETRY_BASE_DELAY_SECONDS", 5))
+    TASK_RETRY_MAX_DELAY_SECONDS = float(os.getenv("TASK_RETRY_MAX_DELAY_SECONDS", 120))
+    DLQ_TTL_SECONDS = int(os.getenv("DLQ_TTL_SECONDS", 7 * 86400))  # Dead-lettered tasks are kept this long
+    # Batch generation jobs (/api/jobs/batch)
+    BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", 500))
+    BATCH_TTL_SECONDS = int(os.getenv("BATCH_TTL_SECONDS", 86400))
+    BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", 1))
+    # Vocabulary extraction: words per deck (all glossed in one LLM call),
+    # processes counting chapters (one pool per worker, 0 = one per CPU), shortest word kept
+    VOCAB_DECK_SIZE = int(os.getenv("VOCAB_DECK_SIZE", 50))
+    VOCAB_PROCESSES = int(os.getenv("VOCAB_PROCESSES", 0))
+    VOCAB_MIN_WORD_LENGTH = int(os.getenv("VOCAB_MIN_WORD_LENGTH", 3))
+    # Firestore bulk writes (scripts and pipelines): pacing, retries per batch, max buffering time
+    FIRESTORE_BULK_WRITES_PER_SECOND = float(os.getenv("FIRESTORE_BULK_WRITES_PER_SECOND", 500))
+    FIRESTORE_BULK_MAX_RETRIES = int(os.getenv("FIRESTORE_BULK_MAX_RETRIES", 5))
+    FIRESTORE_BULK_FLUSH_SECONDS = float(os.getenv("FIRESTORE_BULK_FLUSH_SECONDS", 10))
+    # Verified Firebase ID tokens kept in memory until their exp (capped at max seconds),
+    # and how often Google's signing keys are refreshed in the background (0 = never)
+    TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", 10000))
+    TOKEN_CACHE_MAX_SECONDS = int(os.getenv("TOKEN_CACHE_MAX_SECONDS", 3600))
+    FIREBASE_KEY_REFRESH_SECONDS = int(os.getenv("FIREBASE_KEY_REFRESH_SECONDS", 3600))
+    # Queue depth, wait/run time histograms and outcome counts in Redis (served at /metrics)
+    TASK_METRICS_ENABLED = os.getenv("TASK_METRICS_ENABLED", "True").lower() == "true"
+    # Maximum chapters of one book adapted concurrently
+    BOOK_ADAPT_PARALLELISM = int(os.getenv("BOOK_ADAPT_PARALLELISM", 4))
+    # Defer bulk chapter adaptation while interactive tasks are queued
+    PREEMPT_BULK_FOR_INTERACTIVE = os.getenv("PREEMPT_BULK_FOR_INTERACTIVE", "True").lower() == "true"
+    PREEMPT_DEFER_SECONDS = int(os.getenv("PREEMPT_DEFER_SECONDS", 15))
+    PREEMPT_MAX_DEFERRALS = int(os.getenv("PREEMPT_MAX_DEFERRALS", 40))  # Then run anyway, so books never starve
+    # Worker profile started by `python celery_worker.py` (conversion, llm or all)
+    WORKER_PROFILE = os.getenv("WORKER_PROFILE", "all")
+    LLM_WORKER_CONCURRENCY = int(os.getenv("LLM_WORKER_CONCURRENCY", 32))  # Threads waiting on the LLM
+    CONVERSION_WORKER_CONCURRENCY = int(os.getenv("CONVERSION_WORKER_CONCURRENCY", 1))  # Processes, each with its own models
+    CONVERSION_WORKER_MAX_MEMORY_MB = int(os.getenv("CONVERSION_WORKER_MAX_MEMORY_MB", 3072))  # 0 disables
     
     # Document Processing
     CHUNK_TARGET_WORDS = int(os.getenv("CHUNK_TARGET_WORDS", 1500))
+    # Size chunks for adaptation by the model's token budget instead of word count
+    CHUNK_BY_TOKENS = os.getenv("CHUNK_BY_TOKENS", "True").lower() == "true"
+    CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 4096))  # Upper bound even for huge context windows
+    ADAPT_OUTPUT_RATIO = float(os.getenv("ADAPT_OUTPUT_RATIO", 1.2))  # Expected output tokens per input token
+    ADAPT_OUTPUT_OVERHEAD_TOKENS = int(os.getenv("ADAPT_OUTPUT_OVERHEAD_TOKENS", 512))  # JSON fields and reasoning
+    CONVERSION_CACHE_ENABLED = os.getenv("CONVERSION_CACHE_ENABLED", "True").lower() == "true"
+    CONVERSION_CACHE_DIR = os.getenv("CONVERSION_CACHE_DIR", "./cache/conversions")
+    PRELOAD_DOCUMENT_CONVERTER = os.getenv("PRELOAD_DOCUMENT_CONVERTER", "True").lower() == "true"
+    CONVERTER_MAX_DOCUMENTS = int(os.getenv("CONVERTER_MAX_DOCUMENTS", 50))  # 0 disables
+    CONVERTER_MAX_RSS_GROWTH_MB = int(os.getenv("CONVERTER_MAX_RSS_GROWTH_MB", 2048))  # 0 disables
+    WORKER_MAX_MEMORY_MB = int(os.getenv("WORKER_MAX_MEMORY_MB", 0))  # 0 disables
     
     # News
     NEWS_CACHE_TTL = int(os.getenv("NEWS_CACHE_TTL", 3600))  # 1 hour
@@ -1,13 +1,17 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 import os
 
 from config import config
+from services.firebase_service import start_key_refresh, stop_key_refresh
+from services.queue import collect_queue_metrics
+from services.redis_client import close_async_redis
+from services.task_metrics import render_prometheus
 
 # Import routes
-from routes import stories, news, chat, books, grammar
+from routes import stories, news, chat, books, grammar, jobs
 
 app = FastAPI(
     title="Vibe Language Learning API",
@@ -25,6 +29,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def start_background_refresh():
+    # Keep Firebase signing keys fresh so token verification never fetches them inline
+    start_key_refresh()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    stop_key_refresh()
+    await close_async_redis()
+
 # Health check endpoint
 @app.get("/")
 async def root():
@@ -41,6 +55,14 @@ async def health_check():
         }
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Celery queue and task metrics in the Prometheus text format"""
+    try:
+        return render_prometheus(collect_queue_metrics())
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Metrics unavailable: {str(e)}")
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -55,6 +77,7 @@ app.include_router(news.router, prefix="/api/news", tags=["news"])
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
 app.include_router(books.router, prefix="/api/books", tags=["books"])
 app.include_router(grammar.router, prefix="/api/grammar", tags=["grammar"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
 
 if __name__ == "__main__":
     # Create upload directory if it doesn't exist
@@ -3,24 +3,76 @@ Books API routes
 Handles book upload and processing
 """
 
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from celery import uuid as celery_uuid
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional
-import os
 import uuid
 
-from config import config
-from services.queue import process_book_upload, get_task_status
+from services import book_store
+from services.book_jobs import cancel_job, get_job, register_job, remove_upload
+from services.firebase_service import get_async_firestore_client
+from services.progress import get_progress, report_progress, stream_progress
+from services.queue import process_book_upload
+from services.uploads import (
+    ResumableUploadStore, UploadInProgress, UploadOffsetMismatch, UploadTooLarge, save_upload
+)
 
 router = APIRouter()
 
 
-class BookProcessingStatus(BaseModel):
-    book_id: str
-    status: str
-    current_chapter: Optional[int] = None
-    total_chapters: Optional[int] = None
-    progress: float = 0
+async def _queue_book(
+    file_path: str,
+    content_hash: str,
+    user_id: str,
+    level: str,
+    should_adapt: bool,
+    model: Optional[str],
+    target_language: str
+) -> dict:
+    """Queue a stored upload for background processing"""
+    # Generate book ID
+    book_id = str(uuid.uuid4())
+    
+    # Registered before publishing so /cancel can find the task as soon as it exists
+    task_id = celery_uuid()
+    
+    def enqueue():
+        # Redis writes and the broker publish block, so they run in the threadpool
+        report_progress(book_id, 'queued', user_id=user_id)
+        register_job(book_id, user_id, file_path, [task_id])
+        
+        # Queue for processing
+        return process_book_upload.apply_async(
+            kwargs=dict(
+                user_id=user_id,
+                book_id=book_id,
+                file_path=file_path,
+                level=level,
+                should_adapt=should_adapt,
+                content_hash=content_hash,
+                model=model or None,
+                target_language=target_language
+            ),
+            task_id=task_id
+        )
+    
+    task = await run_in_threadpool(enqueue)
+    
+    return {
+        "book_id": book_id,
+        "task_id": task.id,
+        "content_hash": content_hash,
+        "status": "queued",
+        "message": "Book uploaded successfully and queued for processing"
+    }
+
+
+def _validate_filename(filename: str):
+    if not filename or not filename.lower().endswith(('.pdf', '.epub')):
+        raise HTTPException(status_code=400, detail="Only PDF and EPUB files are supported")
 
 
 @router.post("/upload")
@@ -36,82 +88,145 @@ async def upload_book(
     """
     Upload a book for processing
     
-    Note: This is a placeholder implementation.
-    In production, this would:
-    1. Validate the file
-    2. Save to storage
-    3. Queue for background processing
-    4. Return job ID for status polling
+    The file is streamed to disk in a single pass (size limit and content
+    hash computed on the way) and queued for background processing.
+    For large files on slow links, use the resumable /uploads endpoints.
     """
     try:
         # Validate file type
-        if not file.filename.endswith(('.pdf', '.epub')):
-            raise HTTPException(status_code=400, detail="Only PDF and EPUB files are supported")
-        
-        # Check file size
-        file_size = 0
-        chunk_size = 1024 * 1024  # 1MB
-        while chunk := await file.read(chunk_size):
-            file_size += len(chunk)
-            if file_size > config.MAX_UPLOAD_SIZE:
-                raise HTTPException(status_code=413, detail="File too large")
-        
-        # Reset file pointer
-        await file.seek(0)
-        
-        # Generate unique filename
-        file_ext = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
-        file_path = os.path.join(config.UPLOAD_DIR, unique_filename)
-        
-        # Save file
-        os.makedirs(config.UPLOAD_DIR, exist_ok=True)
-        with open(file_path, "wb") as f:
-            while chunk := await file.read(chunk_size):
-                f.write(chunk)
-        
-        # Generate book ID
-        book_id = str(uuid.uuid4())
+        _validate_filename(file.filename)
         
-        # Queue for processing
-        task = process_book_upload.delay(
-            user_id=user_id,
-            book_id=book_id,
-            file_path=file_path,
-            level=level,
-            should_adapt=should_adapt
-        )
+        try:
+            file_path, content_hash, _ = await save_upload(file)
+        except UploadTooLarge:
+            raise HTTPException(status_code=413, detail="File too large")
         
-        return {
-            "book_id": book_id,
-            "task_id": task.id,
-            "status": "queued",
-            "message": "Book uploaded successfully and queued for processing"
-        }
+        return await _queue_book(file_path, content_hash, user_id, level, should_adapt, model, target_language)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Resumable uploads
+
+resumable_uploads = ResumableUploadStore()
+
+
+class CreateUploadRequest(BaseModel):
+    filename: str
+    size: int
+
+
+@router.post("/uploads")
+async def create_resumable_upload(request: CreateUploadRequest):
+    """
+    Start a resumable upload
+    
+    Send the file with PATCH /uploads/{upload_id} (raw bytes, Upload-Offset
+    header) in as many requests as needed, then POST .../complete.
+    """
+    _validate_filename(request.filename)
+    try:
+        return await run_in_threadpool(resumable_uploads.create, request.filename, request.size)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail="File too large")
+
+
+@router.get("/uploads/{upload_id}")
+async def get_resumable_upload(upload_id: str):
+    """Get the current offset of a resumable upload (to resume after a dropped connection)"""
+    upload = await run_in_threadpool(resumable_uploads.get, upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+
+@router.patch("/uploads/{upload_id}")
+async def append_resumable_upload(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset")
+):
+    """Append raw bytes to a resumable upload at Upload-Offset"""
+    try:
+        offset = await resumable_uploads.append(upload_id, upload_offset, request.stream())
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=409, detail=f"Offset mismatch, resume from {e.expected}")
+    except UploadInProgress:
+        raise HTTPException(status_code=409, detail="Another request is writing to this upload")
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    return {"upload_id": upload_id, "offset": offset}
+
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_resumable_upload(
+    upload_id: str,
+    title: str = Form(...),
+    level: str = Form(...),
+    should_adapt: bool = Form(True),
+    model: Optional[str] = Form(None),
+    target_language: str = Form("German"),
+    user_id: str = Form(...)  # TODO: Get from auth token
+):
+    """Finish a resumable upload and queue the book for processing"""
+    try:
+        file_path, content_hash, _ = await resumable_uploads.complete(upload_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=409, detail=f"Upload incomplete, resume from {e.expected}")
+    except UploadInProgress:
+        raise HTTPException(status_code=409, detail="Another request is writing to this upload")
+    
+    return await _queue_book(file_path, content_hash, user_id, level, should_adapt, model, target_language)
+
+
 @router.get("/{book_id}/status")
 async def get_processing_status(book_id: str):
     """
     Get book processing status
     
-    Note: This is a placeholder. In production, this would:
-    1. Check Celery task status
-    2. Check Firestore for current processing chapter
-    3. Return detailed progress
+    Returns the latest progress event: phase, pages, chapters adapted,
+    overall progress and ETA. Use /events to have updates pushed instead.
     """
-    # TODO: Implement actual status checking
-    return {
-        "book_id": book_id,
-        "status": "processing",
-        "current_chapter": 1,
-        "total_chapters": 10,
-        "progress": 10.0,
-        "message": "Processing in progress"
-    }
+    try:
+        status = await get_progress(book_id)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Progress store unavailable: {str(e)}")
+    
+    if status is None:
+        raise HTTPException(status_code=404, detail="No processing status for this book")
+    return {"book_id": book_id, **status}
+
+
+@router.get("/{book_id}/events")
+async def stream_processing_status(book_id: str):
+    """
+    Stream book processing progress as Server-Sent Events
+    
+    Sends the current status, then an event on every change, and closes
+    once the book is ready, failed or cancelled.
+    """
+    try:
+        known = await get_progress(book_id) is not None or await run_in_threadpool(get_job, book_id) is not None
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Progress store unavailable: {str(e)}")
+    
+    # An unknown book would never publish an event, so the stream would never end
+    if not known:
+        raise HTTPException(status_code=404, detail="No processing status for this book")
+    
+    return StreamingResponse(
+        stream_progress(book_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.post("/{book_id}/cancel")
@@ -119,14 +234,30 @@ async def cancel_processing(book_id: str):
     """
     Cancel book processing
     
-    Note: This is a placeholder. In production, this would:
-    1. Revoke Celery task
-    2. Update Firestore status
-    3. Clean up temporary files
+    Revokes queued tasks, flags running ones to stop at their next step
+    (conversion steps, chapters and in-flight LLM calls check the flag),
+    marks the book as cancelled and deletes the uploaded file.
     """
-    # TODO: Implement actual cancellation
+    job = await run_in_threadpool(cancel_job, book_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No processing job for this book")
+    
+    db = get_async_firestore_client()
+    if db is not None:
+        await book_store.book_ref(db, job["user_id"], book_id).set({
+            "status": "cancelled",
+            "currentProcessingChapter": None,
+        }, merge=True)
+    
+    def finish_cancel():
+        report_progress(book_id, "cancelled")
+        remove_upload(job.get("file_path"))
+    
+    await run_in_threadpool(finish_cancel)
+    
     return {
         "book_id": book_id,
         "status": "cancelled",
+        "revoked_tasks": len(job["task_ids"]),
         "message": "Processing cancelled successfully"
     }
@@ -4,6 +4,7 @@ Handles grammar explanations and exercises
 """
 
 from fastapi import APIRouter, HTTPException
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional
 from services.llm import LLMService
@@ -54,6 +55,7 @@ from services.queue import (
     generate_context_card_task,
     get_task_status
 )
+from services.jobs import submit_job
 
 class JobResponse(BaseModel):
     job_id: str
@@ -63,46 +65,56 @@ class JobResponse(BaseModel):
 async def generate_concept_card(request: ConceptCardRequest):
     """
     Generate a grammar concept card (Async)
+    
+    Identical requests share one job (see services/jobs.py)
     """
-    task = generate_concept_card_task.delay(
+    job_id, _ = await run_in_threadpool(
+        submit_job,
+        generate_concept_card_task,
         topic=request.topic,
         level=request.level,
         model=request.model,
         target_language=request.target_language
     )
-    return {"job_id": task.id, "status": "pending"}
+    return {"job_id": job_id, "status": "pending"}
 
 @router.post("/exercises", response_model=JobResponse)
 async def generate_exercises(request: ExerciseRequest):
     """
     Generate grammar exercises (Async)
     """
-    task = generate_exercises_task.delay(
+    job_id, _ = await run_in_threadpool(
+        submit_job,
+        generate_exercises_task,
         topic=request.topic,
         level=request.level,
         model=request.model,
         target_language=request.target_language
     )
-    return {"job_id": task.id, "status": "pending"}
+    return {"job_id": job_id, "status": "pending"}
 
 @router.post("/context", response_model=JobResponse)
 async def generate_context_card(request: ContextCardRequest):
     """
     Generate a context card (Async)
     """
-    task = generate_context_card_task.delay(
+    job_id, _ = await run_in_threadpool(
+        submit_job,
+        generate_context_card_task,
         topic=request.topic,
         level=request.level,
         model=request.model,
         target_language=request.target_language
     )
-    return {"job_id": task.id, "status": "pending"}
+    return {"job_id": job_id, "status": "pending"}
 
 @router.get("/status/{job_id}")
-async def get_status(job_id: str):
+async def get_status(job_id: str, consume: bool = False):
     """
     Get status of a background job
+    
+    With consume=true a finished result is deleted once returned
     """
-    return get_task_status(job_id)
+    return await run_in_threadpool(get_task_status, job_id, consume=consume)
 
 
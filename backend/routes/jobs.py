@@ -0,0 +1,119 @@
+"""
+Jobs API routes
+Submits batches of generation jobs, and inspects and requeues background
+tasks that failed for good (dead-letter queue)
+"""
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+from config import config
+from services.batch_jobs import batch_status, stream_batch, submit_batch
+from services.book_jobs import BookCancelled
+from services.retries import discard_dead_letter, get_dead_letter, list_dead_letters, requeue_dead_letter
+
+router = APIRouter()
+
+
+@router.get("/dead-letters")
+async def get_dead_letters(limit: int = 50):
+    """List dead-lettered tasks, most recent first"""
+    try:
+        entries = await run_in_threadpool(list_dead_letters, max(1, min(limit, 500)))
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Dead-letter queue unavailable: {str(e)}")
+    return {"count": len(entries), "tasks": entries}
+
+
+@router.get("/dead-letters/{task_id}")
+async def get_dead_letter_task(task_id: str):
+    """Get a dead-lettered task with its arguments and error"""
+    entry = await run_in_threadpool(get_dead_letter, task_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Task not in dead-letter queue")
+    return entry
+
+
+@router.post("/dead-letters/{task_id}/requeue")
+async def requeue_dead_letter_task(task_id: str):
+    """
+    Submit a dead-lettered task again with its original arguments
+    
+    A chapter is re-run inside its book, which is finalized again afterwards.
+    """
+    try:
+        new_task_id = await run_in_threadpool(requeue_dead_letter, task_id)
+    except BookCancelled:
+        raise HTTPException(status_code=409, detail="The book of this chapter was cancelled")
+    if new_task_id is None:
+        raise HTTPException(status_code=404, detail="Task not in dead-letter queue")
+    return {"task_id": task_id, "job_id": new_task_id, "status": "pending"}
+
+
+@router.delete("/dead-letters/{task_id}")
+async def discard_dead_letter_task(task_id: str):
+    """Remove a task from the dead-letter queue without running it"""
+    if not await run_in_threadpool(discard_dead_letter, task_id):
+        raise HTTPException(status_code=404, detail="Task not in dead-letter queue")
+    return {"task_id": task_id, "status": "discarded"}
+
+
+class JobSpec(BaseModel):
+    type: Literal['story', 'concept', 'exercises', 'context']
+    topic: str
+    level: str
+    length: str = "Medium"  # Stories only
+    theme: str = ""  # Stories only
+    model: Optional[str] = None
+    target_language: str = "German"
+
+
+class BatchRequest(BaseModel):
+    jobs: List[JobSpec]
+
+
+@router.post("/batch")
+async def submit_batch_jobs(request: BatchRequest):
+    """
+    Queue many generation jobs at once (Async)
+
+    Returns one group id; poll /batch/{group_id} or stream
+    /batch/{group_id}/events for progress and results.
+    """
+    if not request.jobs:
+        raise HTTPException(status_code=400, detail="No jobs given")
+    if len(request.jobs) > config.BATCH_MAX_JOBS:
+        raise HTTPException(status_code=400, detail=f"At most {config.BATCH_MAX_JOBS} jobs per batch")
+    specs = [job.model_dump() for job in request.jobs]
+    try:
+        batch = await run_in_threadpool(submit_batch, specs)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Failed to queue batch: {str(e)}")
+    return {**batch, "status": "pending"}
+
+
+@router.get("/batch/{group_id}")
+async def get_batch_status(group_id: str, include_results: bool = False):
+    """Get aggregate progress of a batch and the status of each job"""
+    status = await run_in_threadpool(batch_status, group_id, include_results)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return status
+
+
+@router.get("/batch/{group_id}/events")
+async def stream_batch_events(group_id: str):
+    """
+    Stream a batch as Server-Sent Events
+
+    Sends each job's result as it finishes along with aggregate progress,
+    and closes once every job is done.
+    """
+    return StreamingResponse(
+        stream_batch(group_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -3,6 +3,7 @@ Stories API routes
 """
 
 from fastapi import APIRouter, HTTPException
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional
 from services.llm import LLMService
@@ -65,9 +66,9 @@ async def generate_story_async(request: GenerateStoryRequest):
 
 
 @router.get("/status/{job_id}")
-async def get_status(job_id: str):
-    """Get status of a background job"""
-    return get_task_status(job_id)
+async def get_status(job_id: str, consume: bool = False):
+    """Get status of a background job (consume=true deletes a finished result once returned)"""
+    return await run_in_threadpool(get_task_status, job_id, consume=consume)
 
 
 @router.post("/generate")
@@ -0,0 +1,198 @@
+"""
+Autoscale Controller
+Recommends worker counts per Celery queue from the task metrics in Redis
+
+Every interval it compares two metric snapshots (see services/task_metrics.py):
+    demand  = arrival rate x mean run time        (busy slots, Little's law)
+            + depth x mean run time / DRAIN        (slots to clear the backlog)
+    desired = demand / (slots per worker x target utilization)
+
+Slots per worker are read from the running workers (pool max-concurrency).
+Run time on the LLM queues includes the wait for admission, so past the
+admission limit (LLM_MAX_CONCURRENCY, per backend) more workers only add
+waiting threads; recommendations for those queues are capped there. The
+controller scales up when p95 wait time is over target, scales down only after the
+recommendation stayed lower for several intervals. Recommendations are
+printed as JSON lines, for a deploy hook, HPA external metric or a human.
+
+Usage:
+    python scripts/autoscale_controller.py --interval 60
+    python scripts/autoscale_controller.py --once
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from typing import Optional
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from services.admission import backend_for, backend_limits
+from services.queue import CONVERSION_QUEUE, QUEUES, celery_app, collect_queue_metrics
+from services.task_metrics import quantile
+
+# Task slots one worker of each queue provides when none is running to ask
+DEFAULT_SLOTS = {
+    queue: config.CONVERSION_WORKER_CONCURRENCY if queue == CONVERSION_QUEUE else config.LLM_WORKER_CONCURRENCY
+    for queue in QUEUES
+}
+
+
+def _histogram_delta(current: dict, previous: dict) -> dict:
+    buckets = {bound: count - previous['buckets'].get(bound, 0) for bound, count in current['buckets'].items()}
+    return {'buckets': buckets, 'sum': current['sum'] - previous['sum'], 'count': current['count'] - previous['count']}
+
+
+def recommend(
+    queue: str,
+    previous: dict,
+    current: dict,
+    elapsed: float,
+    workers: int,
+    slots: int,
+    target_wait: float,
+    drain_seconds: float,
+    utilization: float,
+    min_workers: int,
+    max_workers: int,
+    max_slots: Optional[int] = None
+) -> dict:
+    """
+    Recommend a worker count for one queue from two snapshots of its stats
+
+    max_slots caps the total slots worth running (the admission limit for
+    LLM queues); None means no cap.
+
+    Returns:
+        Dict with the observed load, current and desired workers, and an
+        action (scale_up, scale_down or hold)
+    """
+    started = current['started'] - previous['started']
+    busy = current['busy_seconds'] - previous['busy_seconds']
+    rate = started / elapsed if elapsed > 0 else 0.0
+    service = busy / started if started else 0.0
+    p95_wait = quantile(_histogram_delta(current['wait'], previous['wait']), 0.95)
+
+    demand = rate * service
+    if current['depth']:
+        # Queued tasks with no run time observed yet count as one slot each
+        demand += current['depth'] * (service or drain_seconds) / drain_seconds
+    desired = math.ceil(demand / (slots * utilization)) if demand else 0
+    if p95_wait is not None and p95_wait > target_wait:
+        desired = max(desired, workers + 1)
+    if max_slots is not None:
+        desired = min(desired, math.ceil(max_slots / slots))
+    desired = max(min_workers, min(max_workers, desired))
+
+    action = 'hold'
+    if desired > workers:
+        action = 'scale_up'
+    elif desired < workers:
+        action = 'scale_down'
+
+    return {
+        'queue': queue,
+        'depth': current['depth'],
+        'rate_per_second': round(rate, 3),
+        'mean_run_seconds': round(service, 3),
+        'p95_wait_seconds': p95_wait,
+        'workers': workers,
+        'slots': slots,
+        'desired': desired,
+        'action': action,
+    }
+
+
+def inspect_workers() -> dict:
+    """
+    Running workers and their slots per queue
+
+    Worker hostnames are '<queue>-<queue>@host' (see celery_worker.py); slots are the pool size the
+    worker reports, so a worker started with --concurrency 16 counts as 16.
+
+    Returns:
+        Dict of queue -> {'workers': count, 'slots': smallest pool size seen,
+        or DEFAULT_SLOTS if no worker answered}
+    """
+    workers = {queue: {'workers': 0, 'slots': None} for queue in QUEUES}
+    stats = celery_app.control.inspect(timeout=2.0).stats() or {}
+    for hostname, worker_stats in stats.items():
+        slots = (worker_stats.get('pool') or {}).get('max-concurrency')
+        for queue in set(hostname.split('@', 1)[0].split('-')):
+            if queue not in workers:
+                continue
+            workers[queue]['workers'] += 1
+            if slots:
+                current = workers[queue]['slots']
+                workers[queue]['slots'] = slots if current is None else min(current, slots)
+    for queue, entry in workers.items():
+        entry['slots'] = entry['slots'] or DEFAULT_SLOTS[queue]
+    return workers
+
+
+def admission_slots() -> int:
+    """LLM calls the admission controller lets run at once, over the backends in use"""
+    backends = {backend_for(config.DEFAULT_LLM_MODEL)} | set(config.LLM_BACKEND_LIMITS)
+    return sum(int(backend_limits(backend)['max_concurrency']) for backend in backends)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend Celery worker counts per queue")
+    parser.add_argument("--interval", type=float, default=60, help="Seconds between evaluations")
+    parser.add_argument("--once", action="store_true", help="Evaluate one interval and exit")
+    parser.add_argument("--target-wait", type=float, default=10, help="p95 wait (seconds) to stay under")
+    parser.add_argument("--drain", type=float, default=300, help="Seconds to clear a backlog in")
+    parser.add_argument("--utilization", type=float, default=0.7, help="Target share of busy slots")
+    parser.add_argument("--cooldown", type=int, default=5, help="Intervals a lower count must hold before scaling down")
+    parser.add_argument("--min-workers", type=int, default=1)
+    parser.add_argument("--max-workers", type=int, default=10)
+    args = parser.parse_args()
+
+    previous = collect_queue_metrics()
+    lower_for = {queue: 0 for queue in QUEUES}
+
+    while True:
+        time.sleep(args.interval)
+        current = collect_queue_metrics()
+        elapsed = current['collected_at'] - previous['collected_at']
+        workers = inspect_workers()
+        llm_slots = admission_slots()
+
+        for queue in QUEUES:
+            if queue not in current['queues'] or queue not in previous['queues']:
+                continue
+            recommendation = recommend(
+                queue,
+                previous['queues'][queue],
+                current['queues'][queue],
+                elapsed,
+                workers[queue]['workers'],
+                workers[queue]['slots'],
+                args.target_wait,
+                args.drain,
+                args.utilization,
+                args.min_workers,
+                args.max_workers,
+                None if queue == CONVERSION_QUEUE else llm_slots,
+            )
+            # Scale down only once demand has stayed low for a while
+            if recommendation['action'] == 'scale_down':
+                lower_for[queue] += 1
+                if lower_for[queue] < args.cooldown:
+                    recommendation['action'] = 'hold'
+            else:
+                lower_for[queue] = 0
+            print(json.dumps(recommendation), flush=True)
+
+        previous = current
+        if args.once:
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.document_processor import DocumentProcessor
+
+VOCABULARY = (
+    "der die das und ist nicht ein eine zu mit auf für sich Haus Weg Stadt "
+    "Donaudampfschifffahrtsgesellschaft Wald gehen sehen sagte plötzlich "
+    "leise schnell Morgen Abend Freund Fenster Geschichte Reise"
+).split()
+
+
+def build_corpus(total_words: int, chapter_words: int, seed: int = 42) -> str:
+    """Build a synthetic omnibus: chapters of paragraphs of sentences"""
+    rng = random.Random(seed)
+    parts = []
+    words = 0
+    chapter = 1
+
+    while words < total_words:
+        parts.append(f"## Kapitel {chapter}\n\n")
+        chapter_total = 0
+        while chapter_total < chapter_words:
+            # Occasionally emit a huge paragraph to exercise sentence splitting
+            sentences = rng.randint(3, 8) if rng.random() > 0.02 else 400
+            paragraph = []
+            for _ in range(sentences):
+                length = rng.randint(6, 20)
+                paragraph.append(" ".join(rng.choice(VOCABULARY) for _ in range(length)).capitalize() + ".")
+                chapter_total += length
+            # Wrap lines like converted markdown does
+            tokens = " ".join(paragraph).split(" ")
+            lines = (" ".join(tokens[i:i + 14]) for i in range(0, len(tokens), 14))
+            parts.append("\n".join(lines) + "\n\n")
+        words += chapter_total
+        chapter += 1
+
+    return "".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming chunker")
+    parser.add_argument("--words", type=int, default=3_000_000, help="Corpus size in words")
+    parser.add_argument("--chapter_words", type=int, default=6000, help="Words per chapter")
+    parser.add_argument("--target", type=int, default=1500, help="Target words per chunk")
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs (best is reported)")
+
+    args = parser.parse_args()
+
+    print(f"🏗️ Building corpus of ~{args.words:,} words...")
+    text = build_corpus(args.words, args.chapter_words)
+    print(f"   {len(text) / 1024 / 1024:.1f} MB, {text.count(chr(10)):,} lines")
+
+    best_spans = best_total = float("inf")
+    for run in range(args.runs):
+        started = time.perf_counter()
+        spans = DocumentProcessor.chunk_spans(text, args.target)
+        spans_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        chunks = DocumentProcessor.materialize_chunks(text, spans)
+        total_elapsed = spans_elapsed + time.perf_counter() - started
+
+        best_spans = min(best_spans, spans_elapsed)
+        best_total = min(best_total, total_elapsed)
+        print(f"  Run {run + 1}: {len(spans):,} chunks, spans {spans_elapsed:.2f}s, with content {total_elapsed:.2f}s")
+
+    words_per_second = args.words / best_spans
+    print(f"\n⏱️ Best: spans {best_spans:.2f}s ({words_per_second / 1e6:.1f}M words/s), "
+          f"with content {best_total:.2f}s")
+
+    # Sanity check: chunks never end mid-sentence
+    unfinished = sum(1 for chunk in chunks if not chunk["content"].rstrip().endswith("."))
+    print(f"✅ Chunks ending mid-sentence: {unfinished}")
+
+
+if __name__ == "__main__":
+    main()
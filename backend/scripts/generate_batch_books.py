@@ -8,8 +8,11 @@ from datetime import datetime
 # Add backend directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from firebase_admin import firestore
+
 from services.llm import LLMService
-from services.firebase_service import get_firestore_client
+from services.firebase_service import BulkWriter, get_firestore_client
+from services.book_store import chapter_id
 from config import config
 
 MANIFEST_FILE = "books_manifest.json"
@@ -44,8 +47,9 @@ async def discover_books(topic: str, level: str, model: str):
     except Exception as e:
         print(f"❌ Error discovering book: {e}")
 
-async def generate_book(db, user_id: str, book_info: dict, model: str, is_public: bool = False):
+async def generate_book(writer: BulkWriter, user_id: str, book_info: dict, model: str, is_public: bool = False):
     print(f"\n📚 Generating book: {book_info['title']}...")
+    db = writer.db
     
     try:
         # 1. Create Book Document in Firestore
@@ -64,7 +68,7 @@ async def generate_book(db, user_id: str, book_info: dict, model: str, is_public
             "totalChapters": len(book_info['chapters']),
             "createdAt": datetime.utcnow().isoformat(),
             "status": "generating",
-            "chapters": [],
+            "chapterIndex": [],
             "isGlobal": is_public,
             "submittedBy": "system" if is_public else user_id
         }
@@ -74,8 +78,6 @@ async def generate_book(db, user_id: str, book_info: dict, model: str, is_public
         print(f"  💾 Created book document: {book_id}")
         
         # 2. Generate Chapters
-        generated_chapters = []
-        
         for i, chapter in enumerate(book_info['chapters']):
             print(f"  📖 Generating Chapter {chapter['number']}: {chapter['title']}...")
             
@@ -103,34 +105,42 @@ async def generate_book(db, user_id: str, book_info: dict, model: str, is_public
                 # Update context (keep last ~500 chars)
                 previous_context = chunk_text[-500:]
             
-            chapter_data = {
-                "id": str(chapter['number']), # Simple ID
+            content = full_chapter_content.strip()
+            word_count = len(content.split())
+            
+            # One document per chapter (committed in batches) instead of
+            # rewriting a growing chapters array on the book
+            writer.set(doc_ref.collection('chapters').document(chapter_id(chapter['number'])), {
+                "index": i,
                 "number": chapter['number'],
                 "title": chapter['title'],
-                "content": full_chapter_content.strip(),
-                "summary": chapter['summary']
-            }
-            
-            generated_chapters.append(chapter_data)
-            
-            # Update book with progress
-            doc_ref.update({
-                "chapters": generated_chapters,
+                "content": content,
+                "summary": chapter['summary'],
+                "wordCount": word_count
+            })
+            writer.update(doc_ref, {
+                "chapterIndex": firestore.ArrayUnion([{
+                    "number": chapter['number'],
+                    "title": chapter['title'],
+                    "wordCount": word_count
+                }]),
                 "lastUpdated": datetime.utcnow().isoformat()
             })
             
         # 3. Finalize
-        doc_ref.update({
+        writer.update(doc_ref, {
             "status": "approved",
             "completedAt": datetime.utcnow().isoformat()
         })
+        writer.flush()
         print(f"  ✅ Book generation complete: {book_info['title']}")
         
     except Exception as e:
         print(f"  ❌ Error generating book {book_info.get('title', 'unknown')}: {e}")
         # Mark as failed
         if 'doc_ref' in locals():
-            doc_ref.update({"status": "failed", "error": str(e)})
+            writer.update(doc_ref, {"status": "failed", "error": str(e)})
+            writer.flush()
 
 async def main():
     parser = argparse.ArgumentParser(description="Batch generate books")
@@ -168,9 +178,10 @@ async def main():
             
         print(f"🚀 Starting batch generation for {len(books_to_run)} books...")
         
-        db = get_firestore_client()
-        for book in books_to_run:
-            await generate_book(db, args.user_id, book, args.model, is_public=args.public)
+        with BulkWriter(get_firestore_client()) as writer:
+            for book in books_to_run:
+                await generate_book(writer, args.user_id, book, args.model, is_public=args.public)
+        print(f"💾 {writer.summary()}")
             
         print("\n✨ Batch generation complete!")
         return
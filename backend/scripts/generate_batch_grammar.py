@@ -9,14 +9,14 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.llm import LLMService
-from services.firebase_service import get_firestore_client
+from services.firebase_service import BulkWriter, get_firestore_client
 from config import config
 
 # CEFR Levels to discover
 LEVELS = ["A1", "A2", "B1", "B2", "C1", "C2"]
 MANIFEST_FILE = "curriculum_manifest.json"
 
-async def generate_topic(db, user_id: str, topic_info: dict, model: str):
+async def generate_topic(writer: BulkWriter, user_id: str, topic_info: dict, model: str):
     print(f"\n🌱 Processing topic: {topic_info['title']} ({topic_info['level']})...")
     
     # Generate a deterministic ID if not present
@@ -69,9 +69,9 @@ async def generate_topic(db, user_id: str, topic_info: dict, model: str):
             "exercises": exercises
         }
 
-        # 6. Save to Firestore
-        print(f"  💾 Saving to Firestore: {topic_info['id']}...")
-        doc_ref = db.collection('users').document(user_id).collection('grammar').document(topic_info['id'])
+        # 6. Save to Firestore (committed in batches)
+        print(f"  💾 Queueing for Firestore: {topic_info['id']}...")
+        doc_ref = writer.db.collection('users').document(user_id).collection('grammar').document(topic_info['id'])
         
         data = {
             **topic_info,
@@ -82,7 +82,7 @@ async def generate_topic(db, user_id: str, topic_info: dict, model: str):
             "score": 0
         }
         
-        doc_ref.set(data, merge=True)
+        writer.set(doc_ref, data, merge=True)
         print(f"  ✅ Done: {topic_info['id']}")
         
     except Exception as e:
@@ -141,9 +141,10 @@ async def main():
             
         print(f"🚀 Starting batch generation for {len(topics_to_run)} topics from manifest...")
         
-        db = get_firestore_client()
-        for topic in topics_to_run:
-            await generate_topic(db, args.user_id, topic, args.model)
+        with BulkWriter(get_firestore_client()) as writer:
+            for topic in topics_to_run:
+                await generate_topic(writer, args.user_id, topic, args.model)
+        print(f"💾 {writer.summary()}")
             
         print("\n✨ Batch generation complete!")
         return
@@ -153,10 +154,11 @@ async def main():
         if not args.user_id:
             print("❌ Error: --user_id is required for test mode.")
             return
-        db = get_firestore_client()
         print(f"🚀 Starting test batch generation...")
-        for topic in TEST_TOPICS:
-            await generate_topic(db, args.user_id, topic, args.model)
+        with BulkWriter(get_firestore_client()) as writer:
+            for topic in TEST_TOPICS:
+                await generate_topic(writer, args.user_id, topic, args.model)
+        print(f"💾 {writer.summary()}")
         return
 
     print("⚠️ No action specified. Use --discover, --generate, or --test_mode.")
@@ -8,14 +8,12 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.llm import LLMService
-from services.firebase_service import get_firestore_client
+from services.firebase_service import BulkWriter, get_firestore_client
 
-async def generate_and_save(topic, level, count, user_id, theme="", model=None):
+async def generate_and_save(topic, level, count, user_id, theme="", model=None, writer=None):
     print(f"🚀 Starting batch generation for topic: '{topic}'")
     print(f"📊 Level: {level}, Count: {count}, Theme: '{theme}'")
     
-    db = get_firestore_client()
-    
     for i in range(count):
         print(f"\n📝 Generating story {i+1}/{count} for level {level}...")
         try:
@@ -42,11 +40,11 @@ async def generate_and_save(topic, level, count, user_id, theme="", model=None):
                 'theme': theme
             }
             
-            if db:
-                # Save to Firestore
-                doc_ref = db.collection('users').document(user_id).collection('texts').document()
-                doc_ref.set(doc_data)
-                print(f"💾 Saved to Firestore with ID: {doc_ref.id}")
+            if writer:
+                # Queue for Firestore (committed in batches)
+                doc_ref = writer.db.collection('users').document(user_id).collection('texts').document()
+                writer.set(doc_ref, doc_data)
+                print(f"💾 Queued for Firestore with ID: {doc_ref.id}")
             else:
                 # Fallback: Save to local file
                 import json
@@ -73,15 +71,24 @@ async def main():
     
     print(f"🎯 Target User ID: {args.user_id}")
     
-    for level in levels:
-        await generate_and_save(
-            topic=args.topic,
-            level=level.strip(),
-            count=args.count,
-            user_id=args.user_id,
-            theme=args.theme,
-            model=args.model
-        )
+    db = get_firestore_client()
+    writer = BulkWriter(db) if db else None
+    
+    try:
+        for level in levels:
+            await generate_and_save(
+                topic=args.topic,
+                level=level.strip(),
+                count=args.count,
+                user_id=args.user_id,
+                theme=args.theme,
+                model=args.model,
+                writer=writer
+            )
+    finally:
+        if writer:
+            writer.close()
+            print(f"💾 {writer.summary()}")
         
     print("\n✨ Batch generation complete!")
 
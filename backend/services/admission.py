@@ -0,0 +1,359 @@
+"""
+LLM Admission Control
+Cluster-wide limits on LLM calls, shared by API processes and Celery workers
+
+Per inference backend (``ollama``, ``gpt``, ``claude``, ...), Redis holds:
+    llm:{backend}:inflight    sorted set of running calls, scored by lease expiry
+    llm:{backend}:admission   hash of the adaptive concurrency limit, token bucket
+                              and virtual clock
+    llm:{backend}:queue       waiting calls, scored by virtual finish time
+    llm:{backend}:heartbeats  waiting calls, scored by when they stop counting
+    llm:{backend}:finish      last virtual finish time per tenant
+
+A call is admitted when fewer calls than the current limit are running and
+the token bucket holds its estimated tokens (prompt plus expected output);
+otherwise it waits. The limit adapts with AIMD: every completion at or below
+ADMISSION_TARGET_SECONDS_PER_TOKEN raises it by 1/limit (about +1 per round
+of calls), a slow or overloaded completion cuts it by ADMISSION_DECREASE_FACTOR,
+so it settles just below the point where the backend's latency starts to
+climb. Leases expire, so a crashed caller never holds a slot for good.
+
+Waiting calls are served by weighted fair queueing across tenants (users):
+each call is tagged with its tenant's virtual finish time, its cost in
+tokens divided by the tenant's plan weight, added after the tenant's
+previous call. The smallest tag goes next, so a user with one card request
+is served ahead of another user's hundredth queued chapter. Batch jobs
+(see services/batch_jobs.py) run as one "batch" tenant weighted
+LLM_BATCH_WEIGHT, so seeding content yields to users.
+
+Admission fails open: if Redis is unavailable, calls go straight through.
+"""
+
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Dict, Optional, Tuple
+import asyncio
+import random
+import time
+import uuid
+
+from config import config
+from services.redis_client import get_async_redis
+
+SHARED_TENANT = "shared"
+BATCH_TENANT = "batch"
+
+# Returns 0 when admitted, -1 while the call is not first in line or all
+# slots are taken, or the milliseconds until the token bucket holds enough
+# tokens
+_ACQUIRE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local lease, ttl, cost = ARGV[1], tonumber(ARGV[2]), tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+
+-- Forget waiters that stopped polling (crashed or cancelled callers)
+local stale = redis.call('ZRANGEBYSCORE', KEYS[4], '-inf', now)
+for _, waiter in ipairs(stale) do
+    redis.call('ZREM', KEYS[3], waiter)
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[4], '-inf', now)
+
+-- Join the queue once, behind this tenant's earlier calls
+local tag = tonumber(redis.call('ZSCORE', KEYS[3], lease))
+if not tag then
+    local vclock = tonumber(redis.call('HGET', KEYS[2], 'vclock') or 0)
+    local last = tonumber(redis.call('HGET', KEYS[5], ARGV[8]) or 0)
+    tag = math.max(vclock, last) + cost / tonumber(ARGV[9])
+    redis.call('HSET', KEYS[5], ARGV[8], tag)
+    redis.call('EXPIRE', KEYS[5], 86400)
+    redis.call('ZADD', KEYS[3], tag, lease)
+end
+redis.call('ZADD', KEYS[4], now + tonumber(ARGV[10]), lease)
+
+if redis.call('ZRANGE', KEYS[3], 0, 0)[1] ~= lease then
+    return -1
+end
+
+local limit = tonumber(redis.call('HGET', KEYS[2], 'limit') or ARGV[4])
+limit = math.min(limit, tonumber(ARGV[5]))
+if redis.call('ZCARD', KEYS[1]) >= math.max(1, math.floor(limit)) then
+    return -1
+end
+
+local rate = tonumber(ARGV[6])
+if rate > 0 then
+    local burst = tonumber(ARGV[7])
+    local tokens = tonumber(redis.call('HGET', KEYS[2], 'tokens') or burst)
+    local ts = tonumber(redis.call('HGET', KEYS[2], 'ts') or now)
+    tokens = math.min(burst, tokens + (now - ts) * rate)
+    cost = math.min(cost, burst)
+    redis.call('HSET', KEYS[2], 'tokens', tokens, 'ts', now)
+    if tokens < cost then
+        return math.ceil((cost - tokens) / rate * 1000)
+    end
+    redis.call('HSET', KEYS[2], 'tokens', tokens - cost)
+end
+
+redis.call('ZREM', KEYS[3], lease)
+redis.call('ZREM', KEYS[4], lease)
+redis.call('HSET', KEYS[2], 'vclock', tag)
+redis.call('ZADD', KEYS[1], now + ttl, lease)
+redis.call('EXPIRE', KEYS[1], math.ceil(ttl))
+return 0
+"""
+
+# Leaves the queue without being admitted
+_LEAVE = """
+redis.call('ZREM', KEYS[3], ARGV[1])
+redis.call('ZREM', KEYS[4], ARGV[1])
+return 0
+"""
+
+# Frees the slot and applies the AIMD step for the call's outcome
+_RELEASE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+redis.call('ZREM', KEYS[1], ARGV[1])
+
+local limit = tonumber(redis.call('HGET', KEYS[2], 'limit') or ARGV[3])
+local min_limit, max_limit = tonumber(ARGV[4]), tonumber(ARGV[5])
+if ARGV[2] == 'ok' then
+    limit = limit + 1 / limit
+elseif ARGV[2] == 'overload' then
+    -- One cut per interval: calls that were already running when the
+    -- backend slowed down must not cut the limit again
+    local last = tonumber(redis.call('HGET', KEYS[2], 'decreased_at') or 0)
+    if now - last >= tonumber(ARGV[7]) then
+        limit = limit * tonumber(ARGV[6])
+        redis.call('HSET', KEYS[2], 'decreased_at', now)
+    end
+end
+limit = math.max(min_limit, math.min(max_limit, limit))
+redis.call('HSET', KEYS[2], 'limit', limit)
+
+local correction = tonumber(ARGV[8])
+if correction ~= 0 and redis.call('HEXISTS', KEYS[2], 'tokens') == 1 then
+    redis.call('HINCRBYFLOAT', KEYS[2], 'tokens', -correction)
+end
+return tostring(limit)
+"""
+
+
+class AdmissionTimeout(Exception):
+    """Raised when an LLM call waited longer than ADMISSION_TIMEOUT_SECONDS"""
+    pass
+
+
+_tenant: ContextVar[Optional[Tuple[str, float]]] = ContextVar("llm_tenant", default=None)
+
+
+@contextmanager
+def _llm_flow(tenant: str, weight: float):
+    token = _tenant.set((tenant, weight))
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+def llm_tenant(user_id: str, plan: Optional[str] = None):
+    """Attribute LLM calls made inside the block to a user (and their plan)"""
+    plan = plan or config.LLM_DEFAULT_PLAN
+    return _llm_flow(f"user:{user_id}", float(config.LLM_PLAN_WEIGHTS.get(plan, 1)))
+
+
+def batch_tenant():
+    """Attribute LLM calls made inside the block to batch jobs"""
+    return _llm_flow(BATCH_TENANT, config.LLM_BATCH_WEIGHT)
+
+
+async def run_as_tenant(coro: Awaitable, user_id: str, plan: Optional[str] = None):
+    """Await a coroutine with its LLM calls attributed to a user"""
+    with llm_tenant(user_id, plan):
+        return await coro
+
+
+async def run_as_batch(coro: Awaitable):
+    """Await a coroutine with its LLM calls attributed to batch jobs"""
+    with batch_tenant():
+        return await coro
+
+
+def current_tenant() -> Tuple[str, float]:
+    """Tenant of the current call and its fair-share weight"""
+    tenant = _tenant.get()
+    if tenant is None:
+        # Calls not made for a known user (interactive API requests,
+        # deduplicated generation jobs) share one flow
+        return SHARED_TENANT, config.LLM_SHARED_WEIGHT
+    return tenant
+
+
+def backend_for(model: str) -> str:
+    """Name of the inference backend serving a (prefixed) model"""
+    if "/" in model:
+        return model.split("/", 1)[0]
+    return model.split("-", 1)[0]
+
+
+def backend_limits(backend: str) -> Dict:
+    """Concurrency and token rate limits for a backend (LLM_BACKEND_LIMITS overrides)"""
+    limits = {
+        "max_concurrency": config.LLM_MAX_CONCURRENCY,
+        "initial_concurrency": config.LLM_INITIAL_CONCURRENCY,
+        "tokens_per_second": config.LLM_TOKENS_PER_SECOND,
+    }
+    limits.update(config.LLM_BACKEND_LIMITS.get(backend, {}))
+    return limits
+
+
+def estimate_tokens(messages, max_tokens: Optional[int] = None) -> int:
+    """Rough token cost of a call (~4 characters per token, plus expected output)"""
+    prompt = sum(len(message.get("content") or "") for message in messages) // 4
+    return prompt + (max_tokens or config.ADMISSION_DEFAULT_OUTPUT_TOKENS)
+
+
+def _is_overload(error: Exception) -> bool:
+    # Timeouts, rate limits and server errors mean the backend is saturated;
+    # bad requests say nothing about load
+    status = getattr(error, "status_code", None)
+    return status is None or status == 429 or status >= 500
+
+
+class Lease:
+    """An admitted LLM call; record() reports what it actually cost"""
+
+    def __init__(self, backend: str, lease_id: Optional[str], estimated_tokens: int):
+        self.backend = backend
+        self.lease_id = lease_id
+        self.estimated_tokens = estimated_tokens
+        self.started = time.monotonic()
+        self.completion_tokens = None
+        self.total_tokens = None
+
+    def record(self, response) -> None:
+        """Take token usage from a LiteLLM response"""
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.completion_tokens = getattr(usage, "completion_tokens", None)
+            self.total_tokens = getattr(usage, "total_tokens", None)
+
+    def outcome(self) -> str:
+        """'ok' if the call was served fast enough, 'overload' if not, 'neutral' without usage"""
+        if not self.completion_tokens:
+            # Without usage the call time cannot be judged per token: leave the limit alone
+            return "neutral"
+        elapsed = time.monotonic() - self.started
+        per_token = elapsed / self.completion_tokens
+        return "ok" if per_token <= config.ADMISSION_TARGET_SECONDS_PER_TOKEN else "overload"
+
+
+def _keys(backend: str):
+    return [
+        f"llm:{backend}:inflight",
+        f"llm:{backend}:admission",
+        f"llm:{backend}:queue",
+        f"llm:{backend}:heartbeats",
+        f"llm:{backend}:finish",
+    ]
+
+
+def _lease_ttl() -> float:
+    # A call cannot outlive its HTTP timeout
+    return config.LLM_HTTP_TIMEOUT_SECONDS + 30
+
+
+async def _acquire(backend: str, estimated_tokens: int) -> Optional[str]:
+    limits = backend_limits(backend)
+    tenant, weight = current_tenant()
+    client = get_async_redis()
+    script = client.register_script(_ACQUIRE)
+    lease_id = uuid.uuid4().hex
+    deadline = time.monotonic() + config.ADMISSION_TIMEOUT_SECONDS
+    rate = limits["tokens_per_second"]
+    # A waiter that misses a few polls loses its place in the queue
+    heartbeat = max(2.0, config.ADMISSION_POLL_SECONDS * 10)
+
+    try:
+        while True:
+            wait_ms = await script(keys=_keys(backend), args=[
+                lease_id, _lease_ttl(), estimated_tokens,
+                limits["initial_concurrency"], limits["max_concurrency"],
+                rate, rate * config.LLM_TOKEN_BURST_SECONDS,
+                tenant, weight, heartbeat,
+            ])
+            if wait_ms == 0:
+                return lease_id
+            if time.monotonic() >= deadline:
+                raise AdmissionTimeout(f"LLM backend {backend} is saturated")
+            delay = wait_ms / 1000 if wait_ms > 0 else config.ADMISSION_POLL_SECONDS
+            # Jitter keeps waiting callers from retrying in lockstep
+            await asyncio.sleep(min(delay, 1.0) * random.uniform(0.5, 1.5))
+    except BaseException:
+        # Give up our place in line right away instead of holding up the
+        # calls behind us until the heartbeat runs out
+        try:
+            leave = client.register_script(_LEAVE)
+            await asyncio.shield(leave(keys=_keys(backend), args=[lease_id]))
+        except Exception:
+            pass
+        raise
+
+
+async def _release(lease: Lease, outcome: str) -> None:
+    limits = backend_limits(lease.backend)
+    correction = 0
+    if lease.total_tokens and limits["tokens_per_second"]:
+        correction = lease.total_tokens - lease.estimated_tokens
+    try:
+        script = get_async_redis().register_script(_RELEASE)
+        await script(keys=_keys(lease.backend), args=[
+            lease.lease_id, outcome,
+            limits["initial_concurrency"], config.LLM_MIN_CONCURRENCY, limits["max_concurrency"],
+            config.ADMISSION_DECREASE_FACTOR, config.ADMISSION_DECREASE_INTERVAL_SECONDS,
+            correction,
+        ])
+    except Exception as e:
+        print(f"Warning: Failed to release LLM admission lease: {str(e)}")
+
+
+@asynccontextmanager
+async def admit(model: str, estimated_tokens: int):
+    """
+    Wait until the model's backend can take another call
+
+    Usage:
+        async with admit(model, estimate_tokens(messages)) as lease:
+            response = await litellm.acompletion(...)
+            lease.record(response)
+
+    Raises:
+        AdmissionTimeout: If no slot frees up within ADMISSION_TIMEOUT_SECONDS
+    """
+    backend = backend_for(model)
+    lease_id = None
+    if config.LLM_ADMISSION_ENABLED:
+        try:
+            lease_id = await _acquire(backend, estimated_tokens)
+        except AdmissionTimeout:
+            raise
+        except Exception as e:
+            print(f"Warning: LLM admission unavailable, calling {backend} directly: {str(e)}")
+
+    lease = Lease(backend, lease_id, estimated_tokens)
+    if lease_id is None:
+        yield lease
+        return
+
+    try:
+        yield lease
+    except asyncio.CancelledError:
+        # Cancelled by the caller: says nothing about the backend
+        await asyncio.shield(_release(lease, "neutral"))
+        raise
+    except Exception as e:
+        await _release(lease, "overload" if _is_overload(e) else "neutral")
+        raise
+    else:
+        await _release(lease, lease.outcome())
@@ -0,0 +1,108 @@
+"""
+Async Runtime
+One long-lived event loop per worker process for running async service code from Celery tasks
+
+``asyncio.run`` creates and tears down an event loop per call, which also
+throws away LiteLLM's cached HTTP clients and their keep-alive connections.
+Here the loop runs in a daemon thread for the lifetime of the process, so
+connection pools are shared by every task, and with a thread pool worker
+(``--pool threads``) many tasks can wait on the LLM at the same time.
+"""
+
+from typing import Any, Awaitable, Optional
+import asyncio
+import concurrent.futures
+import os
+import threading
+
+from config import config
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def _configure_http_session():
+    """Share one pooled HTTP client between all LiteLLM calls on this loop"""
+    try:
+        import httpx
+        from services.llm import get_litellm
+        litellm = get_litellm()
+    except ImportError:
+        return
+
+    litellm.aclient_session = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=config.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.LLM_HTTP_MAX_CONNECTIONS,
+        ),
+        timeout=httpx.Timeout(config.LLM_HTTP_TIMEOUT_SECONDS),
+    )
+
+
+def _run_loop(loop: asyncio.AbstractEventLoop, ready: threading.Event):
+    asyncio.set_event_loop(loop)
+    _configure_http_session()
+    ready.set()
+    loop.run_forever()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Get this process's event loop, starting it on first use"""
+    global _loop, _loop_pid
+
+    # Threads do not survive fork, so a prefork child needs its own loop
+    if _loop is not None and _loop_pid == os.getpid() and _loop.is_running():
+        return _loop
+
+    with _lock:
+        if _loop is None or _loop_pid != os.getpid() or not _loop.is_running():
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            thread = threading.Thread(
+                target=_run_loop, args=(loop, ready), name="async-runtime", daemon=True
+            )
+            thread.start()
+            ready.wait()
+            _loop, _loop_pid = loop, os.getpid()
+    return _loop
+
+
+def run_async(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine on the worker's event loop and wait for its result
+
+    Safe to call from many threads at once; the coroutines run concurrently
+    on the shared loop while each calling thread blocks on its own result.
+
+    Args:
+        coro: Coroutine to run
+        timeout: Seconds to wait before cancelling it
+
+    Returns:
+        The coroutine's result (exceptions are re-raised)
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+
+def shutdown(timeout: float = 5) -> None:
+    """Close this process's Redis connections on the loop and stop it (call at worker exit)"""
+    global _loop, _loop_pid
+    from services.redis_client import close_async_redis
+
+    with _lock:
+        loop = _loop
+        if loop is None or _loop_pid != os.getpid() or not loop.is_running():
+            return
+        _loop, _loop_pid = None, None
+
+    try:
+        asyncio.run_coroutine_threadsafe(close_async_redis(), loop).result(timeout)
+    except Exception as e:
+        print(f"Warning: Failed to close async Redis client: {str(e)}")
+    loop.call_soon_threadsafe(loop.stop)
@@ -0,0 +1,230 @@
+"""
+Batch Jobs
+Submits many generation jobs at once as a Celery group, with aggregate progress
+
+A batch is a list of job specs (stories, concept cards, exercises, context
+cards) enqueued on the bulk queue, so seeding content runs at the speed of
+the whole cluster without getting ahead of users' interactive requests.
+Their LLM calls run as the low-weight batch tenant (see services/admission.py).
+
+Redis keeps, for BATCH_TTL_SECONDS:
+    batch:{group_id}            job ids and types of the batch
+    batch:{group_id}:outcomes   final state of each job, recorded as it finishes
+
+Celery forgets results after RESULT_EXPIRES_SECONDS, so a job whose result
+expired still counts as finished through its recorded outcome.
+"""
+
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import json
+
+from celery import group
+from celery.states import READY_STATES
+from starlette.concurrency import run_in_threadpool
+
+from config import config
+from services.redis_client import get_redis
+
+JOB_TYPES = ('story', 'concept', 'exercises', 'context')
+
+# Message header marking a task as part of a batch
+BATCH_HEADER = 'batch_job'
+
+
+def _batch_key(group_id: str) -> str:
+    return f"batch:{group_id}"
+
+
+def _outcomes_key(group_id: str) -> str:
+    return f"batch:{group_id}:outcomes"
+
+
+def _signature(spec: Dict):
+    from services.queue import (
+        BULK_PRIORITY, BULK_QUEUE,
+        generate_concept_card_task, generate_context_card_task,
+        generate_exercises_task, generate_story_task,
+    )
+
+    common = {
+        'topic': spec['topic'],
+        'level': spec['level'],
+        'model': spec.get('model'),
+        'target_language': spec.get('target_language', 'German'),
+    }
+    job_type = spec['type']
+    if job_type == 'story':
+        signature = generate_story_task.s(length=spec.get('length', 'Medium'), theme=spec.get('theme', ''), **common)
+    elif job_type == 'concept':
+        signature = generate_concept_card_task.s(**common)
+    elif job_type == 'exercises':
+        signature = generate_exercises_task.s(**common)
+    elif job_type == 'context':
+        signature = generate_context_card_task.s(**common)
+    else:
+        raise ValueError(f"Unknown job type: {job_type}")
+    # Batches are background work: keep them off the interactive queue
+    return signature.set(queue=BULK_QUEUE, priority=BULK_PRIORITY, headers={BATCH_HEADER: True})
+
+
+def submit_batch(specs: List[Dict]) -> Dict:
+    """
+    Enqueue job specs as one Celery group
+
+    Args:
+        specs: Dicts with type, topic, level and optional length, theme,
+            model and target_language
+
+    Returns:
+        Dict with the group id and the job id of every spec, in order
+    """
+    signatures = [_signature(spec) for spec in specs]
+    result = group(signatures).apply_async()
+    job_ids = [child.id for child in result.results]
+
+    get_redis().set(_batch_key(result.id), json.dumps({
+        'job_ids': job_ids,
+        'types': [spec['type'] for spec in specs],
+    }), ex=config.BATCH_TTL_SECONDS)
+    return {'group_id': result.id, 'job_ids': job_ids, 'total': len(job_ids)}
+
+
+def get_batch(group_id: str) -> Optional[Dict]:
+    """Job ids and types of a batch, or None if unknown"""
+    raw = get_redis().get(_batch_key(group_id))
+    return json.loads(raw) if raw else None
+
+
+def _failed(state: str, value) -> bool:
+    # Generation tasks report errors as results
+    return state != 'SUCCESS' or (isinstance(value, dict) and 'error' in value)
+
+
+def record_outcome(task, state: str, value) -> None:
+    """Record the final state of a batch job in its batch (task_postrun hook)"""
+    request = task.request
+    if not getattr(request, BATCH_HEADER, None) or not request.group or state not in READY_STATES:
+        return
+    outcome = json.dumps({'status': state, 'failed': _failed(state, value)})
+    try:
+        with get_redis().pipeline() as pipe:
+            pipe.hset(_outcomes_key(request.group), request.id, outcome)
+            pipe.expire(_outcomes_key(request.group), config.BATCH_TTL_SECONDS)
+            pipe.execute()
+    except Exception as e:
+        print(f"Warning: Failed to record outcome of batch job {request.id}: {str(e)}")
+
+
+def _get_outcomes(group_id: str) -> Dict[str, Dict]:
+    raw = get_redis().hgetall(_outcomes_key(group_id)) or {}
+    return {job_id: json.loads(outcome) for job_id, outcome in raw.items()}
+
+
+def _job_state(job_id: str, job_type: str, with_result: bool, outcome: Optional[Dict] = None) -> Dict:
+    from services.queue import celery_app
+
+    result = celery_app.AsyncResult(job_id)
+    state = result.state
+    job = {'job_id': job_id, 'type': job_type, 'status': state}
+    if state in READY_STATES:
+        value = result.result
+        job['failed'] = _failed(state, value)
+        if with_result:
+            job['result'] = value if state == 'SUCCESS' else {'error': str(value)}
+    elif outcome is not None:
+        # Finished, but Celery no longer has the result
+        job['status'] = outcome['status']
+        job['failed'] = outcome['failed']
+        if with_result:
+            job['result'] = {'error': 'Result expired'}
+    return job
+
+
+def _summary(group_id: str, jobs: List[Dict], total: int) -> Dict:
+    finished = [job for job in jobs if job['status'] in READY_STATES]
+    failed = sum(1 for job in finished if job['failed'])
+    return {
+        'group_id': group_id,
+        'total': total,
+        'completed': len(finished) - failed,
+        'failed': failed,
+        'pending': total - len(finished),
+        'progress': round(100 * len(finished) / total, 1) if total else 100.0,
+        'done': len(finished) == total,
+    }
+
+
+def batch_status(group_id: str, include_results: bool = False) -> Optional[Dict]:
+    """
+    Aggregate progress of a batch
+
+    Returns:
+        Counts of completed, failed and pending jobs with the state of each
+        job (and its result if include_results), or None if unknown
+    """
+    batch = get_batch(group_id)
+    if batch is None:
+        return None
+    outcomes = _get_outcomes(group_id)
+    jobs = [
+        _job_state(job_id, job_type, include_results, outcomes.get(job_id))
+        for job_id, job_type in zip(batch['job_ids'], batch['types'])
+    ]
+    return {**_summary(group_id, jobs, len(jobs)), 'jobs': jobs}
+
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_batch(group_id: str, poll_seconds: Optional[float] = None) -> AsyncIterator[str]:
+    """
+    Stream a batch as Server-Sent Events
+
+    Sends a 'job' event with the result of each job as it finishes and a
+    'progress' event with the aggregate counts whenever they change, then
+    stops once every job is done, or with an 'error' event if the batch
+    expires first. Only unfinished jobs are polled.
+    """
+    poll_seconds = poll_seconds or config.BATCH_POLL_SECONDS
+    batch = await run_in_threadpool(get_batch, group_id)
+    if batch is None:
+        yield _sse('error', {'group_id': group_id, 'error': 'Unknown batch'})
+        return
+
+    pending = dict(zip(batch['job_ids'], batch['types']))
+    finished: List[Dict] = []
+    total = len(pending)
+    last_summary = None
+
+    while True:
+        def poll():
+            if not get_redis().exists(_batch_key(group_id)):
+                return None
+            outcomes = _get_outcomes(group_id)
+            return [
+                _job_state(job_id, job_type, True, outcomes.get(job_id))
+                for job_id, job_type in pending.items()
+            ]
+
+        jobs = await run_in_threadpool(poll)
+        if jobs is None:
+            # Past BATCH_TTL_SECONDS nothing tells pending jobs from lost ones
+            yield _sse('error', {'group_id': group_id, 'error': 'Batch expired'})
+            return
+        for job in jobs:
+            if job['status'] in READY_STATES:
+                del pending[job['job_id']]
+                finished.append(job)
+                yield _sse('job', job)
+
+        summary = _summary(group_id, finished, total)
+        if summary != last_summary:
+            yield _sse('progress', summary)
+            last_summary = summary
+        else:
+            yield ": keepalive\n\n"
+        if not pending:
+            return
+        await asyncio.sleep(poll_seconds)
@@ -0,0 +1,145 @@
+"""
+Book Jobs
+Tracks the Celery tasks of each book import so processing can be cancelled
+
+Per book, Redis holds:
+    book:{id}:job        hash of user_id and the uploaded file path
+    book:{id}:tasks      set of task ids (conversion, chapters, finalize)
+    book:{id}:cancelled  flag checked by running tasks between steps
+
+Revoking only stops tasks that have not started yet, so running tasks also
+check the flag at every step boundary (and while waiting on the LLM) and
+stop on their own.
+"""
+
+from typing import Awaitable, Dict, Iterable, Optional
+import asyncio
+import os
+
+from config import config
+from services.redis_client import get_async_redis, get_redis
+
+
+class BookCancelled(Exception):
+    """Raised inside a task when its book has been cancelled"""
+    pass
+
+
+def _job_key(book_id: str) -> str:
+    return f"book:{book_id}:job"
+
+
+def _tasks_key(book_id: str) -> str:
+    return f"book:{book_id}:tasks"
+
+
+def _cancel_key(book_id: str) -> str:
+    return f"book:{book_id}:cancelled"
+
+
+def register_job(book_id: str, user_id: str, file_path: str, task_ids: Iterable[str] = ()) -> None:
+    """Record a book import and its first tasks"""
+    client = get_redis()
+    with client.pipeline() as pipe:
+        pipe.hset(_job_key(book_id), mapping={"user_id": user_id, "file_path": file_path})
+        pipe.expire(_job_key(book_id), config.PROGRESS_TTL_SECONDS)
+        pipe.execute()
+    add_tasks(book_id, task_ids)
+
+
+def add_tasks(book_id: str, task_ids: Iterable[str]) -> None:
+    """Record more tasks working on a book (e.g. its chapter pipeline)"""
+    task_ids = [task_id for task_id in task_ids if task_id]
+    if not task_ids:
+        return
+    client = get_redis()
+    with client.pipeline() as pipe:
+        pipe.sadd(_tasks_key(book_id), *task_ids)
+        pipe.expire(_tasks_key(book_id), config.PROGRESS_TTL_SECONDS)
+        pipe.execute()
+
+
+def get_job(book_id: str) -> Optional[Dict]:
+    """Get a book import with its task ids, or None if unknown"""
+    client = get_redis()
+    job = client.hgetall(_job_key(book_id))
+    if not job:
+        return None
+    return {**job, "task_ids": sorted(client.smembers(_tasks_key(book_id)))}
+
+
+def cancel_job(book_id: str) -> Optional[Dict]:
+    """
+    Cancel a book import
+
+    Sets the cancel flag and revokes every known task of the book.
+
+    Returns:
+        The cancelled job, or None if the book is unknown
+    """
+    from services.queue import celery_app
+
+    job = get_job(book_id)
+    if job is None:
+        return None
+
+    get_redis().set(_cancel_key(book_id), "1", ex=config.PROGRESS_TTL_SECONDS)
+    if job["task_ids"]:
+        celery_app.control.revoke(job["task_ids"])
+    return job
+
+
+def is_cancelled(book_id: str) -> bool:
+    """Whether a book has been cancelled (False if Redis is unavailable)"""
+    try:
+        return bool(get_redis().exists(_cancel_key(book_id)))
+    except Exception as e:
+        print(f"Warning: Failed to check cancellation of book {book_id}: {str(e)}")
+        return False
+
+
+def check_cancelled(book_id: str) -> None:
+    """Raise BookCancelled if the book has been cancelled (call between steps)"""
+    if is_cancelled(book_id):
+        raise BookCancelled(book_id)
+
+
+async def run_cancellable(coro: Awaitable, book_id: str, poll_seconds: Optional[float] = None):
+    """
+    Await a coroutine, cancelling it if the book is cancelled meanwhile
+
+    Cancelling an LLM call closes its HTTP request, so the inference server
+    stops generating instead of finishing a chapter nobody will read.
+    """
+    poll_seconds = poll_seconds or config.CANCEL_POLL_SECONDS
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_seconds)
+            if done:
+                return task.result()
+            try:
+                cancelled = await get_async_redis().exists(_cancel_key(book_id))
+            except Exception:
+                cancelled = False
+            if cancelled:
+                raise BookCancelled(book_id)
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def remove_upload(file_path: Optional[str]) -> bool:
+    """Delete an uploaded file, but only if it lives in UPLOAD_DIR"""
+    if not file_path:
+        return False
+    upload_dir = os.path.realpath(config.UPLOAD_DIR)
+    path = os.path.realpath(file_path)
+    if os.path.dirname(path) != upload_dir:
+        print(f"Warning: Not removing {file_path}: outside UPLOAD_DIR")
+        return False
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,182 @@
+"""
+Book Store
+Stores book chapters as a Firestore subcollection, one document per chapter
+
+Layout:
+    users/{userId}/books/{bookId}                  book + chapterIndex (titles, word counts)
+    users/{userId}/books/{bookId}/chapters/{00001} title, content, isAdapted, ...
+
+Chapter updates touch a single small document instead of rewriting the whole
+chapters array, so parallel adaptation tasks never race and long books stay
+well under Firestore's 1MB document limit.
+"""
+
+from typing import Dict, List, Optional
+import hashlib
+
+from firebase_admin import firestore
+
+from services.firebase_service import BulkWriter
+
+
+class ChapterWriteError(Exception):
+    """Raised when chapter documents could not be written, even after retries"""
+    pass
+
+
+def _raise_on_failures(writer: BulkWriter) -> None:
+    # The writer retries transient errors and isolates bad writes; anything
+    # left failed for good and must not be covered up by the book document
+    if writer.failed_refs:
+        raise ChapterWriteError(f"Failed to write {len(writer.failed_refs)} documents: {', '.join(writer.failed_refs[:3])}")
+
+
+def book_ref(db, user_id: str, book_id: str):
+    """Reference to a user's book document"""
+    return db.collection('users').document(user_id).collection('books').document(book_id)
+
+
+def chapters_ref(db, user_id: str, book_id: str):
+    """Reference to a book's chapters subcollection"""
+    return book_ref(db, user_id, book_id).collection('chapters')
+
+
+def chapter_id(number: int) -> str:
+    """Document ID for a chapter (zero-padded so IDs sort in reading order)"""
+    return f"{number:05d}"
+
+
+def source_hash(content: str) -> str:
+    """Hash of a chapter's source text, used to recognise work already done"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def save_chapters(db, user_id: str, book_id: str, chunks: List[Dict], book_fields: Optional[Dict] = None) -> List[int]:
+    """
+    Write a book's chapters with a BulkWriter (batched, paced and retried)
+
+    Chapters are written first and the parent document (with the chapter
+    index) last, so readers never see an index pointing at missing chapters.
+    Chapters left over from an earlier, longer import are deleted.
+
+    Saving is idempotent: a chapter whose source hash is unchanged is not
+    rewritten, so chapters adapted before a crash or retry stay adapted.
+
+    Args:
+        db: Firestore client
+        user_id: User ID
+        book_id: Book ID
+        chunks: Chapter dicts with title, content and word_count
+        book_fields: Extra fields to merge into the book document
+
+    Returns:
+        Numbers of the chapters that are already adapted
+
+    Raises:
+        ChapterWriteError: If chapters failed to save (the book is left as it was)
+    """
+    collection = chapters_ref(db, user_id, book_id)
+
+    # Existing chapter state, without fetching any content
+    existing = {}
+    for snapshot in collection.select(['number', 'sourceHash', 'isAdapted']).stream():
+        existing[snapshot.id] = snapshot.to_dict()
+
+    adapted = []
+    with BulkWriter(db) as writer:
+        for i, chunk in enumerate(chunks):
+            number = i + 1
+            doc_id = chapter_id(number)
+            digest = source_hash(chunk['content'])
+            current = existing.pop(doc_id, None)
+            if current and current.get('sourceHash') == digest:
+                if current.get('isAdapted'):
+                    adapted.append(number)
+                continue
+            writer.set(collection.document(doc_id), {
+                'index': i,
+                'number': number,
+                'title': chunk['title'],
+                'content': chunk['content'],
+                'wordCount': chunk.get('word_count', len(chunk['content'].split())),
+                'sourceHash': digest,
+                'isAdapted': False,
+            })
+
+        # Whatever is left belongs to an earlier, longer import
+        for doc_id in existing:
+            writer.delete(collection.document(doc_id))
+    _raise_on_failures(writer)
+
+    book_ref(db, user_id, book_id).set({
+        **(book_fields or {}),
+        'chapterIndex': [
+            {
+                'number': i + 1,
+                'title': chunk['title'],
+                'wordCount': chunk.get('word_count', len(chunk['content'].split())),
+            }
+            for i, chunk in enumerate(chunks)
+        ],
+        'totalChapters': len(chunks),
+        'adaptedChapters': adapted,
+        # Chapters used to live inline on the book document
+        'chapters': firestore.DELETE_FIELD,
+    }, merge=True)
+
+    return adapted
+
+
+def get_checkpoint(db, user_id: str, book_id: str) -> Dict:
+    """Get the processing checkpoint stored on the book (empty if none)"""
+    snapshot = book_ref(db, user_id, book_id).get(field_paths=['checkpoint'])
+    if not snapshot.exists:
+        return {}
+    return (snapshot.to_dict() or {}).get('checkpoint') or {}
+
+
+def get_pending_chapters(db, user_id: str, book_id: str) -> List[Dict]:
+    """Get the chapters that still need adapting, in reading order"""
+    query = chapters_ref(db, user_id, book_id).where('isAdapted', '==', False)
+    chapters = [snapshot.to_dict() for snapshot in query.stream()]
+    return sorted(chapters, key=lambda chapter: chapter['number'])
+
+
+def is_chapter_adapted(db, user_id: str, book_id: str, chapter_index: int, content: str) -> bool:
+    """Whether a chapter was already adapted from exactly this source text"""
+    ref = chapters_ref(db, user_id, book_id).document(chapter_id(chapter_index + 1))
+    snapshot = ref.get(field_paths=['isAdapted', 'adaptedFromHash'])
+    if not snapshot.exists:
+        return False
+    state = snapshot.to_dict() or {}
+    return bool(state.get('isAdapted')) and state.get('adaptedFromHash') == source_hash(content)
+
+
+def mark_chapter_adapted(db, user_id: str, book_id: str, chapter_index: int, content: str, source: Optional[str] = None) -> None:
+    """
+    Store an adapted chapter
+
+    Writes the chapter document and records the chapter number on the book
+    with an atomic array union, in one batch. Both writes are idempotent, so
+    a redelivered task can safely repeat them.
+
+    Raises:
+        ChapterWriteError: If the writes failed for good
+    """
+    number = chapter_index + 1
+    chapter = {'content': content, 'isAdapted': True}
+    if source is not None:
+        chapter['adaptedFromHash'] = source_hash(source)
+
+    with BulkWriter(db) as writer:
+        writer.update(chapters_ref(db, user_id, book_id).document(chapter_id(number)), chapter)
+        writer.update(book_ref(db, user_id, book_id), {
+            'adaptedChapters': firestore.ArrayUnion([number]),
+        })
+    _raise_on_failures(writer)
+
+
+def get_chapters(db, user_id: str, book_id: str) -> List[Dict]:
+    """Get all chapters of a book in reading order"""
+    query = chapters_ref(db, user_id, book_id).order_by('number')
+    return [{'id': snapshot.id, **snapshot.to_dict()} for snapshot in query.stream()]
@@ -0,0 +1,257 @@
+"""
+Streaming text chunker
+Splits documents into chapter-sized spans in a single pass over their lines
+"""
+
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import re
+
+# All chapter markers in one precompiled pattern, matched at the start of each line
+CHAPTER_PATTERN = re.compile(
+    r'\s*(?:'
+    r'#+\s+(?:Chapter|Kapitel)\s+\d+'  # Markdown headers
+    r'|(?:Chapter|Kapitel)\s+\d+'
+    r'|(?-i:[IVXLCDM]+)\.'  # Roman numerals (uppercase only, so "mild." is not a heading)
+    r'|Part\s+\d+'
+    r'|Teil\s+\d+'
+    r')',
+    re.IGNORECASE
+)
+
+# Terminal punctuation, optional closing quotes/brackets, then whitespace
+SENTENCE_END_PATTERN = re.compile(r'[.!?…]+["\'»«“”’)\]]*\s+')
+
+# Tokens ending in a period that do not end a sentence
+ABBREVIATIONS = {
+    "z.b.", "d.h.", "u.a.", "bzw.", "usw.", "ca.", "vgl.", "etc.", "nr.",
+    "dr.", "prof.", "hr.", "fr.", "st.", "mr.", "mrs.", "ms.", "e.g.", "i.e.",
+}
+
+# (start, end, word_count, size) of a paragraph, sentence or word run
+Unit = Tuple[int, int, int, int]
+
+WORD_PATTERN = re.compile(r'\S+')
+
+
+class ChunkSpan(NamedTuple):
+    """A chunk as offsets into the source text"""
+    title: str
+    start: int
+    end: int
+    word_count: int
+    size: int = 0  # Measured size: words, or tokens when chunking to a token budget
+
+
+class TokenBudget(NamedTuple):
+    """Chunk size limit expressed in model tokens"""
+    tokens: int
+    count_tokens: Callable[[str], int]
+    key: str  # Identifies the tokenizer/budget, e.g. for cache keys
+
+
+class StreamingChunker:
+    """
+    Single-pass chunker over an iterator of lines
+
+    Chapter markers start a new section; text before the first marker is
+    dropped when markers exist, otherwise the whole text is split into parts.
+    Sections longer than ``max_ratio`` times the target are packed from
+    paragraphs, and paragraphs longer than the target are split at sentence
+    boundaries so chunks never end mid-sentence.
+
+    Size is measured in words by default. With ``measure`` (e.g. a token
+    counter) the target becomes a hard limit: sections are split as soon as
+    they exceed it and single sentences that do not fit are split at words.
+    """
+
+    def __init__(
+        self,
+        target_size: int,
+        max_ratio: float = 1.5,
+        min_word_count: int = 50,
+        measure: Optional[Callable[[str], int]] = None
+    ):
+        self.target = target_size
+        self.measure = measure
+        self.max_ratio = 1.0 if measure else max_ratio
+        self.min_word_count = min_word_count
+
+    @classmethod
+    def for_token_budget(cls, budget: TokenBudget, min_word_count: int = 50) -> "StreamingChunker":
+        """Create a chunker whose chunks never exceed the token budget"""
+        return cls(budget.tokens, min_word_count=min_word_count, measure=budget.count_tokens)
+
+    def iter_spans(self, lines: Iterable[str]) -> Iterator[ChunkSpan]:
+        """
+        Yield chunk spans for the given lines
+
+        Args:
+            lines: Lines of the document, including their line endings
+
+        Returns:
+            Iterator of ChunkSpan with offsets into the concatenated lines
+        """
+        measure = self.measure
+        offset = 0
+        title: Optional[str] = None
+        chapters_found = False
+        units: List[Unit] = []
+
+        # Lines of the current paragraph as (offset, line)
+        para_lines: List[Tuple[int, str]] = []
+        para_words = para_size = 0
+
+        for line in lines:
+            words = len(line.split())
+
+            if words and CHAPTER_PATTERN.match(line):
+                if para_lines:
+                    units.extend(self._paragraph_units(para_lines, para_words, para_size))
+                    para_lines = []
+                # Text before the first chapter marker is front matter and is dropped
+                if chapters_found:
+                    yield from self._section_spans(title, units)
+                chapters_found = True
+                title = line.strip()
+                units = []
+            elif words:
+                if not para_lines:
+                    para_words = para_size = 0
+                para_words += words
+                para_size += measure(line) if measure else words
+                para_lines.append((offset, line))
+            elif para_lines:
+                # Blank line closes the paragraph
+                units.extend(self._paragraph_units(para_lines, para_words, para_size))
+                para_lines = []
+
+            offset += len(line)
+
+        if para_lines:
+            units.extend(self._paragraph_units(para_lines, para_words, para_size))
+        yield from self._section_spans(title, units)
+
+    def _paragraph_units(self, para_lines: List[Tuple[int, str]], words: int, size: int) -> List[Unit]:
+        """Return the paragraph as one unit, or as sentences when it exceeds the target"""
+        if size > self.target:
+            return self._sentence_units(para_lines)
+
+        first_offset, first_line = para_lines[0]
+        last_offset, last_line = para_lines[-1]
+        start = first_offset + len(first_line) - len(first_line.lstrip())
+        end = last_offset + len(last_line.rstrip())
+        return [(start, end, words, size)]
+
+    def _sentence_units(self, para_lines: List[Tuple[int, str]]) -> List[Unit]:
+        """Split a paragraph into sentences without copying it"""
+        measure = self.measure
+        units = []
+        sent_start = None
+        sent_end = sent_words = sent_size = 0
+
+        for line_offset, line in para_lines:
+            pos = 0
+            for match in SENTENCE_END_PATTERN.finditer(line):
+                piece = line[pos:match.end()]
+                tokens = piece.split()
+                if not tokens:
+                    pos = match.end()
+                    continue
+                if sent_start is None:
+                    sent_start = line_offset + pos + len(piece) - len(piece.lstrip())
+                sent_words += len(tokens)
+                sent_size += measure(piece) if measure else len(tokens)
+                sent_end = line_offset + match.start() + len(match.group().rstrip())
+                pos = match.end()
+
+                last = tokens[-1].rstrip('"\'»«“”’)]')
+                if last.lower() in ABBREVIATIONS or last[:-1].isdigit():
+                    continue
+                units.append((sent_start, sent_end, sent_words, sent_size))
+                sent_start = None
+                sent_words = sent_size = 0
+
+            rest = line[pos:]
+            rest_words = len(rest.split())
+            if rest_words:
+                if sent_start is None:
+                    sent_start = line_offset + pos + len(rest) - len(rest.lstrip())
+                sent_words += rest_words
+                sent_size += measure(rest) if measure else rest_words
+                sent_end = line_offset + len(line.rstrip())
+
+        if sent_start is not None:
+            units.append((sent_start, sent_end, sent_words, sent_size))
+
+        if measure is None:
+            return units
+
+        # Hard limit: a sentence that alone exceeds the budget is split at words
+        fitted = []
+        for unit in units:
+            if unit[3] > self.target:
+                fitted.extend(self._word_units(para_lines, unit[0], unit[1]))
+            else:
+                fitted.append(unit)
+        return fitted
+
+    def _word_units(self, para_lines: List[Tuple[int, str]], start: int, end: int) -> List[Unit]:
+        """Split the [start, end) range of a paragraph into word runs within the target"""
+        units = []
+        run_start = None
+        run_end = run_words = run_size = 0
+
+        for line_offset, line in para_lines:
+            if line_offset + len(line) <= start or line_offset >= end:
+                continue
+            for match in WORD_PATTERN.finditer(line):
+                word_start = line_offset + match.start()
+                if word_start < start or word_start >= end:
+                    continue
+                word_size = self.measure(match.group() + " ")
+                if run_words and run_size + word_size > self.target:
+                    units.append((run_start, run_end, run_words, run_size))
+                    run_start = None
+                    run_words = run_size = 0
+                if run_start is None:
+                    run_start = word_start
+                run_end = line_offset + match.end()
+                run_words += 1
+                run_size += word_size
+
+        if run_start is not None:
+            units.append((run_start, run_end, run_words, run_size))
+        return units
+
+    def _section_spans(self, title: Optional[str], units: List[Unit]) -> Iterator[ChunkSpan]:
+        """Turn a section's units into one chunk, or into packed parts if it is too long"""
+        if not units:
+            return
+
+        total_words = sum(unit[2] for unit in units)
+        total_size = sum(unit[3] for unit in units)
+        if title is not None and total_size <= self.target * self.max_ratio:
+            yield from self._keep(ChunkSpan(title, units[0][0], units[-1][1], total_words, total_size))
+            return
+
+        prefix = title if title is not None else "Part"
+        index = 1
+        chunk_start = units[0][0]
+        chunk_end = chunk_words = chunk_size = 0
+
+        for start, end, words, size in units:
+            if chunk_size + size > self.target and chunk_size > 0:
+                yield from self._keep(ChunkSpan(f"{prefix} {index}", chunk_start, chunk_end, chunk_words, chunk_size))
+                index += 1
+                chunk_start = start
+                chunk_words = chunk_size = 0
+            chunk_end = end
+            chunk_words += words
+            chunk_size += size
+
+        yield from self._keep(ChunkSpan(f"{prefix} {index}", chunk_start, chunk_end, chunk_words, chunk_size))
+
+    def _keep(self, span: ChunkSpan) -> Iterator[ChunkSpan]:
+        # Very small chunks are usually headers/footers
+        if span.word_count > self.min_word_count:
+            yield span
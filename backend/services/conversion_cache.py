@@ -0,0 +1,85 @@
+"""
+Conversion Cache
+Stores DocumentProcessor results on disk, keyed by file content hash
+"""
+
+from typing import Dict, List, Optional
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from config import config
+
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Compute the SHA-256 of a file (used when no upload hash was provided)"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    """
+    On-disk cache of converted documents
+
+    Entries live under ``<cache_dir>/<version>/`` so bumping the processor
+    version invalidates every entry without touching the files.
+    """
+
+    def __init__(self, version: str, cache_dir: Optional[str] = None):
+        self.version = version
+        self.cache_dir = os.path.join(cache_dir or config.CONVERSION_CACHE_DIR, version)
+
+    def _path(self, content_hash: str, suffix: str = "document") -> str:
+        # Chunk keys may contain model names like "ollama/gemma3:27b"
+        suffix = re.sub(r'[^A-Za-z0-9_.-]', '_', suffix)
+        return os.path.join(self.cache_dir, f"{content_hash}.{suffix}.json")
+
+    def _read(self, path: str) -> Optional[Dict]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Ignoring unreadable cache entry {path}: {str(e)}")
+            return None
+
+    def _write(self, path: str, data) -> None:
+        # Write to a temp file first so readers never see a partial entry
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, content_hash: str) -> Optional[Dict]:
+        """Get a cached conversion result (text, metadata, page count)"""
+        return self._read(self._path(content_hash))
+
+    def put(self, content_hash: str, result: Dict) -> None:
+        """Store a conversion result"""
+        try:
+            self._write(self._path(content_hash), result)
+        except OSError as e:
+            print(f"Warning: Failed to write conversion cache: {str(e)}")
+
+    def get_chunks(self, content_hash: str, chunk_key: str) -> Optional[List[Dict]]:
+        """Get cached chunks for a document and chunking configuration"""
+        return self._read(self._path(content_hash, f"chunks.{chunk_key}"))
+
+    def put_chunks(self, content_hash: str, chunk_key: str, chunks: List[Dict]) -> None:
+        """Store chunks for a document and chunking configuration"""
+        try:
+            self._write(self._path(content_hash, f"chunks.{chunk_key}"), chunks)
+        except OSError as e:
+            print(f"Warning: Failed to write chunk cache: {str(e)}")
@@ -3,51 +3,141 @@ Document processing service using Docling
 Handles PDF and EPUB parsing with better accuracy than pdfjs
 """
 
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Optional
+import gc
+import io
 import os
+import resource
+import time
 from pathlib import Path
 
-try:
-    from docling.document_converter import DocumentConverter
-    from docling.datamodel.base_models import InputFormat
-    DOCLING_AVAILABLE = True
-except ImportError:
-    DOCLING_AVAILABLE = False
-    print("Warning: Docling not available. Install with: pip install docling")
-
 from config import config
+from services.chunker import ChunkSpan, StreamingChunker, TokenBudget
+from services.conversion_cache import ConversionCache
+
+# Docling (and torch beneath it) takes seconds to import, so it is loaded by
+# the first DocumentProcessor rather than by everything importing this module
+DocumentConverter = None
+InputFormat = None
+DOCLING_AVAILABLE: Optional[bool] = None  # Unknown until _load_docling()
+
+
+def _load_docling() -> bool:
+    """Import Docling on first use; returns whether it is installed"""
+    global DocumentConverter, InputFormat, DOCLING_AVAILABLE
+    if DOCLING_AVAILABLE is False:
+        return False
+    # Left alone when already set (or patched); a repeat import is a dict lookup
+    if DocumentConverter is None:
+        try:
+            from docling.document_converter import DocumentConverter
+            from docling.datamodel.base_models import InputFormat
+        except ImportError:
+            DOCLING_AVAILABLE = False
+            print("Warning: Docling not available. Install with: pip install docling")
+            return False
+    DOCLING_AVAILABLE = True
+    return True
 
 
 class DocumentProcessor:
     """Process PDF and EPUB documents"""
     
+    # Bump whenever conversion or chunking output changes, to invalidate cached results
+    PROCESSOR_VERSION = "2"
+    
     def __init__(self):
-        if DOCLING_AVAILABLE:
+        if _load_docling():
             self.converter = DocumentConverter()
         else:
             self.converter = None
+        self.cache = ConversionCache(self.PROCESSOR_VERSION) if config.CONVERSION_CACHE_ENABLED else None
+    
+    def preload_models(self):
+        """Load Docling pipelines (and their layout models) ahead of the first conversion"""
+        initialize_pipeline = getattr(self.converter, "initialize_pipeline", None)
+        if initialize_pipeline is None:
+            return
+        try:
+            initialize_pipeline(InputFormat.PDF)
+        except Exception as e:
+            print(f"Warning: Failed to preload PDF pipeline: {str(e)}")
     
-    def process_document(self, file_path: str) -> Dict:
+    def process_document(self, file_path: str, content_hash: Optional[str] = None) -> Dict:
         """
         Process a document (PDF or EPUB)
         
         Args:
             file_path: Path to the document
+            content_hash: SHA-256 of the file bytes; enables the conversion cache
             
         Returns:
             Dict with text, metadata, and page count
         """
-        if not DOCLING_AVAILABLE:
-            raise Exception("Docling is not installed. Cannot process documents.")
-        
         file_ext = Path(file_path).suffix.lower()
+        if file_ext not in ('.pdf', '.epub'):
+            raise ValueError(f"Unsupported file type: {file_ext}")
+        
+        if content_hash and self.cache:
+            cached = self.cache.get(content_hash)
+            if cached is not None:
+                return {**cached, "conversion_seconds": 0.0, "cache_hit": True}
+        
+        if self.converter is None:
+            raise Exception("Docling is not installed. Cannot process documents.")
         
+        started = time.perf_counter()
         if file_ext == '.pdf':
-            return self._process_pdf(file_path)
-        elif file_ext == '.epub':
-            return self._process_epub(file_path)
+            result = self._process_pdf(file_path)
         else:
-            raise ValueError(f"Unsupported file type: {file_ext}")
+            result = self._process_epub(file_path)
+        
+        if content_hash and self.cache:
+            self.cache.put(content_hash, result)
+        
+        return {**result, "conversion_seconds": round(time.perf_counter() - started, 3), "cache_hit": False}
+    
+    @staticmethod
+    def chunk_key(target_word_count: int = None, token_budget: Optional[TokenBudget] = None) -> str:
+        """Identify a chunking configuration (same key, same chunks for a document)"""
+        if token_budget:
+            return f"tokens-{token_budget.key}-{token_budget.tokens}"
+        return f"words-{target_word_count or config.CHUNK_TARGET_WORDS}"
+    
+    def chunk_document(
+        self,
+        text: str,
+        content_hash: Optional[str] = None,
+        target_word_count: int = None,
+        token_budget: Optional[TokenBudget] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Chunk a processed document, reusing cached chunks when available
+        
+        Args:
+            text: Full text content
+            content_hash: SHA-256 of the source file bytes
+            target_word_count: Target words per chunk
+            token_budget: Maximum model tokens per chunk (overrides the word target)
+            
+        Returns:
+            List of chapter dicts with title and content
+        """
+        chunk_key = self.chunk_key(target_word_count, token_budget)
+        
+        spans = None
+        if content_hash and self.cache:
+            cached = self.cache.get_chunks(content_hash, chunk_key)
+            if cached is not None:
+                spans = [ChunkSpan(*span) for span in cached]
+        
+        if spans is None:
+            spans = self.chunk_spans(text, target_word_count, token_budget)
+            if content_hash and self.cache:
+                # Only offsets are cached; content is sliced from the cached text
+                self.cache.put_chunks(content_hash, chunk_key, [list(span) for span in spans])
+        
+        return self.materialize_chunks(text, spans)
     
     def _process_pdf(self, file_path: str) -> Dict:
         """Process PDF file"""
@@ -97,110 +187,117 @@ class DocumentProcessor:
             raise Exception(f"EPUB processing failed: {str(e)}")
     
     @staticmethod
-    def chunk_text(text: str, target_word_count: int = None) -> List[Dict[str, str]]:
+    def chunk_spans(
+        text: str,
+        target_word_count: int = None,
+        token_budget: Optional[TokenBudget] = None
+    ) -> List[ChunkSpan]:
         """
-        Chunk text into chapters/sections
+        Chunk text into chapter/section spans (offsets into text, no copies)
         
         Args:
             text: Full text content
             target_word_count: Target words per chunk
+            token_budget: Maximum model tokens per chunk (overrides the word target)
             
         Returns:
-            List of chapter dicts with title and content
+            List of ChunkSpan with title, start/end offsets and word count
         """
-        target_word_count = target_word_count or config.CHUNK_TARGET_WORDS
-        
-        # Try to detect chapter markers
-        import re
-        
-        # Common chapter patterns
-        chapter_patterns = [
-            r'^#+\s+(?:Chapter|Kapitel)\s+\d+',  # Markdown headers
-            r'^(?:Chapter|Kapitel)\s+\d+',
-            r'^[IVXLCDM]+\.',  # Roman numerals
-            r'^Part\s+\d+',
-            r'^Teil\s+\d+',
-        ]
-        
-        lines = text.split('\n')
-        chapter_indices = []
-        
-        for i, line in enumerate(lines):
-            for pattern in chapter_patterns:
-                if re.match(pattern, line.strip(), re.IGNORECASE):
-                    chapter_indices.append(i)
-                    break
-        
-        chunks = []
-        
-        if len(chapter_indices) > 0:
-            # Split by detected chapters
-            for i, start_idx in enumerate(chapter_indices):
-                end_idx = chapter_indices[i + 1] if i + 1 < len(chapter_indices) else len(lines)
-                
-                chapter_lines = lines[start_idx:end_idx]
-                title = chapter_lines[0].strip() if chapter_lines else f"Chapter {i + 1}"
-                content = '\n'.join(chapter_lines[1:]).strip()
-                
-                # If chapter is too large, split it further
-                word_count = len(content.split())
-                if word_count > target_word_count * 1.5:
-                    sub_chunks = DocumentProcessor._create_size_based_chunks(
-                        content, target_word_count, title
-                    )
-                    chunks.extend(sub_chunks)
-                else:
-                    chunks.append({
-                        "title": title,
-                        "content": content,
-                        "word_count": word_count
-                    })
+        if token_budget:
+            chunker = StreamingChunker.for_token_budget(token_budget)
         else:
-            # No chapters detected, use size-based chunking
-            chunks = DocumentProcessor._create_size_based_chunks(text, target_word_count)
-        
-        # Filter out very small chunks (likely headers/footers)
-        chunks = [c for c in chunks if c.get("word_count", 0) > 50]
-        
-        return chunks
+            chunker = StreamingChunker(target_word_count or config.CHUNK_TARGET_WORDS)
+        return list(chunker.iter_spans(io.StringIO(text)))
     
     @staticmethod
-    def _create_size_based_chunks(
-        text: str,
-        target_word_count: int,
-        title_prefix: str = "Part"
-    ) -> List[Dict[str, str]]:
-        """Create chunks based on size"""
-        paragraphs = text.split('\n\n')
-        chunks = []
-        current_chunk = ""
-        current_word_count = 0
-        chunk_index = 1
+    def materialize_chunks(text: str, spans: List[ChunkSpan]) -> List[Dict[str, str]]:
+        """Turn chunk spans into chapter dicts with title and content"""
+        return [
+            {
+                "title": span.title,
+                "content": text[span.start:span.end],
+                "word_count": span.word_count
+            }
+            for span in spans
+        ]
+    
+    @staticmethod
+    def chunk_text(text: str, target_word_count: int = None) -> List[Dict[str, str]]:
+        """
+        Chunk text into chapters/sections
         
-        for paragraph in paragraphs:
-            paragraph_word_count = len(paragraph.split())
-            
-            if current_word_count + paragraph_word_count > target_word_count and current_word_count > 0:
-                chunks.append({
-                    "title": f"{title_prefix} {chunk_index}",
-                    "content": current_chunk.strip(),
-                    "word_count": current_word_count
-                })
-                chunk_index += 1
-                current_chunk = ""
-                current_word_count = 0
+        Args:
+            text: Full text content
+            target_word_count: Target words per chunk
             
-            current_chunk += paragraph + "\n\n"
-            current_word_count += paragraph_word_count
-        
-        if current_chunk.strip():
-            chunks.append({
-                "title": f"{title_prefix} {chunk_index}",
-                "content": current_chunk.strip(),
-                "word_count": current_word_count
-            })
-        
-        return chunks
+        Returns:
+            List of chapter dicts with title and content
+        """
+        spans = DocumentProcessor.chunk_spans(text, target_word_count)
+        return DocumentProcessor.materialize_chunks(text, spans)
+
+
+# Worker-resident processor
+# Building a DocumentConverter loads layout models, so each worker process keeps
+# one alive across tasks and rebuilds it after enough documents or RSS growth.
+_processor: Optional[DocumentProcessor] = None
+_documents_processed = 0
+_baseline_rss_mb = 0.0
+
+
+def _current_rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Not Linux: fall back to peak RSS (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if peak > 1 << 32 else peak / 1024
+
+
+def preload_document_processor() -> DocumentProcessor:
+    """Create the worker-resident processor and load its models (call at worker start)"""
+    global _processor, _documents_processed, _baseline_rss_mb
+    
+    started = time.perf_counter()
+    _processor = DocumentProcessor()
+    _processor.preload_models()
+    _documents_processed = 0
+    _baseline_rss_mb = _current_rss_mb()
+    print(f"DocumentProcessor preloaded in {time.perf_counter() - started:.2f}s "
+          f"(pid {os.getpid()}, rss {_baseline_rss_mb:.0f}MB)")
+    return _processor
+
+
+def get_document_processor() -> DocumentProcessor:
+    """Get the worker-resident processor, creating it on first use"""
+    if _processor is None:
+        return preload_document_processor()
+    return _processor
+
+
+def record_document_processed() -> None:
+    """
+    Count a finished document and recycle the converter when limits are reached
+    
+    Limits: CONVERTER_MAX_DOCUMENTS documents or CONVERTER_MAX_RSS_GROWTH_MB of
+    RSS growth since the converter was loaded. Whole-process recycling is left
+    to Celery's worker_max_memory_per_child (WORKER_MAX_MEMORY_MB).
+    """
+    global _processor, _documents_processed
+    
+    _documents_processed += 1
+    growth_mb = _current_rss_mb() - _baseline_rss_mb
+    
+    too_many = config.CONVERTER_MAX_DOCUMENTS and _documents_processed >= config.CONVERTER_MAX_DOCUMENTS
+    too_large = config.CONVERTER_MAX_RSS_GROWTH_MB and growth_mb >= config.CONVERTER_MAX_RSS_GROWTH_MB
+    if too_many or too_large:
+        print(f"Recycling DocumentProcessor after {_documents_processed} documents "
+              f"(rss growth {growth_mb:.0f}MB)")
+        _processor = None
+        gc.collect()
 
 
 # Fallback simple PDF processor if Docling is not available
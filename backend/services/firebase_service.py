@@ -1,69 +1,247 @@
 """
 Firebase Admin SDK Service
 Handles Firebase authentication and Firestore operations from backend
+
+Two Firestore clients are available:
+    get_firestore_client()        sync client for Celery tasks and scripts
+    get_async_firestore_client()  asyncio client for API routes, shared by
+                                  all requests on the event loop, so a
+                                  Firestore round-trip never blocks the loop
+The get_document / set_document / update_document helpers use the async one.
+BulkWriter batches many writes from scripts and pipelines.
+
+verify_token() keeps verified ID tokens in memory until they expire, and
+start_key_refresh() refreshes Google's signing keys in the background, so
+the request path neither re-verifies a token nor waits on a cert fetch.
 """
 
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+
 import firebase_admin
 from firebase_admin import credentials, auth, firestore
-from typing import Optional
+from firebase_admin import _token_gen
+from starlette.concurrency import run_in_threadpool
+from google.api_core import exceptions as google_exceptions
+from google.cloud import firestore as google_firestore
+from typing import Any, Dict, List, Optional, Tuple
 import os
 
 from config import config
 
-# Initialize Firebase Admin SDK
+# Firebase Admin SDK, initialized on first use (credential discovery can
+# probe the metadata server, which takes seconds off GCP)
 _app = None
+_init_lock = threading.Lock()
 _db = None
+_async_db = None
+_async_db_loop = None
 
 
 def initialize_firebase():
-    """Initialize Firebase Admin SDK"""
+    """Initialize Firebase Admin SDK (once, on first use)"""
     global _app, _db
     
     if _app is not None:
         return _app
     
-    try:
-        # Check if credentials file exists
-        if config.FIREBASE_CREDENTIALS_PATH and os.path.exists(config.FIREBASE_CREDENTIALS_PATH):
-            cred = credentials.Certificate(config.FIREBASE_CREDENTIALS_PATH)
-            _app = firebase_admin.initialize_app(cred)
-        else:
-            # Use default credentials (for Cloud Run, etc.)
-            _app = firebase_admin.initialize_app()
-        
-        _db = firestore.client()
-        print("Firebase Admin SDK initialized successfully")
-        return _app
-    except Exception as e:
-        print(f"Warning: Firebase initialization failed: {str(e)}")
-        print("Firebase features will not be available")
-        return None
+    with _init_lock:
+        if _app is not None:
+            return _app
+        try:
+            # Check if credentials file exists
+            if config.FIREBASE_CREDENTIALS_PATH and os.path.exists(config.FIREBASE_CREDENTIALS_PATH):
+                cred = credentials.Certificate(config.FIREBASE_CREDENTIALS_PATH)
+                _app = firebase_admin.initialize_app(cred)
+            else:
+                # Use default credentials (for Cloud Run, etc.)
+                _app = firebase_admin.initialize_app()
+            
+            _db = firestore.client()
+            print("Firebase Admin SDK initialized successfully")
+            return _app
+        except Exception as e:
+            print(f"Warning: Firebase initialization failed: {str(e)}")
+            print("Firebase features will not be available")
+            return None
 
 
 def get_firestore_client():
-    """Get Firestore client"""
+    """Get Firestore client (blocking; for Celery tasks and scripts)"""
     global _db
     if _db is None:
         initialize_firebase()
     return _db
 
 
+def get_async_firestore_client():
+    """
+    Get the asyncio Firestore client of the running event loop
+    
+    One client (and gRPC channel, which multiplexes concurrent calls) is
+    shared by every request. gRPC channels belong to the loop they were
+    created on, so another loop (e.g. a test's asyncio.run) gets its own.
+    """
+    global _async_db, _async_db_loop
+    loop = asyncio.get_running_loop()
+    if _async_db is not None and _async_db_loop is loop:
+        return _async_db
+    
+    app = initialize_firebase()
+    if app is None:
+        return None
+    try:
+        _async_db = google_firestore.AsyncClient(
+            credentials=app.credential.get_credential(),
+            project=app.project_id
+        )
+        _async_db_loop = loop
+        return _async_db
+    except Exception as e:
+        print(f"Warning: Async Firestore client unavailable: {str(e)}")
+        return None
+
+
+# Verified ID tokens: sha256(token) -> (expires_at, claims), least recently used first
+_token_cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+_key_refresh_thread = None
+_key_refresh_stop = threading.Event()
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _cached_claims(key: str) -> Optional[dict]:
+    """Claims of a verified token that has not expired yet"""
+    with _token_cache_lock:
+        entry = _token_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, claims = entry
+        if expires_at <= time.time():
+            del _token_cache[key]
+            return None
+        _token_cache.move_to_end(key)
+        return claims
+
+
+def _cache_claims(key: str, claims: dict) -> None:
+    """Remember verified claims until the token's exp (capped by TOKEN_CACHE_MAX_SECONDS)"""
+    if config.TOKEN_CACHE_MAX_ENTRIES <= 0:
+        return
+    expires_at = min(float(claims.get("exp", 0)), time.time() + config.TOKEN_CACHE_MAX_SECONDS)
+    if expires_at <= time.time():
+        return
+    with _token_cache_lock:
+        _token_cache[key] = (expires_at, claims)
+        _token_cache.move_to_end(key)
+        while len(_token_cache) > config.TOKEN_CACHE_MAX_ENTRIES:
+            _token_cache.popitem(last=False)
+
+
+def clear_token_cache() -> None:
+    """Forget all verified tokens (e.g. after revoking a user's sessions)"""
+    with _token_cache_lock:
+        _token_cache.clear()
+
+
+def _verify_id_token(token: str) -> dict:
+    initialize_firebase()
+    return auth.verify_id_token(token)
+
+
 async def verify_token(token: str) -> Optional[dict]:
     """
     Verify Firebase ID token
     
+    A token seen before is answered from memory until its exp claim; only
+    new tokens are verified, in the threadpool, since a verification may
+    have to fetch Google's signing keys.
+    
     Args:
         token: Firebase ID token
         
     Returns:
         Decoded token with user info, or None if invalid
     """
+    if not token:
+        return None
+    key = _token_key(token)
+    claims = _cached_claims(key)
+    if claims is not None:
+        return dict(claims)
+    
     try:
-        decoded_token = auth.verify_id_token(token)
-        return decoded_token
+        decoded_token = await run_in_threadpool(_verify_id_token, token)
     except Exception as e:
         print(f"Token verification failed: {str(e)}")
         return None
+    
+    _cache_claims(key, decoded_token)
+    return dict(decoded_token)
+
+
+def refresh_signing_keys() -> bool:
+    """
+    Re-fetch the public keys ID tokens are signed with
+    
+    firebase_admin caches the keys per their Cache-Control max-age and
+    fetches them again, on the request path, once they go stale. A
+    no-cache request through the SDK's own session replaces the cached
+    copy before that happens.
+    """
+    app = initialize_firebase()
+    if app is None:
+        return False
+    try:
+        # The SDK has no public hook for this; its verifier owns the cached session
+        request = auth._get_client(app)._token_verifier.request
+        response = request(_token_gen.ID_TOKEN_CERT_URI, headers={"Cache-Control": "no-cache"})
+        if response.status != 200:
+            print(f"Warning: Signing key refresh returned HTTP {response.status}")
+            return False
+        return True
+    except Exception as e:
+        print(f"Warning: Signing key refresh failed: {str(e)}")
+        return False
+
+
+def _refresh_keys_forever(interval: float) -> None:
+    while not _key_refresh_stop.is_set():
+        refresh_signing_keys()
+        _key_refresh_stop.wait(interval)
+
+
+def start_key_refresh(interval: Optional[float] = None) -> bool:
+    """Refresh the signing keys now and then every interval seconds, in a daemon thread"""
+    global _key_refresh_thread
+    interval = config.FIREBASE_KEY_REFRESH_SECONDS if interval is None else interval
+    if interval <= 0:
+        return False
+    if _key_refresh_thread is not None and _key_refresh_thread.is_alive():
+        return True
+    _key_refresh_stop.clear()
+    _key_refresh_thread = threading.Thread(
+        target=_refresh_keys_forever, args=(interval,), name="firebase-key-refresh", daemon=True
+    )
+    _key_refresh_thread.start()
+    return True
+
+
+def stop_key_refresh() -> None:
+    """Stop the background key refresh"""
+    global _key_refresh_thread
+    _key_refresh_stop.set()
+    if _key_refresh_thread is not None:
+        _key_refresh_thread.join(timeout=5)
+        _key_refresh_thread = None
 
 
 async def get_user(uid: str) -> Optional[dict]:
@@ -77,6 +255,7 @@ async def get_user(uid: str) -> Optional[dict]:
         User record or None
     """
     try:
+        initialize_firebase()
         user = auth.get_user(uid)
         return {
             "uid": user.uid,
@@ -89,17 +268,17 @@ async def get_user(uid: str) -> Optional[dict]:
         return None
 
 
-# Firestore helper functions
+# Firestore helper functions (async client)
 
 async def get_document(collection: str, document_id: str) -> Optional[dict]:
     """Get a document from Firestore"""
     try:
-        db = get_firestore_client()
+        db = get_async_firestore_client()
         if db is None:
             return None
         
         doc_ref = db.collection(collection).document(document_id)
-        doc = doc_ref.get()
+        doc = await doc_ref.get()
         
         if doc.exists:
             return {"id": doc.id, **doc.to_dict()}
@@ -112,12 +291,12 @@ async def get_document(collection: str, document_id: str) -> Optional[dict]:
 async def set_document(collection: str, document_id: str, data: dict) -> bool:
     """Set a document in Firestore"""
     try:
-        db = get_firestore_client()
+        db = get_async_firestore_client()
         if db is None:
             return False
         
         doc_ref = db.collection(collection).document(document_id)
-        doc_ref.set(data)
+        await doc_ref.set(data)
         return True
     except Exception as e:
         print(f"Failed to set document: {str(e)}")
@@ -127,17 +306,192 @@ async def set_document(collection: str, document_id: str, data: dict) -> bool:
 async def update_document(collection: str, document_id: str, data: dict) -> bool:
     """Update a document in Firestore"""
     try:
-        db = get_firestore_client()
+        db = get_async_firestore_client()
         if db is None:
             return False
         
         doc_ref = db.collection(collection).document(document_id)
-        doc_ref.update(data)
+        await doc_ref.update(data)
         return True
     except Exception as e:
         print(f"Failed to update document: {str(e)}")
         return False
 
 
-# Initialize on import
-initialize_firebase()
+
+# Bulk writes (sync client)
+
+# Firestore rejects commits with more than 500 writes or over 10MB
+MAX_BATCH_WRITES = 500
+MAX_BATCH_BYTES = 9 * 1024 * 1024
+
+# Commit errors worth another attempt; contention ones also slow the writer down
+_RETRYABLE_ERRORS = (
+    google_exceptions.Aborted,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.ResourceExhausted,
+)
+_CONTENTION_ERRORS = (google_exceptions.Aborted, google_exceptions.ResourceExhausted)
+
+
+def _approx_size(data: Optional[dict]) -> int:
+    if not data:
+        return 64
+    return len(json.dumps(data, default=str)) + 64
+
+
+class BulkWriter:
+    """
+    Buffers Firestore writes and commits them in batches
+    
+    Writes are committed in batches of up to MAX_BATCH_WRITES (or
+    MAX_BATCH_BYTES), when the buffer is full, every
+    FIRESTORE_BULK_FLUSH_SECONDS, and on flush()/close(). Failed commits are
+    retried with backoff; contention errors also halve the write rate, which
+    then grows back as commits succeed. A batch rejected for good (e.g. one
+    invalid document) is split in halves until the bad writes are isolated,
+    so the rest of it is still written. Writes that fail for good are
+    counted, their document paths kept in failed_refs, and writing continues.
+    
+    Usage:
+        with BulkWriter(db) as writer:
+            writer.set(ref, data)
+        print(writer.summary())
+    """
+    
+    def __init__(
+        self,
+        db,
+        batch_size: int = MAX_BATCH_WRITES,
+        max_writes_per_second: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        flush_seconds: Optional[float] = None
+    ):
+        self.db = db
+        self.batch_size = min(batch_size, MAX_BATCH_WRITES)
+        self.max_rate = max_writes_per_second or config.FIRESTORE_BULK_WRITES_PER_SECOND
+        self.max_retries = config.FIRESTORE_BULK_MAX_RETRIES if max_retries is None else max_retries
+        self.flush_seconds = config.FIRESTORE_BULK_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        
+        self._rate = self.max_rate
+        self._pending: List[Tuple[str, Any, Optional[dict], Dict]] = []
+        self._pending_bytes = 0
+        self._started = time.monotonic()
+        self._last_flush = self._started
+        self._next_commit = self._started
+        self.stats = {'writes': 0, 'batches': 0, 'retries': 0, 'failed': 0}
+        self.failed_refs: List[str] = []
+    
+    def set(self, ref, data: dict, merge: bool = False) -> None:
+        """Buffer a set"""
+        self._add('set', ref, data, {'merge': merge} if merge else {})
+    
+    def update(self, ref, data: dict) -> None:
+        """Buffer an update"""
+        self._add('update', ref, data, {})
+    
+    def delete(self, ref) -> None:
+        """Buffer a delete"""
+        self._add('delete', ref, None, {})
+    
+    def _add(self, op: str, ref, data: Optional[dict], options: Dict) -> None:
+        size = _approx_size(data)
+        if self._pending and self._pending_bytes + size > MAX_BATCH_BYTES:
+            self.flush()
+        self._pending.append((op, ref, data, options))
+        self._pending_bytes += size
+        if len(self._pending) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+    
+    def flush(self) -> None:
+        """Commit everything buffered"""
+        writes, self._pending, self._pending_bytes = self._pending, [], 0
+        self._last_flush = time.monotonic()
+        for start in range(0, len(writes), self.batch_size):
+            self._commit(writes[start:start + self.batch_size])
+    
+    def _commit(self, writes: List[Tuple[str, Any, Optional[dict], Dict]]) -> None:
+        # Pace commits so the average stays under the current write rate
+        wait = self._next_commit - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        
+        for attempt in range(self.max_retries + 1):
+            # A batch cannot be committed twice, so every attempt builds a new one
+            batch = self.db.batch()
+            for op, ref, data, options in writes:
+                if op == 'delete':
+                    batch.delete(ref)
+                else:
+                    getattr(batch, op)(ref, data, **options)
+            try:
+                batch.commit()
+                break
+            except _RETRYABLE_ERRORS as e:
+                if isinstance(e, _CONTENTION_ERRORS):
+                    self._rate = max(1.0, self._rate / 2)
+                if attempt == self.max_retries:
+                    self._fail(writes, e)
+                    return
+                self.stats['retries'] += 1
+                time.sleep(min(30.0, 2 ** attempt) * random.uniform(0.5, 1.0))
+            except Exception as e:
+                if len(writes) == 1:
+                    self._fail(writes, e)
+                    return
+                # One bad write fails the whole batch: bisect to keep the good ones
+                middle = len(writes) // 2
+                self._commit(writes[:middle])
+                self._commit(writes[middle:])
+                return
+        
+        self.stats['writes'] += len(writes)
+        self.stats['batches'] += 1
+        self._next_commit = time.monotonic() + len(writes) / self._rate
+        # Grow back towards the configured rate after a slowdown
+        self._rate = min(self.max_rate, self._rate * 1.5)
+    
+    def _fail(self, writes: List[Tuple[str, Any, Optional[dict], Dict]], error: Exception) -> None:
+        paths = [str(getattr(ref, 'path', ref)) for _, ref, _, _ in writes]
+        print(f"Warning: Bulk write of {len(writes)} documents failed ({', '.join(paths[:3])}): {str(error)}")
+        self.stats['failed'] += len(writes)
+        self.failed_refs.extend(paths)
+    
+    def close(self) -> Dict:
+        """Commit everything buffered and return the stats"""
+        self.flush()
+        return self.report()
+    
+    def report(self) -> Dict:
+        """Write counts so far with elapsed seconds and writes per second"""
+        elapsed = time.monotonic() - self._started
+        return {
+            **self.stats,
+            'failed_refs': list(self.failed_refs),
+            'seconds': round(elapsed, 2),
+            'writes_per_second': round(self.stats['writes'] / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+    
+    def summary(self) -> str:
+        """One-line throughput summary, naming the documents that failed"""
+        stats = self.report()
+        summary = (
+            f"Wrote {stats['writes']} documents in {stats['batches']} batches "
+            f"({stats['writes_per_second']}/s, {stats['retries']} retries, {stats['failed']} failed)"
+        )
+        if self.failed_refs:
+            shown = ', '.join(self.failed_refs[:10])
+            more = len(self.failed_refs) - 10
+            summary += f"; failed: {shown}" + (f" and {more} more" if more > 0 else "")
+        return summary
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        # Keep what was generated before an error
+        self.flush()
+        return False
+
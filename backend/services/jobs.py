@@ -0,0 +1,150 @@
+"""
+Job Deduplication
+Submits background generation jobs once per identical request
+
+Identical requests (same task and canonical parameters) share one task:
+    job:dedup:{digest}   id of the task doing the work
+    job:{task_id}:dedup  digest once a second request was handed the task
+                         (its result is shared), or "consumed" once its only
+                         requester read and deleted the result
+
+A second request gets the existing task id while the job is queued or
+running, or after it finished for JOB_DEDUP_TTL_SECONDS, in which case the
+status endpoint returns the stored result right away. Failed and consumed
+jobs are submitted again. Sharing, consuming and replacing a failed job are
+atomic Lua scripts, so concurrent requests cannot both win.
+"""
+
+from typing import Dict, Tuple
+import hashlib
+import json
+
+from celery import uuid
+
+from config import config
+from services.redis_client import get_redis
+
+
+CONSUMED = "consumed"
+
+# Replace the job of a digest, only if it still is the one found failed
+# KEYS[1] = job:dedup:{digest}; ARGV = failed id, new id, ttl
+_SWAP = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Mark a job shared before handing it out, unless its result was consumed
+# KEYS[1] = job:{task_id}:dedup; ARGV = digest, ttl
+_SHARE = """
+if redis.call('GET', KEYS[1]) == 'consumed' then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+# Claim a result for its only reader, unless it was shared
+# KEYS[1] = job:{task_id}:dedup; ARGV = ttl
+_CLAIM = """
+local marker = redis.call('GET', KEYS[1])
+if marker and marker ~= 'consumed' then
+    return 0
+end
+redis.call('SET', KEYS[1], 'consumed', 'EX', ARGV[1])
+return 1
+"""
+
+# Attempts at reusing or replacing a job before submitting without dedup
+MAX_ATTEMPTS = 3
+
+
+def _dedup_key(digest: str) -> str:
+    return f"job:dedup:{digest}"
+
+
+def _shared_key(task_id: str) -> str:
+    return f"job:{task_id}:dedup"
+
+
+def _normalize(value):
+    # Requests differing only in case or spacing ask for the same content
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    return value
+
+
+def job_key(task_name: str, params: Dict) -> str:
+    """Canonical digest of a job (task name plus normalized parameters)"""
+    canonical = {name: _normalize(value) for name, value in params.items() if value is not None}
+    if 'model' in params:
+        canonical['model'] = _normalize(params['model'] or config.DEFAULT_LLM_MODEL)
+    payload = json.dumps([task_name, canonical], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _failed(task, task_id: str) -> bool:
+    result = task.AsyncResult(task_id)
+    if result.state == 'FAILURE':
+        return True
+    # Generation tasks report errors as a result instead of raising
+    return result.state == 'SUCCESS' and isinstance(result.result, dict) and 'error' in result.result
+
+
+def submit_job(task, **kwargs) -> Tuple[str, bool]:
+    """
+    Submit a task unless an identical job is already queued, running or done
+
+    Args:
+        task: Celery task to run
+        **kwargs: Task keyword arguments
+
+    Returns:
+        Tuple of (task id, whether an existing job was reused)
+    """
+    try:
+        client = get_redis()
+        digest = job_key(task.name, kwargs)
+        task_id = uuid()
+        ttl = config.JOB_DEDUP_TTL_SECONDS
+        share = client.register_script(_SHARE)
+        swap = client.register_script(_SWAP)
+
+        for _ in range(MAX_ATTEMPTS):
+            if client.set(_dedup_key(digest), task_id, nx=True, ex=ttl):
+                break
+            existing = client.get(_dedup_key(digest))
+            if existing is None:
+                continue  # Expired in between
+            if not _failed(task, existing) and share(keys=[_shared_key(existing)], args=[digest, ttl]):
+                return existing, True
+            # Failed or consumed: replace it, unless another request already did
+            if swap(keys=[_dedup_key(digest)], args=[existing, task_id, ttl]):
+                break
+        else:
+            print(f"Warning: Job deduplication contended, submitting {task.name} directly")
+    except Exception as e:
+        print(f"Warning: Job deduplication unavailable, submitting {task.name} directly: {str(e)}")
+        return task.apply_async(kwargs=kwargs).id, False
+
+    task.apply_async(kwargs=kwargs, task_id=task_id)
+    return task_id, False
+
+
+def claim_result(task_id: str) -> bool:
+    """
+    Claim a finished job's result for deletion by its only requester
+
+    Returns False when other requests were handed the task, so the result
+    has to stay until it expires. A claimed job is never handed out again.
+    """
+    try:
+        client = get_redis()
+        claim = client.register_script(_CLAIM)
+        return bool(claim(keys=[_shared_key(task_id)], args=[config.JOB_DEDUP_TTL_SECONDS]))
+    except Exception as e:
+        print(f"Warning: Failed to check job deduplication for {task_id}: {str(e)}")
+        return False
@@ -3,26 +3,44 @@ LLM Service using LiteLLM for unified interface
 Supports Ollama, OpenAI, Anthropic, Google Gemini, and more
 """
 
-import litellm
 from typing import List, Dict, Any, Optional
 import json
+import threading
+import requests
 from config import config
+from services.admission import admit, estimate_tokens
+from services.chunker import TokenBudget
 
-# Configure LiteLLM
-litellm.set_verbose = config.DEBUG
-import requests
+# LiteLLM takes seconds to import (it loads every provider and the model
+# cost map), so it is imported and configured on the first LLM call
+_litellm = None
+_litellm_lock = threading.Lock()
 
-# Set API keys if provided
-if config.OPENAI_API_KEY:
-    litellm.openai_key = config.OPENAI_API_KEY
-if config.ANTHROPIC_API_KEY:
-    litellm.anthropic_key = config.ANTHROPIC_API_KEY
-if config.GEMINI_API_KEY:
-    litellm.gemini_key = config.GEMINI_API_KEY
 
-# Configure Ollama base URL
-if config.OLLAMA_BASE_URL:
-    litellm.api_base = config.OLLAMA_BASE_URL
+def get_litellm():
+    """Get the LiteLLM module, importing and configuring it on first use"""
+    global _litellm
+    if _litellm is not None:
+        return _litellm
+    
+    with _litellm_lock:
+        if _litellm is None:
+            import litellm
+            litellm.set_verbose = config.DEBUG
+            
+            # Set API keys if provided
+            if config.OPENAI_API_KEY:
+                litellm.openai_key = config.OPENAI_API_KEY
+            if config.ANTHROPIC_API_KEY:
+                litellm.anthropic_key = config.ANTHROPIC_API_KEY
+            if config.GEMINI_API_KEY:
+                litellm.gemini_key = config.GEMINI_API_KEY
+            
+            # Configure Ollama base URL
+            if config.OLLAMA_BASE_URL:
+                litellm.api_base = config.OLLAMA_BASE_URL
+            _litellm = litellm
+    return _litellm
 
 
 class LLMService:
@@ -35,6 +53,63 @@ class LLMService:
             return f"ollama/{model}"
         return model
 
+    @staticmethod
+    def count_tokens(text: str, model: Optional[str] = None) -> int:
+        """Count tokens with the model's tokenizer (LiteLLM falls back to tiktoken)"""
+        model = LLMService._ensure_model_prefix(model or config.DEFAULT_LLM_MODEL)
+        try:
+            return get_litellm().token_counter(model=model, text=text)
+        except Exception:
+            # Rough estimate: ~4 characters per token
+            return len(text) // 4 + 1
+
+    @staticmethod
+    def get_context_window(model: Optional[str] = None) -> int:
+        """Get the input context window (in tokens) the model will actually be served with"""
+        model = LLMService._ensure_model_prefix(model or config.DEFAULT_LLM_MODEL)
+        
+        # Ollama truncates to num_ctx regardless of what the model supports
+        if model.startswith("ollama/") and config.OLLAMA_NUM_CTX:
+            return config.OLLAMA_NUM_CTX
+        
+        try:
+            info = get_litellm().get_model_info(model)
+            window = info.get("max_input_tokens") or info.get("max_tokens")
+            if window:
+                return int(window)
+        except Exception:
+            pass
+        return config.LLM_DEFAULT_CONTEXT_WINDOW
+
+    @staticmethod
+    def adaptation_token_budget(
+        model: Optional[str] = None,
+        level: str = "B1",
+        target_language: str = "German"
+    ) -> TokenBudget:
+        """
+        Largest chunk (in tokens) that adapt_content can process without truncation
+        
+        The context window has to hold the system prompt, the chunk and the
+        adapted output, which is expected to be ADAPT_OUTPUT_RATIO times the
+        chunk plus a fixed overhead for the JSON fields and reasoning.
+        """
+        model = LLMService._ensure_model_prefix(model or config.DEFAULT_LLM_MODEL)
+        window = LLMService.get_context_window(model)
+        system_tokens = LLMService.count_tokens(
+            LLMService._adapt_system_prompt(level, target_language), model
+        )
+        
+        available = window - system_tokens - config.ADAPT_OUTPUT_OVERHEAD_TOKENS
+        tokens = int(available / (1 + config.ADAPT_OUTPUT_RATIO))
+        tokens = max(256, min(tokens, config.CHUNK_MAX_TOKENS))
+        
+        return TokenBudget(
+            tokens=tokens,
+            count_tokens=lambda text: LLMService.count_tokens(text, model),
+            key=model
+        )
+
     @staticmethod
     async def chat_completion(
         messages: List[Dict[str, str]],
@@ -68,6 +143,9 @@ class LLMService:
             "temperature": temperature,
         }
         
+        if model.startswith("ollama/") and config.OLLAMA_NUM_CTX:
+            kwargs["num_ctx"] = config.OLLAMA_NUM_CTX
+        
         if max_tokens:
             kwargs["max_tokens"] = max_tokens
             
@@ -75,10 +153,13 @@ class LLMService:
             kwargs["response_format"] = {"type": "json_object"}
         
         try:
-            response = litellm.completion(**kwargs)
+            # Wait for a slot on the inference backend (shared by every process)
+            async with admit(model, estimate_tokens(messages, max_tokens)) as lease:
+                response = await get_litellm().acompletion(**kwargs)
+                lease.record(response)
             return response.choices[0].message.content
         except Exception as e:
-            raise Exception(f"LLM completion failed: {str(e)}")
+            raise Exception(f"LLM completion failed: {str(e)}") from e
     
     @staticmethod
     async def generate_story(
@@ -386,15 +467,9 @@ Do not include markdown formatting like ```json. Just the raw JSON object."""
         return json.loads(response)
     
     @staticmethod
-    async def adapt_content(
-        text: str,
-        level: str,
-        model: Optional[str] = None,
-        target_language: str = "German"
-    ) -> Dict[str, str]:
-        """Adapt and expand content to target level"""
-        
-        system_prompt = f"""You are an expert {target_language} language teacher and editor.
+    def _adapt_system_prompt(level: str, target_language: str) -> str:
+        """System prompt for adapt_content (also used to size chunks)"""
+        return f"""You are an expert {target_language} language teacher and editor.
 Your task is to adapt the provided text for a learner at the {level} level.
 
 The input text might be a short summary. Your goal is to EXPAND it into a full, engaging article (approx. 300-500 words).
@@ -417,6 +492,17 @@ Example JSON:
   "adapted_text": "Full expanded text in {target_language}..."
 }}
 Do not include markdown formatting like ```json. Just the raw JSON object."""
+    
+    @staticmethod
+    async def adapt_content(
+        text: str,
+        level: str,
+        model: Optional[str] = None,
+        target_language: str = "German"
+    ) -> Dict[str, str]:
+        """Adapt and expand content to target level"""
+        
+        system_prompt = LLMService._adapt_system_prompt(level, target_language)
         
         messages = [
             {"role": "system", "content": system_prompt},
@@ -723,6 +809,63 @@ Do not include markdown formatting like ```json. Just the raw JSON object.
             print(f"Error generating context card: {e}")
             raise e
 
+    @staticmethod
+    async def gloss_vocabulary(
+        words: List[Dict[str, str]],
+        level: str,
+        model: Optional[str] = None,
+        target_language: str = "German",
+        native_language: str = "English"
+    ) -> List[Dict[str, Any]]:
+        """
+        Gloss a list of words in one call
+
+        Args:
+            words: Dicts with 'word' and the 'example' sentence it was found in
+
+        Returns:
+            One dict per word with definition, gender and whether it is a
+            proper noun (skip)
+        """
+        word_list = "\n".join(f"- {item['word']}: {item.get('example', '')}" for item in words)
+        system_prompt = f"""
+You are an expert {target_language} teacher. For each {target_language} word below (with the sentence it appears in), give a short {native_language} definition suitable for a {level} learner, as used in that sentence.
+For nouns, give the grammatical gender ("m", "f" or "n"), otherwise null. Set "skip" to true for names of people or places.
+
+Return ONLY valid JSON with this structure, one entry per word in the same order:
+{{
+  "words": [
+    {{ "word": "Word", "definition": "Short definition", "gender": "m", "skip": false }}
+  ]
+}}
+Do not include markdown formatting like ```json. Just the raw JSON object.
+"""
+
+        try:
+            response = await LLMService.chat_completion(
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": word_list}
+                ],
+                model=model,
+                temperature=0.2,
+                max_tokens=60 * len(words) + 200
+            )
+
+            # Clean up response
+            content = response.replace("```json", "").replace("```", "").strip()
+
+            # Remove <think> tags if present
+            if "<think>" in content:
+                import re
+                content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL).strip()
+
+            return json.loads(content).get("words", [])
+
+        except Exception as e:
+            print(f"Error glossing vocabulary: {e}")
+            raise e
+
     @staticmethod
     async def generate_curriculum(level: str, model: str = None) -> dict:
         """
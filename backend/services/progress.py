@@ -0,0 +1,152 @@
+"""
+Book Processing Progress
+Publishes structured progress events to Redis and streams them to clients
+
+Each book has a snapshot hash (``book:{id}:progress``) holding its latest
+state and a pub/sub channel of the same name that receives the full snapshot
+after every change. Late subscribers read the snapshot first, so they never
+miss the current state, and every event is self-contained.
+"""
+
+from typing import AsyncIterator, Dict, Optional
+import json
+import time
+
+from config import config
+from services.redis_client import get_async_redis, get_redis
+
+# Phases in order; the last three are terminal
+PHASES = ('queued', 'converting', 'chunking', 'saving', 'adapting', 'ready', 'failed', 'cancelled')
+TERMINAL_PHASES = ('ready', 'failed', 'cancelled')
+
+# Overall progress (percent) at the start of each phase
+PHASE_PROGRESS = {'queued': 0, 'converting': 2, 'chunking': 8, 'saving': 9, 'adapting': 10, 'ready': 100}
+
+INT_FIELDS = ('pages_total', 'chapters_total', 'chapters_adapted', 'chapters_failed')
+FLOAT_FIELDS = ('started_at', 'updated_at', 'adapt_started_at', 'conversion_seconds')
+
+
+def progress_key(book_id: str) -> str:
+    """Redis key of a book's progress snapshot (also its pub/sub channel)"""
+    return f"book:{book_id}:progress"
+
+
+def decode_progress(raw: Dict[str, str], now: Optional[float] = None) -> Dict:
+    """
+    Turn a raw snapshot hash into a progress event
+    
+    Adds the overall ``progress`` percentage and, while adapting, an
+    ``eta_seconds`` estimate from the average time per adapted chapter.
+    """
+    event = dict(raw)
+    for field in INT_FIELDS:
+        if field in event:
+            event[field] = int(event[field])
+    for field in FLOAT_FIELDS:
+        if field in event:
+            event[field] = float(event[field])
+    
+    phase = event.get('phase', 'queued')
+    progress = PHASE_PROGRESS.get(phase)
+    eta = None
+    
+    total = event.get('chapters_total', 0)
+    done = event.get('chapters_adapted', 0) + event.get('chapters_failed', 0)
+    if phase == 'adapting' and total:
+        progress = PHASE_PROGRESS['adapting'] + 90 * min(done, total) / total
+        started = event.get('adapt_started_at')
+        if started and done:
+            elapsed = (now or time.time()) - started
+            eta = round(elapsed / done * max(total - done, 0))
+    
+    event['progress'] = round(progress, 1) if progress is not None else None
+    event['eta_seconds'] = eta
+    return event
+
+
+def report_progress(
+    book_id: str,
+    phase: Optional[str] = None,
+    increment: Optional[Dict[str, int]] = None,
+    **fields
+) -> Optional[Dict]:
+    """
+    Update a book's progress snapshot and publish it (call from Celery tasks)
+    
+    Progress is best effort: Redis errors are logged and never fail the task.
+    
+    Args:
+        book_id: Book ID
+        phase: New phase, if it changed
+        increment: Counters to increase atomically (e.g. chapters_adapted)
+        **fields: Other fields to set (pages_total, chapters_total, error, ...)
+        
+    Returns:
+        The published event, or None if Redis is unavailable
+    """
+    if phase is not None:
+        fields['phase'] = phase
+    fields['updated_at'] = time.time()
+    key = progress_key(book_id)
+    
+    try:
+        client = get_redis()
+        with client.pipeline() as pipe:
+            pipe.hset(key, mapping={k: v for k, v in fields.items() if v is not None})
+            for field, amount in (increment or {}).items():
+                pipe.hincrby(key, field, amount)
+            pipe.expire(key, config.PROGRESS_TTL_SECONDS)
+            pipe.hgetall(key)
+            snapshot = pipe.execute()[-1]
+        
+        event = decode_progress(snapshot)
+        client.publish(key, json.dumps(event))
+        return event
+    except Exception as e:
+        print(f"Warning: Failed to publish progress for book {book_id}: {str(e)}")
+        return None
+
+
+async def get_progress(book_id: str) -> Optional[Dict]:
+    """Get the latest progress event of a book, or None if unknown"""
+    raw = await get_async_redis().hgetall(progress_key(book_id))
+    return decode_progress(raw) if raw else None
+
+
+def _sse(event: Dict) -> str:
+    return f"event: progress\ndata: {json.dumps(event)}\n\n"
+
+
+async def stream_progress(book_id: str, heartbeat_seconds: float = 15) -> AsyncIterator[str]:
+    """
+    Stream a book's progress as Server-Sent Events
+    
+    Yields the current snapshot, then every published event, and stops after
+    a terminal phase. Comment lines are sent as heartbeats so proxies keep
+    the connection open.
+    """
+    key = progress_key(book_id)
+    pubsub = get_async_redis().pubsub()
+    
+    # Subscribe before reading the snapshot so no event falls in between
+    await pubsub.subscribe(key)
+    try:
+        current = await get_progress(book_id)
+        if current is not None:
+            yield _sse(current)
+            if current.get('phase') in TERMINAL_PHASES:
+                return
+        
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat_seconds)
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            
+            event = json.loads(message['data'])
+            yield _sse(event)
+            if event.get('phase') in TERMINAL_PHASES:
+                return
+    finally:
+        await pubsub.unsubscribe(key)
+        await pubsub.aclose()
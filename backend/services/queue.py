@@ -3,8 +3,19 @@ Celery Task Queue
 Handles background processing for book imports, content adaptation, etc.
 """
 
-from celery import Celery
+from celery import Celery, chain, chord, group, uuid
+from celery.states import READY_STATES
+from celery.signals import (
+    before_task_publish, task_failure, task_postrun, task_prerun, task_retry, task_success,
+    worker_process_init, worker_process_shutdown, worker_shutdown
+)
 from config import config
+from services import task_metrics
+from services.batch_jobs import BATCH_HEADER, record_outcome
+from services.jobs import claim_result
+from services.result_codec import SERIALIZER_NAME as COMPACT_SERIALIZER, register_compact_serializer
+
+register_compact_serializer()
 
 # Initialize Celery
 celery_app = Celery(
@@ -13,88 +24,297 @@ celery_app = Celery(
     backend=config.CELERY_RESULT_BACKEND
 )
 
+# Queues, in the order workers should consume them
+INTERACTIVE_QUEUE = 'interactive'  # Cards and stories a user is waiting for in the UI
+BULK_QUEUE = 'bulk'                # Chapter adaptation and other long LLM batches
+CONVERSION_QUEUE = 'conversion'    # Document conversion (CPU/memory heavy)
+QUEUES = (INTERACTIVE_QUEUE, BULK_QUEUE, CONVERSION_QUEUE)
+
+# Redis priorities: lower is more urgent
+INTERACTIVE_PRIORITY = 0
+BULK_PRIORITY = 6
+CONVERSION_PRIORITY = 9
+
 # Configure Celery
 celery_app.conf.update(
     task_serializer='json',
     accept_content=['json'],
-    result_serializer='json',
+    result_serializer=config.RESULT_SERIALIZER,
+    result_accept_content=['json', COMPACT_SERIALIZER],
+    # Redis drops results after this long instead of keeping them forever
+    result_expires=config.RESULT_EXPIRES_SECONDS,
     timezone='UTC',
     enable_utc=True,
+    task_default_queue=INTERACTIVE_QUEUE,
+    task_routes={
+        'generate_*': {'queue': INTERACTIVE_QUEUE, 'priority': INTERACTIVE_PRIORITY},
+        'test_task': {'queue': INTERACTIVE_QUEUE, 'priority': INTERACTIVE_PRIORITY},
+        'adapt_chapter': {'queue': BULK_QUEUE, 'priority': BULK_PRIORITY},
+        'finalize_book': {'queue': BULK_QUEUE, 'priority': BULK_PRIORITY},
+        'extract_vocabulary': {'queue': BULK_QUEUE, 'priority': BULK_PRIORITY},
+        'process_book_upload': {'queue': CONVERSION_QUEUE, 'priority': CONVERSION_PRIORITY},
+    },
+    broker_transport_options={
+        # A worker listening on several queues always drains them in the order
+        # given to -Q, instead of round robin
+        'queue_order_strategy': 'priority',
+        'priority_steps': list(range(10)),
+        'sep': ':',
+        # Late-acked tasks are redelivered if unacknowledged for this long,
+        # so it must exceed the longest conversion
+        'visibility_timeout': config.TASK_VISIBILITY_TIMEOUT_SECONDS,
+    },
+    # Reserve one task at a time, so a worker never sits on a backlog of
+    # bulk tasks while interactive ones are waiting
+    worker_prefetch_multiplier=1,
 )
 
+if config.WORKER_MAX_MEMORY_MB:
+    # Replace a pool process once it grows past this size (checked after each task)
+    celery_app.conf.worker_max_memory_per_child = config.WORKER_MAX_MEMORY_MB * 1024
+
+
+@worker_process_init.connect
+def preload_worker_resources(**kwargs):
+    """Load the document converter once per worker process instead of once per task"""
+    if config.PRELOAD_DOCUMENT_CONVERTER:
+        from services.document_processor import preload_document_processor
+        preload_document_processor()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def close_worker_resources(**kwargs):
+    """Close the async runtime's Redis connections and the vocabulary process pool"""
+    from services.async_runtime import shutdown
+    from services.vocabulary import shutdown_pool
+    shutdown()
+    shutdown_pool()
+
+
+def interactive_backlog() -> int:
+    """Number of interactive tasks waiting to be picked up"""
+    return task_metrics.queue_depth(celery_app, INTERACTIVE_QUEUE)
+
+
+# Task metrics (see services/task_metrics.py): the publish hook runs in
+# whichever process sends the task, the others in workers
+if config.TASK_METRICS_ENABLED:
+    @before_task_publish.connect(weak=False)
+    def _stamp_enqueued(headers=None, **kwargs):
+        if headers is not None:
+            task_metrics.mark_enqueued(headers)
+
+    @task_prerun.connect(weak=False)
+    def _record_task_start(task=None, **kwargs):
+        task_metrics.record_start(task)
+
+    @task_postrun.connect(weak=False)
+    def _record_task_finish(task=None, **kwargs):
+        task_metrics.record_finish(task)
+
+    @task_success.connect(weak=False)
+    def _count_success(sender=None, **kwargs):
+        task_metrics.count_outcome(sender.name, 'succeeded')
+
+    @task_failure.connect(weak=False)
+    def _count_failure(sender=None, **kwargs):
+        task_metrics.count_outcome(sender.name, 'failed')
+
+    @task_retry.connect(weak=False)
+    def _count_retry(sender=None, **kwargs):
+        task_metrics.count_outcome(sender.name, 'retried')
+
+
+# Batch jobs record how they ended in their batch, which outlives the results
+@task_postrun.connect(weak=False)
+def _record_batch_outcome(task=None, state=None, retval=None, **kwargs):
+    record_outcome(task, state, retval)
+
+
+def collect_queue_metrics() -> dict:
+    """Snapshot of queue and task metrics for every queue"""
+    return task_metrics.collect_metrics(celery_app, list(QUEUES))
+
 
 # Task definitions
 
-@celery_app.task(name='process_book_upload')
-def process_book_upload(user_id: str, book_id: str, file_path: str, level: str, should_adapt: bool):
+@celery_app.task(name='process_book_upload', acks_late=True, reject_on_worker_lost=True)
+def process_book_upload(user_id: str, book_id: str, file_path: str, level: str, should_adapt: bool, content_hash: str = None, model: str = None, target_language: str = "German"):
     """
     Process uploaded book in background
     
+    Safe to run again after a crash (the message is only acknowledged once
+    the task finishes): chapters saved by an earlier attempt are detected
+    through the book's checkpoint and only chapters not yet adapted are sent
+    for adaptation.
+    
     Args:
         user_id: User ID
         book_id: Book ID
         file_path: Path to uploaded file
         level: Target CEFR level
         should_adapt: Whether to adapt content
+        content_hash: SHA-256 of the uploaded file, used for the conversion cache
+        model: LLM model used for adaptation (also sizes the chunks)
+        target_language: Language of the book
     """
-    from services.document_processor import DocumentProcessor
+    from services.document_processor import DocumentProcessor, get_document_processor, record_document_processed
     from services.llm import LLMService
     from services.firebase_service import get_firestore_client
-    import asyncio
+    from services.conversion_cache import hash_file
+    from services import book_store
+    from services.progress import report_progress
+    from services.book_jobs import BookCancelled, add_tasks, check_cancelled
+    import time
     
     try:
-        # Process document
-        processor = DocumentProcessor()
-        result = processor.process_document(file_path)
-        
-        # Chunk text
-        chunks = processor.chunk_text(result['text'])
-        
-        # Save to Firestore
+        check_cancelled(book_id)
         db = get_firestore_client()
         if db is None:
             raise Exception("Firestore not available")
         
-        book_ref = db.collection('users').document(user_id).collection('books').document(book_id)
+        content_hash = content_hash or hash_file(file_path)
+        token_budget = None
+        if should_adapt and config.CHUNK_BY_TOKENS:
+            token_budget = LLMService.adaptation_token_budget(model, level, target_language)
+        checkpoint = {
+            'contentHash': content_hash,
+            'chunkKey': DocumentProcessor.chunk_key(token_budget=token_budget),
+            'chaptersSaved': True,
+        }
         
-        # Update with chunks
-        book_ref.update({
-            'chapters': [{'title': c['title'], 'content': c['content'], 'isAdapted': False} for c in chunks],
-            'totalChapters': len(chunks),
-            'metadata': result['metadata'],
-        })
-        
-        # Adapt chapters if requested
-        if should_adapt:
-            for i, chunk in enumerate(chunks):
-                # Update processing status
-                book_ref.update({'currentProcessingChapter': i + 1})
-                
-                # Adapt content
-                adapted = asyncio.run(LLMService.adapt_content(
-                    text=chunk['content'],
-                    level=level,
-                    target_language='German'
-                ))
-                
-                # Update chapter
-                chapters = book_ref.get().to_dict()['chapters']
-                chapters[i]['content'] = adapted['content']
-                chapters[i]['isAdapted'] = True
-                book_ref.update({'chapters': chapters})
+        timings = None
+        if book_store.get_checkpoint(db, user_id, book_id) == checkpoint:
+            # An earlier attempt already converted, chunked and saved this book
+            pending = book_store.get_pending_chapters(db, user_id, book_id)
+            chapters = [(c['index'], c['content']) for c in pending]
+            total = book_store.book_ref(db, user_id, book_id).get(field_paths=['totalChapters']).to_dict()['totalChapters']
+            print(f"Book {book_id}: resuming from checkpoint, {len(chapters)} of {total} chapters left")
+        else:
+            report_progress(book_id, 'converting', started_at=time.time())
+            
+            # Process document with the worker-resident processor
+            processor = get_document_processor()
+            try:
+                result = processor.process_document(file_path, content_hash=content_hash)
+            finally:
+                record_document_processed()
+            check_cancelled(book_id)
+            report_progress(
+                book_id, 'chunking',
+                pages_total=result['page_count'],
+                conversion_seconds=result['conversion_seconds']
+            )
             
-            # Mark as complete
-            book_ref.update({'currentProcessingChapter': None})
+            # Chunk text, sized to the adaptation model's context when adapting
+            chunk_started = time.perf_counter()
+            chunks = processor.chunk_document(result['text'], content_hash=content_hash, token_budget=token_budget)
+            timings = {
+                'conversion_seconds': result['conversion_seconds'],
+                'chunking_seconds': round(time.perf_counter() - chunk_started, 3),
+                'cache_hit': result['cache_hit'],
+            }
+            print(f"Book {book_id}: converted in {timings['conversion_seconds']}s "
+                  f"(cache hit: {timings['cache_hit']}), chunked in {timings['chunking_seconds']}s")
+            
+            # Save chunks as chapter documents (merge: the book document may not exist yet).
+            # The checkpoint is written with the chapter index, after every chapter.
+            check_cancelled(book_id)
+            report_progress(book_id, 'saving', chapters_total=len(chunks))
+            adapted = set(book_store.save_chapters(db, user_id, book_id, chunks, {
+                'metadata': result['metadata'],
+                'processingTimings': timings,
+                'status': 'adapting' if should_adapt and chunks else 'ready',
+                'currentProcessingChapter': 1 if should_adapt and chunks else None,
+                'checkpoint': checkpoint,
+            }))
+            chapters = [(i, c['content']) for i, c in enumerate(chunks) if i + 1 not in adapted]
+            total = len(chunks)
+        
+        # Fan out adaptation of the chapters not adapted yet
+        pipeline_id = None
+        if should_adapt and chapters:
+            pipeline = build_adaptation_pipeline(user_id, book_id, chapters, level, model, target_language)
+            # Record the task ids first, so a cancel can revoke every chapter
+            add_tasks(book_id, pipeline_task_ids(pipeline))
+            check_cancelled(book_id)
+            report_progress(
+                book_id, 'adapting',
+                adapt_started_at=time.time(),
+                chapters_total=total,
+                chapters_adapted=total - len(chapters),
+                chapters_failed=0
+            )
+            pipeline_id = pipeline.apply_async().id
+        elif should_adapt and total:
+            # Every chapter was adapted before the crash; only finalizing is left
+            finalize_book.delay([], user_id=user_id, book_id=book_id)
+        else:
+            report_progress(book_id, 'ready')
         
-        return {'status': 'success', 'book_id': book_id}
+        return {'status': 'success', 'book_id': book_id, 'timings': timings, 'pipeline_id': pipeline_id}
         
+    except BookCancelled:
+        print(f"Book {book_id} cancelled, stopping processing")
+        return {'status': 'cancelled', 'book_id': book_id}
     except Exception as e:
         print(f"Book processing failed: {str(e)}")
+        report_progress(book_id, 'failed', error=str(e))
         return {'status': 'error', 'error': str(e)}
 
 
-@celery_app.task(name='adapt_chapter')
-def adapt_chapter(user_id: str, book_id: str, chapter_index: int, content: str, level: str):
+def build_adaptation_pipeline(
+    user_id: str,
+    book_id: str,
+    chapters: list,
+    level: str,
+    model: str = None,
+    target_language: str = "German"
+):
+    """
+    Build the chapter adaptation pipeline for a book
+    
+    Chapters are spread over BOOK_ADAPT_PARALLELISM lanes; each lane is a
+    chain that adapts its chapters one after another, so at most that many
+    chapters of one book are in flight at once. A chord runs finalize_book
+    once every lane is done.
+    
+    Args:
+        chapters: (chapter index, content) pairs of the chapters to adapt
+    """
+    lane_count = max(1, min(config.BOOK_ADAPT_PARALLELISM, len(chapters)))
+    # Task ids are assigned up front so they can be revoked on cancel
+    lanes = [
+        chain(*[
+            adapt_chapter.si(user_id, book_id, index, content, level, model, target_language).set(task_id=uuid())
+            for index, content in chapters[lane::lane_count]
+        ])
+        for lane in range(lane_count)
+    ]
+    finalize = finalize_book.s(user_id=user_id, book_id=book_id).set(task_id=uuid())
+    return chord(group(lanes), finalize)
+
+
+def pipeline_task_ids(pipeline) -> list:
+    """Task ids of every chapter and the finalize step of an adaptation pipeline"""
+    ids = [task.options['task_id'] for lane in pipeline.tasks for task in lane.tasks]
+    return ids + [pipeline.body.options['task_id']]
+
+
+def _defer_again(task_id: str) -> bool:
+    """Whether a chapter may step back once more (never when the count is unavailable)"""
+    from services.retries import record_deferral
+    
+    try:
+        return record_deferral(task_id) <= config.PREEMPT_MAX_DEFERRALS
+    except Exception as e:
+        print(f"Warning: Failed to count deferrals of {task_id}: {str(e)}")
+        return False
+
+
+@celery_app.task(name='adapt_chapter', bind=True, acks_late=True, reject_on_worker_lost=True)
+def adapt_chapter(self, user_id: str, book_id: str, chapter_index: int, content: str, level: str, model: str = None, target_language: str = "German"):
     """
     Adapt a single chapter
     
@@ -104,61 +324,212 @@ def adapt_chapter(user_id: str, book_id: str, chapter_index: int, content: str,
         chapter_index: Chapter index
         content: Chapter content
         level: Target CEFR level
+        model: LLM model to use
+        target_language: Language of the book
     """
     from services.llm import LLMService
     from services.firebase_service import get_firestore_client
-    import asyncio
+    from services import book_store
+    from services.admission import run_as_tenant
+    from services.async_runtime import run_async
+    from services.progress import report_progress
+    from services.book_jobs import BookCancelled, check_cancelled, is_cancelled, run_cancellable
+    from services.retries import retry_or_dead_letter
+    
+    # Revoked tasks that were already reserved still start; skip them here
+    if is_cancelled(book_id):
+        return {'status': 'cancelled', 'chapter_index': chapter_index}
+    
+    # Chapter boundaries are preemption points: while users are waiting on
+    # interactive tasks, step back and let them have the LLM first. Deferrals
+    # are counted apart from self.request.retries, which error retries raise too
+    if config.PREEMPT_BULK_FOR_INTERACTIVE:
+        backlog = interactive_backlog()
+        if backlog and _defer_again(self.request.id):
+            print(f"Deferring chapter {chapter_index} of book {book_id}: {backlog} interactive tasks waiting")
+            raise self.retry(countdown=config.PREEMPT_DEFER_SECONDS, max_retries=None)
     
     try:
-        # Adapt content
-        adapted = asyncio.run(LLMService.adapt_content(
+        db = get_firestore_client()
+        if db is None:
+            raise Exception("Firestore not available")
+        
+        # A redelivered task may find its chapter already adapted
+        if book_store.is_chapter_adapted(db, user_id, book_id, chapter_index, content):
+            return {'status': 'skipped', 'chapter_index': chapter_index}
+        
+        # Adapt content, aborting the LLM call if the book is cancelled meanwhile
+        # and queueing fairly against other users' LLM calls
+        adapted = run_async(run_cancellable(run_as_tenant(LLMService.adapt_content(
             text=content,
             level=level,
-            target_language='German'
-        ))
+            model=model,
+            target_language=target_language
+        ), user_id), book_id))
+        check_cancelled(book_id)
+        
+        # One small write per chapter, safe to run in parallel with other chapters
+        book_store.mark_chapter_adapted(db, user_id, book_id, chapter_index, adapted['content'], source=content)
+        report_progress(book_id, increment={'chapters_adapted': 1})
         
-        # Update in Firestore
+        return {'status': 'success', 'chapter_index': chapter_index}
+        
+    except BookCancelled:
+        print(f"Book {book_id} cancelled, dropping chapter {chapter_index}")
+        return {'status': 'cancelled', 'chapter_index': chapter_index}
+    except Exception as e:
+        print(f"Chapter adaptation failed: {str(e)}")
+        retry_or_dead_letter(self, e)
+        report_progress(book_id, increment={'chapters_failed': 1})
+        return {'status': 'error', 'error': str(e)}
+
+
+@celery_app.task(name='finalize_book', acks_late=True, reject_on_worker_lost=True)
+def finalize_book(results: list, user_id: str, book_id: str):
+    """
+    Mark a book as processed once all chapter lanes have finished
+    
+    Args:
+        results: Results of the last chapter task of each lane
+        user_id: User ID
+        book_id: Book ID
+    """
+    from services.firebase_service import get_firestore_client
+    from services import book_store
+    from services.progress import report_progress
+    from services.book_jobs import is_cancelled
+    
+    if is_cancelled(book_id):
+        return {'status': 'cancelled', 'book_id': book_id}
+    
+    try:
         db = get_firestore_client()
         if db is None:
             raise Exception("Firestore not available")
         
-        book_ref = db.collection('users').document(user_id).collection('books').document(book_id)
-        chapters = book_ref.get().to_dict()['chapters']
-        chapters[chapter_index]['content'] = adapted['content']
-        chapters[chapter_index]['isAdapted'] = True
-        book_ref.update({'chapters': chapters})
+        book_ref = book_store.book_ref(db, user_id, book_id)
+        book = book_ref.get().to_dict()
+        adapted = set(book.get('adaptedChapters', []))
+        failed = [i for i in range(book.get('totalChapters', 0)) if i + 1 not in adapted]
         
-        return {'status': 'success', 'chapter_index': chapter_index}
+        book_ref.update({
+            'currentProcessingChapter': None,
+            'status': 'ready',
+            'failedChapters': failed,
+        })
+        report_progress(book_id, 'ready', chapters_failed=len(failed))
+        
+        return {'status': 'success', 'book_id': book_id, 'failed_chapters': failed}
         
     except Exception as e:
-        print(f"Chapter adaptation failed: {str(e)}")
+        print(f"Book finalization failed: {str(e)}")
         return {'status': 'error', 'error': str(e)}
 
 
-@celery_app.task(name='extract_vocabulary')
-def extract_vocabulary(user_id: str, source_id: str, source_type: str, text: str):
+@celery_app.task(name='extract_vocabulary', bind=True, acks_late=True, reject_on_worker_lost=True)
+def extract_vocabulary(
+    self,
+    user_id: str,
+    source_id: str,
+    source_type: str,
+    text: str = None,
+    level: str = "B1",
+    model: str = None,
+    target_language: str = "German",
+    native_language: str = "English"
+):
     """
-    Extract vocabulary from text
+    Extract vocabulary from a story or book into a deck
+    
+    Words are counted and ranked locally (see services/vocabulary.py); only
+    the top VOCAB_DECK_SIZE are sent to the LLM, in one call, for glosses.
     
     Args:
         user_id: User ID
         source_id: Source ID (story or book)
         source_type: Source type ('story' or 'book')
-        text: Text to extract from
+        text: Text to extract from (default: the stored story or book chapters)
+        level: CEFR level of the learner
+        model: LLM model for the glosses
+        target_language: Language of the text (German only)
+        native_language: Language of the definitions
     """
-    # TODO: Implement vocabulary extraction
-    # This would use NLP to extract important words and create a deck
-    pass
+    from services.llm import LLMService
+    from services.firebase_service import get_firestore_client
+    from services import book_store, vocabulary
+    from services.admission import run_as_tenant
+    from services.async_runtime import run_async
+    from services.retries import retry_or_dead_letter
+    
+    try:
+        if target_language != "German":
+            raise ValueError(f"Vocabulary extraction does not support {target_language}")
+        
+        db = get_firestore_client()
+        if db is None:
+            raise Exception("Firestore not available")
+        
+        if source_type == 'book':
+            source = book_store.book_ref(db, user_id, source_id).get().to_dict() or {}
+            chapters = [text] if text else [chapter.get('content', '') for chapter in book_store.get_chapters(db, user_id, source_id)]
+        else:
+            story_ref = db.collection('users').document(user_id).collection('stories').document(source_id)
+            source = story_ref.get().to_dict() or {}
+            chapters = [text or source.get('content', '')]
+        
+        # Leave out words the user already has, in this deck or another
+        known = vocabulary.saved_words(db, user_id)
+        ranked = vocabulary.extract_vocabulary(chapters, level=level, limit=2 * config.VOCAB_DECK_SIZE)
+        words = [item for item in ranked if item['word'].lower() not in known][:config.VOCAB_DECK_SIZE]
+        if not words:
+            return {'status': 'success', 'deck_id': vocabulary.deck_id(source_type, source_id), 'words_added': 0}
+        
+        glosses = run_async(run_as_tenant(LLMService.gloss_vocabulary(
+            words=[{'word': item['word'], 'example': item['example']} for item in words],
+            level=level,
+            model=model,
+            target_language=target_language,
+            native_language=native_language
+        ), user_id))
+        words = vocabulary.apply_glosses(words, glosses)
+        
+        result = vocabulary.save_deck(
+            db, user_id, source_type, source_id,
+            name=f"Vocabulary: {source.get('title') or source_type.capitalize()}",
+            words=words,
+            target_language=target_language,
+            native_language=native_language
+        )
+        return {'status': 'success', **result, 'words': [item['word'] for item in words]}
+        
+    except Exception as e:
+        print(f"Vocabulary extraction failed: {str(e)}")
+        retry_or_dead_letter(self, e)
+        return {'status': 'error', 'error': str(e)}
 
 
 # Helper function to get task status
-def get_task_status(task_id: str):
-    """Get status of a Celery task"""
+def get_task_status(task_id: str, consume: bool = False):
+    """
+    Get status of a Celery task
+    
+    Args:
+        task_id: Task ID
+        consume: Delete the result from the backend once it has been read
+            (later reads report the task as PENDING), unless other
+            requests were deduplicated onto the task
+    """
     task = celery_app.AsyncResult(task_id)
+    state = task.state
+    ready = state in READY_STATES
+    result = task.result if ready else None
+    # Results shared by deduplicated requests are left to expire instead
+    if ready and consume and claim_result(task_id):
+        task.forget()
     return {
         'task_id': task_id,
-        'status': task.state,
-        'result': task.result if task.ready() else None,
+        'status': state,
+        'result': result,
     }
 
 @celery_app.task(name='test_task')
@@ -169,75 +540,96 @@ def test_task(word: str):
     return f"Processed: {word}"
 
 
-@celery_app.task(name='generate_concept_card_task')
-def generate_concept_card_task(topic: str, level: str, model: str = None, target_language: str = "German"):
+def _as_batch_if_marked(task, coro):
+    """LLM calls of a batch job run as the batch tenant, others as the shared flow"""
+    from services.admission import run_as_batch
+
+    if getattr(task.request, BATCH_HEADER, None):
+        return run_as_batch(coro)
+    return coro
+
+
+@celery_app.task(name='generate_concept_card_task', bind=True)
+def generate_concept_card_task(self, topic: str, level: str, model: str = None, target_language: str = "German"):
     """Generate concept card in background"""
     from services.llm import LLMService
-    import asyncio
+    from services.async_runtime import run_async
+    from services.retries import retry_or_dead_letter
     
     try:
-        result = asyncio.run(LLMService.generate_concept_card(
+        result = run_async(_as_batch_if_marked(self, LLMService.generate_concept_card(
             topic=topic,
             level=level,
             model=model,
             target_language=target_language
-        ))
+        )))
         return result
     except Exception as e:
+        # Retried with backoff if transient, otherwise dead-lettered
+        retry_or_dead_letter(self, e)
         return {'error': str(e)}
 
 
-@celery_app.task(name='generate_exercises_task')
-def generate_exercises_task(topic: str, level: str, model: str = None, target_language: str = "German"):
+@celery_app.task(name='generate_exercises_task', bind=True)
+def generate_exercises_task(self, topic: str, level: str, model: str = None, target_language: str = "German"):
     """Generate exercises in background"""
     from services.llm import LLMService
-    import asyncio
+    from services.async_runtime import run_async
+    from services.retries import retry_or_dead_letter
     
     try:
-        result = asyncio.run(LLMService.generate_exercises(
+        result = run_async(_as_batch_if_marked(self, LLMService.generate_exercises(
             topic=topic,
             level=level,
             model=model,
             target_language=target_language
-        ))
+        )))
         return result
     except Exception as e:
+        # Retried with backoff if transient, otherwise dead-lettered
+        retry_or_dead_letter(self, e)
         return {'error': str(e)}
 
 
-@celery_app.task(name='generate_context_card_task')
-def generate_context_card_task(topic: str, level: str, model: str = None, target_language: str = "German"):
+@celery_app.task(name='generate_context_card_task', bind=True)
+def generate_context_card_task(self, topic: str, level: str, model: str = None, target_language: str = "German"):
     """Generate context card in background"""
     from services.llm import LLMService
-    import asyncio
+    from services.async_runtime import run_async
+    from services.retries import retry_or_dead_letter
     
     try:
-        result = asyncio.run(LLMService.generate_context_card(
+        result = run_async(_as_batch_if_marked(self, LLMService.generate_context_card(
             topic=topic,
             level=level,
             model=model,
             target_language=target_language
-        ))
+        )))
         return result
     except Exception as e:
+        # Retried with backoff if transient, otherwise dead-lettered
+        retry_or_dead_letter(self, e)
         return {'error': str(e)}
 
 
-@celery_app.task(name='generate_story_task')
-def generate_story_task(topic: str, level: str, length: str, theme: str = "", model: str = None, target_language: str = "German"):
+@celery_app.task(name='generate_story_task', bind=True)
+def generate_story_task(self, topic: str, level: str, length: str, theme: str = "", model: str = None, target_language: str = "German"):
     """Generate story in background"""
     from services.llm import LLMService
-    import asyncio
+    from services.async_runtime import run_async
+    from services.retries import retry_or_dead_letter
     
     try:
-        result = asyncio.run(LLMService.generate_story(
+        result = run_async(_as_batch_if_marked(self, LLMService.generate_story(
             topic=topic,
             level=level,
             length=length,
             theme=theme,
             model=model,
             target_language=target_language
-        ))
+        )))
         return result
     except Exception as e:
+        # Retried with backoff if transient, otherwise dead-lettered
+        retry_or_dead_letter(self, e)
         return {'error': str(e)}
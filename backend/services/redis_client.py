@@ -0,0 +1,56 @@
+"""
+Redis Client
+Shared Redis connections for Celery tasks and API routes
+"""
+
+from typing import Optional
+import asyncio
+import os
+import weakref
+
+import redis
+import redis.asyncio as aioredis
+
+from config import config
+
+_client: Optional[redis.Redis] = None
+_client_pid: Optional[int] = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = weakref.WeakKeyDictionary()
+
+
+def get_redis() -> redis.Redis:
+    """
+    Get the process-wide Redis client (used from Celery tasks)
+    
+    The client owns a thread-safe connection pool. It is recreated after a
+    fork, since pooled sockets must not be shared between processes.
+    """
+    global _client, _client_pid
+    
+    if _client is None or _client_pid != os.getpid():
+        _client = redis.Redis.from_url(config.REDIS_URL, decode_responses=True)
+        _client_pid = os.getpid()
+    return _client
+
+
+def get_async_redis() -> aioredis.Redis:
+    """
+    Get the asyncio Redis client for the running event loop (used from API routes)
+    
+    Async connections belong to the loop they were opened on, so there is
+    one client per loop rather than one per process. Long-lived loops close
+    theirs with close_async_redis() on shutdown.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = aioredis.Redis.from_url(config.REDIS_URL, decode_responses=True)
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_redis() -> None:
+    """Close the running loop's asyncio client and its pooled connections"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
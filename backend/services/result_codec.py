@@ -0,0 +1,67 @@
+"""
+Result Codec
+Compact serializer for Celery results stored in Redis
+
+Payloads are msgpack-encoded (JSON if msgpack is not installed) and
+zlib-compressed once they exceed RESULT_COMPRESS_THRESHOLD_BYTES. The first
+byte records how a payload was written, so results stay readable when the
+threshold changes or workers with and without msgpack share one backend.
+"""
+
+from typing import Any
+import json
+import zlib
+
+from kombu.serialization import register
+
+from config import config
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+SERIALIZER_NAME = 'compact'
+CONTENT_TYPE = 'application/x-vll-compact'
+
+# Header byte: encoding, plus whether the body is compressed
+_MSGPACK = b'M'
+_MSGPACK_ZLIB = b'm'
+_JSON = b'J'
+_JSON_ZLIB = b'j'
+
+
+def dumps(data: Any) -> bytes:
+    """Encode a result, compressing it if it is large"""
+    if msgpack is not None:
+        body = msgpack.packb(data, use_bin_type=True, default=str)
+        header, compressed_header = _MSGPACK, _MSGPACK_ZLIB
+    else:
+        body = json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+        header, compressed_header = _JSON, _JSON_ZLIB
+
+    if len(body) > config.RESULT_COMPRESS_THRESHOLD_BYTES:
+        return compressed_header + zlib.compress(body, config.RESULT_COMPRESS_LEVEL)
+    return header + body
+
+
+def loads(payload: bytes) -> Any:
+    """Decode a result written by dumps"""
+    if isinstance(payload, str):
+        payload = payload.encode('latin-1')
+    header, body = payload[:1], payload[1:]
+
+    if header in (_MSGPACK_ZLIB, _JSON_ZLIB):
+        body = zlib.decompress(body)
+    if header in (_MSGPACK, _MSGPACK_ZLIB):
+        if msgpack is None:
+            raise ValueError("Result was written with msgpack, which is not installed")
+        return msgpack.unpackb(body, raw=False)
+    if header in (_JSON, _JSON_ZLIB):
+        return json.loads(body.decode('utf-8'))
+    raise ValueError(f"Unknown result encoding {header!r}")
+
+
+def register_compact_serializer() -> None:
+    """Make the compact serializer available to Celery as 'compact'"""
+    register(SERIALIZER_NAME, dumps, loads, content_type=CONTENT_TYPE, content_encoding='binary')
@@ -0,0 +1,246 @@
+"""
+Task Retries
+Classified retries with backoff for LLM tasks, and a dead-letter queue
+
+Transient errors (timeouts, connection errors, 429 and 5xx responses,
+malformed model output) are retried with exponential backoff and jitter, at
+most TASK_MAX_RETRIES times. Anything else, such as a bad request or a
+context window overflow, fails right away. Tasks that fail for good are
+recorded in the dead-letter queue, where they can be inspected and
+requeued:
+    dlq:tasks             sorted set of dead task ids, scored by failure time
+    dlq:task:{task_id}    JSON entry (task name, arguments, error, attempts)
+    task:{task_id}:failures   failed attempts so far (the id survives retries)
+    task:{task_id}:deferrals  times a chapter stepped back for interactive work
+
+A requeued chapter goes back into its book: it runs as a one-chapter
+pipeline whose finalize_book updates the book again, and its task ids are
+registered with the book job so it can still be cancelled.
+"""
+
+from typing import Dict, List, Optional
+import asyncio
+import inspect
+import json
+import random
+import time
+
+from config import config
+from services.redis_client import get_redis
+from services.task_metrics import count_outcome
+
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+_DLQ_INDEX = "dlq:tasks"
+
+# Errors worth another attempt, besides those with a retryable status code
+_TRANSIENT_TYPES = (TimeoutError, asyncio.TimeoutError, ConnectionError, json.JSONDecodeError)
+_TRANSIENT_NAMES = {
+    'Timeout', 'APIConnectionError', 'RateLimitError', 'ServiceUnavailableError',
+    'InternalServerError', 'AdmissionTimeout', 'ConnectError', 'ReadTimeout',
+    'ConnectTimeout', 'RemoteProtocolError',
+}
+
+
+def _dlq_key(task_id: str) -> str:
+    return f"dlq:task:{task_id}"
+
+
+def _failures_key(task_id: str) -> str:
+    return f"task:{task_id}:failures"
+
+
+def _deferrals_key(task_id: str) -> str:
+    return f"task:{task_id}:deferrals"
+
+
+def _causes(error: BaseException):
+    # LLMService wraps provider errors, so look at the whole chain
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def classify_error(error: BaseException) -> str:
+    """Whether an error is worth retrying (TRANSIENT) or not (PERMANENT)"""
+    for cause in _causes(error):
+        status = getattr(cause, 'status_code', None)
+        if isinstance(status, int):
+            return TRANSIENT if status in (408, 429) or status >= 500 else PERMANENT
+        if isinstance(cause, _TRANSIENT_TYPES) or type(cause).__name__ in _TRANSIENT_NAMES:
+            return TRANSIENT
+    return PERMANENT
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Delay before retry number attempt (0-based): exponential, capped, with jitter"""
+    delay = min(config.TASK_RETRY_MAX_DELAY_SECONDS, config.TASK_RETRY_BASE_DELAY_SECONDS * 2 ** attempt)
+    # Equal jitter: spread retries of tasks that failed together over time
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _record_failure(task_id: str) -> int:
+    client = get_redis()
+    with client.pipeline() as pipe:
+        pipe.incr(_failures_key(task_id))
+        pipe.expire(_failures_key(task_id), config.PROGRESS_TTL_SECONDS)
+        failures, _ = pipe.execute()
+    return failures
+
+
+def record_deferral(task_id: str) -> int:
+    """
+    Count a preemption deferral of a task
+
+    Kept apart from the failure count, so error retries do not use up the
+    deferral budget (PREEMPT_MAX_DEFERRALS) or the other way around.
+    """
+    client = get_redis()
+    with client.pipeline() as pipe:
+        pipe.incr(_deferrals_key(task_id))
+        pipe.expire(_deferrals_key(task_id), config.PROGRESS_TTL_SECONDS)
+        deferrals, _ = pipe.execute()
+    return deferrals
+
+
+def retry_or_dead_letter(task, error: Exception) -> None:
+    """
+    Handle an error inside a bound task
+
+    Raises the task's Retry (with backoff) if the error is transient and
+    retries are left; otherwise records the task in the dead-letter queue
+    and returns, so the task can return its error result.
+    """
+    kind = classify_error(error)
+    attempts = 1
+    if kind == TRANSIENT:
+        try:
+            attempts = _record_failure(task.request.id)
+        except Exception as e:
+            print(f"Warning: Failed to count failures of {task.request.id}: {str(e)}")
+            attempts = config.TASK_MAX_RETRIES + 1
+        if attempts <= config.TASK_MAX_RETRIES:
+            delay = backoff_seconds(attempts - 1)
+            print(f"Warning: {task.name} failed ({str(error)}), retry {attempts}/{config.TASK_MAX_RETRIES} in {delay:.1f}s")
+            # max_retries=None: the failure count above is the limit, so
+            # deferrals (e.g. chapter preemption) do not use up error retries
+            raise task.retry(exc=error, countdown=delay, max_retries=None)
+
+    dead_letter(task, error, kind, attempts)
+
+
+def dead_letter(task, error: Exception, kind: str = PERMANENT, attempts: int = 1) -> None:
+    """Record a task that failed for good"""
+    request = task.request
+    entry = {
+        'task_id': request.id,
+        'task': task.name,
+        'args': list(request.args or []),
+        'kwargs': dict(request.kwargs or {}),
+        'queue': (request.delivery_info or {}).get('routing_key'),
+        'error': str(error),
+        'error_type': type(error).__name__,
+        'kind': kind,
+        'attempts': attempts,
+        'failed_at': time.time(),
+    }
+    try:
+        client = get_redis()
+        with client.pipeline() as pipe:
+            pipe.set(_dlq_key(request.id), json.dumps(entry, default=str), ex=config.DLQ_TTL_SECONDS)
+            pipe.zadd(_DLQ_INDEX, {request.id: entry['failed_at']})
+            pipe.delete(_failures_key(request.id))
+            pipe.execute()
+    except Exception as e:
+        print(f"Warning: Failed to dead-letter {task.name} {request.id}: {str(e)}")
+    count_outcome(task.name, 'dead_lettered')
+
+
+def list_dead_letters(limit: int = 50) -> List[Dict]:
+    """Most recent dead-lettered tasks first"""
+    client = get_redis()
+    task_ids = client.zrevrange(_DLQ_INDEX, 0, limit - 1)
+    if not task_ids:
+        return []
+    entries = []
+    stale = []
+    for task_id, raw in zip(task_ids, client.mget([_dlq_key(task_id) for task_id in task_ids])):
+        if raw is None:
+            stale.append(task_id)
+        else:
+            entries.append(json.loads(raw))
+    if stale:
+        # Entries expire on their own; drop them from the index as well
+        client.zrem(_DLQ_INDEX, *stale)
+    return entries
+
+
+def get_dead_letter(task_id: str) -> Optional[Dict]:
+    """A dead-lettered task, or None if unknown"""
+    raw = get_redis().get(_dlq_key(task_id))
+    return json.loads(raw) if raw else None
+
+
+def discard_dead_letter(task_id: str) -> bool:
+    """Remove a task from the dead-letter queue"""
+    client = get_redis()
+    with client.pipeline() as pipe:
+        pipe.delete(_dlq_key(task_id))
+        pipe.zrem(_DLQ_INDEX, task_id)
+        deleted, _ = pipe.execute()
+    return bool(deleted)
+
+
+def _requeue_chapter(entry: Dict) -> str:
+    """Run a dead chapter again as part of its book, so finalize_book and /cancel cover it"""
+    from services.book_jobs import BookCancelled, add_tasks, get_job, is_cancelled, register_job
+    from services.progress import report_progress
+    from services.queue import adapt_chapter, build_adaptation_pipeline, pipeline_task_ids
+
+    params = inspect.signature(adapt_chapter.run).bind(*entry['args'], **entry['kwargs'])
+    params.apply_defaults()
+    chapter = params.arguments
+    book_id = chapter['book_id']
+    if is_cancelled(book_id):
+        raise BookCancelled(book_id)
+
+    pipeline = build_adaptation_pipeline(
+        chapter['user_id'], book_id, [(chapter['chapter_index'], chapter['content'])],
+        chapter['level'], chapter['model'], chapter['target_language']
+    )
+    task_ids = pipeline_task_ids(pipeline)
+    if get_job(book_id) is None:
+        # The job record expired; the upload is long gone, only the tasks matter
+        register_job(book_id, chapter['user_id'], "", task_ids)
+    else:
+        add_tasks(book_id, task_ids)
+    report_progress(book_id, 'adapting')
+    pipeline.apply_async()
+    return task_ids[0]
+
+
+def requeue_dead_letter(task_id: str) -> Optional[str]:
+    """
+    Submit a dead-lettered task again, with its original arguments
+
+    Returns:
+        The new task id, or None if the task is unknown
+
+    Raises:
+        BookCancelled: If the task is a chapter of a cancelled book
+    """
+    from services.queue import celery_app
+
+    entry = get_dead_letter(task_id)
+    if entry is None:
+        return None
+    if entry['task'] == 'adapt_chapter':
+        new_task_id = _requeue_chapter(entry)
+    else:
+        # Routed by task name like the original submission
+        new_task_id = celery_app.send_task(entry['task'], args=entry['args'], kwargs=entry['kwargs']).id
+    discard_dead_letter(task_id)
+    return new_task_id
@@ -0,0 +1,223 @@
+"""
+Task Metrics
+Queue depth, wait time, run time and outcome counts for Celery tasks
+
+Collected from Celery signals into Redis, so every worker and API process
+contributes to one view:
+    metrics:hist:wait:{queue}     enqueue-to-start latency histogram per queue
+    metrics:hist:runtime:{task}   execution time histogram per task
+    metrics:queue:{queue}         tasks started and busy seconds per queue
+    metrics:outcomes:{task}       succeeded / failed / retried / dead_lettered
+    metrics:queues, metrics:tasks names seen so far
+
+Histograms are hashes of bucket counts plus sum and count. render_prometheus()
+exposes everything in the Prometheus text format (served at /metrics), and
+scripts/autoscale_controller.py turns it into scaling recommendations.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+import time
+
+from services.redis_client import get_redis
+
+# Upper bounds in seconds; tasks range from sub-second cards to long books
+BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+OUTCOMES = ('succeeded', 'failed', 'retried', 'dead_lettered')
+
+
+def _bucket(seconds: float) -> str:
+    for bound in BUCKETS:
+        if seconds <= bound:
+            return str(bound)
+    return '+Inf'
+
+
+def _observe(pipe, key: str, seconds: float) -> None:
+    pipe.hincrby(key, _bucket(seconds), 1)
+    pipe.hincrbyfloat(key, 'sum', seconds)
+    pipe.hincrby(key, 'count', 1)
+
+
+def _queue_of(task) -> str:
+    delivery_info = getattr(task.request, 'delivery_info', None) or {}
+    return delivery_info.get('routing_key') or 'unknown'
+
+
+def _wait_started_at(request) -> Optional[float]:
+    # Time the task became runnable: when it was sent, or its ETA if later
+    enqueued_at = getattr(request, 'enqueued_at', None)
+    if enqueued_at is None:
+        return None
+    eta = getattr(request, 'eta', None)
+    if eta:
+        try:
+            eta = datetime.fromisoformat(eta) if isinstance(eta, str) else eta
+            return max(float(enqueued_at), eta.timestamp())
+        except (TypeError, ValueError):
+            pass
+    return float(enqueued_at)
+
+
+def mark_enqueued(headers: Dict) -> None:
+    """Stamp an outgoing task message with its send time"""
+    headers['enqueued_at'] = time.time()
+
+
+def record_start(task) -> None:
+    """Record the wait of a task that is starting"""
+    request = task.request
+    request.metrics_started = time.monotonic()
+    queue = _queue_of(task)
+    started_at = _wait_started_at(request)
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            pipe.sadd('metrics:queues', queue)
+            pipe.hincrby(f"metrics:queue:{queue}", 'started', 1)
+            if started_at is not None:
+                _observe(pipe, f"metrics:hist:wait:{queue}", max(0.0, time.time() - started_at))
+            pipe.execute()
+    except Exception as e:
+        print(f"Warning: Failed to record task start metrics: {str(e)}")
+
+
+def record_finish(task) -> None:
+    """Record the run time of a task that finished (or stopped to retry)"""
+    started = getattr(task.request, 'metrics_started', None)
+    if started is None:
+        return
+    seconds = time.monotonic() - started
+    queue = _queue_of(task)
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            pipe.sadd('metrics:tasks', task.name)
+            pipe.hincrbyfloat(f"metrics:queue:{queue}", 'busy_seconds', seconds)
+            _observe(pipe, f"metrics:hist:runtime:{task.name}", seconds)
+            pipe.execute()
+    except Exception as e:
+        print(f"Warning: Failed to record task run metrics: {str(e)}")
+
+
+def count_outcome(task_name: str, outcome: str) -> None:
+    """Count a task outcome (one of OUTCOMES)"""
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            pipe.sadd('metrics:tasks', task_name)
+            pipe.hincrby(f"metrics:outcomes:{task_name}", outcome, 1)
+            pipe.execute()
+    except Exception as e:
+        print(f"Warning: Failed to count task outcome: {str(e)}")
+
+
+def queue_depth(celery_app, queue: str) -> int:
+    """Messages waiting in a queue (all priority levels)"""
+    try:
+        with celery_app.connection_for_read() as conn:
+            return conn.default_channel.queue_declare(queue=queue, passive=True).message_count
+    except Exception:
+        # Redis reports an empty queue as missing
+        return 0
+
+
+def _histogram(raw: Dict) -> Dict:
+    counts = {bound: int(raw.get(str(bound), 0)) for bound in BUCKETS}
+    counts['+Inf'] = int(raw.get('+Inf', 0))
+    return {'buckets': counts, 'sum': float(raw.get('sum', 0)), 'count': int(raw.get('count', 0))}
+
+
+def quantile(histogram: Dict, q: float) -> Optional[float]:
+    """Estimate a quantile from a histogram (upper bound of the bucket holding it)"""
+    if not histogram['count']:
+        return None
+    rank = q * histogram['count']
+    seen = 0
+    for bound, count in histogram['buckets'].items():
+        seen += count
+        if seen >= rank:
+            return float('inf') if bound == '+Inf' else float(bound)
+    return float('inf')
+
+
+def collect_metrics(celery_app, queues: List[str]) -> Dict:
+    """
+    Snapshot of all task metrics
+
+    Returns:
+        Dict with 'queues' (depth, started, busy seconds, wait histogram)
+        and 'tasks' (run time histogram, outcome counts)
+    """
+    client = get_redis()
+    queues = sorted(set(queues) | client.smembers('metrics:queues'))
+    tasks = sorted(client.smembers('metrics:tasks'))
+
+    with client.pipeline(transaction=False) as pipe:
+        for queue in queues:
+            pipe.hgetall(f"metrics:queue:{queue}")
+            pipe.hgetall(f"metrics:hist:wait:{queue}")
+        for task in tasks:
+            pipe.hgetall(f"metrics:hist:runtime:{task}")
+            pipe.hgetall(f"metrics:outcomes:{task}")
+        raw = pipe.execute()
+
+    snapshot = {'queues': {}, 'tasks': {}, 'collected_at': time.time()}
+    for i, queue in enumerate(queues):
+        counters, wait = raw[2 * i], raw[2 * i + 1]
+        snapshot['queues'][queue] = {
+            'depth': queue_depth(celery_app, queue),
+            'started': int(counters.get('started', 0)),
+            'busy_seconds': float(counters.get('busy_seconds', 0)),
+            'wait': _histogram(wait),
+        }
+    offset = 2 * len(queues)
+    for i, task in enumerate(tasks):
+        runtime, outcomes = raw[offset + 2 * i], raw[offset + 2 * i + 1]
+        snapshot['tasks'][task] = {
+            'runtime': _histogram(runtime),
+            'outcomes': {outcome: int(outcomes.get(outcome, 0)) for outcome in OUTCOMES},
+        }
+    return snapshot
+
+
+def _render_histogram(lines: List[str], name: str, labels: str, histogram: Dict) -> None:
+    cumulative = 0
+    for bound, count in histogram['buckets'].items():
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_sum{{{labels}}} {histogram["sum"]}')
+    lines.append(f'{name}_count{{{labels}}} {histogram["count"]}')
+
+
+def render_prometheus(snapshot: Dict) -> str:
+    """Render a metrics snapshot in the Prometheus text exposition format"""
+    lines = [
+        '# HELP celery_queue_depth Messages waiting in the queue',
+        '# TYPE celery_queue_depth gauge',
+    ]
+    for queue, stats in snapshot['queues'].items():
+        lines.append(f'celery_queue_depth{{queue="{queue}"}} {stats["depth"]}')
+    lines += [
+        '# HELP celery_queue_busy_seconds_total Task execution seconds per queue',
+        '# TYPE celery_queue_busy_seconds_total counter',
+    ]
+    for queue, stats in snapshot['queues'].items():
+        lines.append(f'celery_queue_busy_seconds_total{{queue="{queue}"}} {stats["busy_seconds"]}')
+    lines += [
+        '# HELP celery_task_wait_seconds Time from enqueue (or ETA) to task start',
+        '# TYPE celery_task_wait_seconds histogram',
+    ]
+    for queue, stats in snapshot['queues'].items():
+        _render_histogram(lines, 'celery_task_wait_seconds', f'queue="{queue}"', stats['wait'])
+    lines += [
+        '# HELP celery_task_runtime_seconds Task execution time',
+        '# TYPE celery_task_runtime_seconds histogram',
+    ]
+    for task, stats in snapshot['tasks'].items():
+        _render_histogram(lines, 'celery_task_runtime_seconds', f'task="{task}"', stats['runtime'])
+    lines += [
+        '# HELP celery_task_outcomes_total Task outcomes',
+        '# TYPE celery_task_outcomes_total counter',
+    ]
+    for task, stats in snapshot['tasks'].items():
+        for outcome, count in stats['outcomes'].items():
+            lines.append(f'celery_task_outcomes_total{{task="{task}",outcome="{outcome}"}} {count}')
+    return "\n".join(lines) + "\n"
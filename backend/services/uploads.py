@@ -0,0 +1,296 @@
+"""
+Upload Storage
+Streams uploads into UPLOAD_DIR in a single pass and tracks resumable uploads
+"""
+
+from typing import AsyncIterator, Dict, Optional, Tuple
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from starlette.concurrency import run_in_threadpool
+
+from config import config
+
+CHUNK_SIZE = 1024 * 1024  # 1MB
+SWEEP_INTERVAL_SECONDS = 3600  # How often create() looks for abandoned uploads
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds MAX_UPLOAD_SIZE"""
+    pass
+
+
+class UploadOffsetMismatch(Exception):
+    """Raised when a resumable chunk does not start at the current offset"""
+
+    def __init__(self, expected: int):
+        super().__init__(f"Upload offset mismatch, expected {expected}")
+        self.expected = expected
+
+
+class UploadInProgress(Exception):
+    """Raised when another request is already writing to a resumable upload"""
+    pass
+
+
+def _hash_prefix(path: str, length: int):
+    """SHA-256 state over the first length bytes of a file"""
+    digest = hashlib.sha256()
+    remaining = length
+    with open(path, "rb") as f:
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest
+
+
+def _final_path(filename: str) -> str:
+    file_ext = os.path.splitext(filename)[1].lower()
+    return os.path.join(config.UPLOAD_DIR, f"{uuid.uuid4()}{file_ext}")
+
+
+async def save_upload(file, max_size: Optional[int] = None) -> Tuple[str, str, int]:
+    """
+    Stream an upload to disk in one pass
+
+    Writes happen in the threadpool so the event loop is never blocked, the
+    size limit is enforced while reading, and the SHA-256 is computed on the
+    same pass. The file is written to a temp file in UPLOAD_DIR and renamed
+    into place atomically, so a failed upload never leaves a partial file.
+
+    Args:
+        file: FastAPI UploadFile
+        max_size: Maximum size in bytes (defaults to MAX_UPLOAD_SIZE)
+
+    Returns:
+        Tuple of (file path, SHA-256 hex digest, size in bytes)
+    """
+    max_size = max_size or config.MAX_UPLOAD_SIZE
+    os.makedirs(config.UPLOAD_DIR, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=config.UPLOAD_DIR, suffix=".partial")
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await file.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(f"File exceeds {max_size} bytes")
+                digest.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+
+        file_path = _final_path(file.filename)
+        await run_in_threadpool(os.replace, tmp_path, file_path)
+        return file_path, digest.hexdigest(), size
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ResumableUploadStore:
+    """
+    Chunked uploads that survive dropped connections
+
+    Each upload is a ``.part`` file plus a small JSON sidecar under
+    ``UPLOAD_DIR/.resumable``. The current offset is always the size of the
+    ``.part`` file, so a client can ask for it and continue from there.
+
+    Writers take an exclusive lock on the sidecar, so two requests at the
+    same offset cannot both append. The SHA-256 is kept running across
+    chunks; a process that did not see the earlier chunks (restart, another
+    API worker) hashes the ``.part`` file once and continues from there.
+    Uploads idle for longer than RESUMABLE_UPLOAD_TTL_SECONDS are swept.
+    """
+
+    def __init__(self, base_dir: Optional[str] = None, ttl_seconds: Optional[int] = None):
+        self._base_dir = base_dir
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else config.RESUMABLE_UPLOAD_TTL_SECONDS
+        # upload_id -> (bytes hashed, running SHA-256 of them)
+        self._digests: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+        self._last_sweep = 0.0
+
+    @property
+    def base_dir(self) -> str:
+        return self._base_dir or os.path.join(config.UPLOAD_DIR, ".resumable")
+
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self.base_dir, f"{upload_id}.json")
+
+    def _part_path(self, upload_id: str) -> str:
+        return os.path.join(self.base_dir, f"{upload_id}.part")
+
+    def _try_lock(self, upload_id: str) -> Optional[int]:
+        """Lock an upload without waiting; returns the descriptor holding the lock, or None if busy"""
+        fd = os.open(self._meta_path(upload_id), os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    async def _lock(self, upload_id: str) -> int:
+        try:
+            fd = await run_in_threadpool(self._try_lock, upload_id)
+        except FileNotFoundError:
+            raise FileNotFoundError(upload_id)
+        if fd is None:
+            raise UploadInProgress(upload_id)
+        return fd
+
+    def create(self, filename: str, total_size: int) -> Dict:
+        """Start a resumable upload"""
+        if total_size > config.MAX_UPLOAD_SIZE:
+            raise UploadTooLarge(f"File exceeds {config.MAX_UPLOAD_SIZE} bytes")
+
+        os.makedirs(self.base_dir, exist_ok=True)
+        if time.time() - self._last_sweep > SWEEP_INTERVAL_SECONDS:
+            self.sweep()
+
+        upload_id = uuid.uuid4().hex
+        meta = {"upload_id": upload_id, "filename": filename, "size": total_size}
+
+        open(self._part_path(upload_id), "wb").close()
+        with open(self._meta_path(upload_id), "w") as f:
+            json.dump(meta, f)
+
+        return {**meta, "offset": 0}
+
+    def get(self, upload_id: str) -> Optional[Dict]:
+        """Get upload metadata and current offset, or None if unknown"""
+        # upload_id comes from the URL; only accept ids we could have generated
+        if not upload_id.isalnum():
+            return None
+        try:
+            with open(self._meta_path(upload_id), "r") as f:
+                meta = json.load(f)
+            return {**meta, "offset": os.path.getsize(self._part_path(upload_id))}
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    async def _digest_at(self, upload_id: str, offset: int):
+        """Running SHA-256 of the first offset bytes of the upload"""
+        known = self._digests.get(upload_id)
+        if known is not None and known[0] == offset:
+            return known[1].copy()
+        if offset == 0:
+            return hashlib.sha256()
+        return await run_in_threadpool(_hash_prefix, self._part_path(upload_id), offset)
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> int:
+        """
+        Append a chunk stream at the given offset
+
+        Returns:
+            New offset after the write
+
+        Raises:
+            UploadInProgress: If another request is writing to this upload
+        """
+        upload = await run_in_threadpool(self.get, upload_id)
+        if upload is None:
+            raise FileNotFoundError(upload_id)
+
+        lock = await self._lock(upload_id)
+        try:
+            # Checked under the lock; the offset may have moved since get()
+            current = await run_in_threadpool(os.path.getsize, self._part_path(upload_id))
+            if offset != current:
+                raise UploadOffsetMismatch(current)
+
+            digest = await self._digest_at(upload_id, offset)
+            self._digests.pop(upload_id, None)
+            written = offset
+            f = await run_in_threadpool(open, self._part_path(upload_id), "ab")
+            try:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    written += len(chunk)
+                    if written > upload["size"]:
+                        raise UploadTooLarge(f"Chunk exceeds declared size of {upload['size']} bytes")
+                    digest.update(chunk)
+                    await run_in_threadpool(f.write, chunk)
+            finally:
+                await run_in_threadpool(f.close)
+
+            self._digests[upload_id] = (written, digest)
+            return written
+        finally:
+            os.close(lock)
+
+    async def complete(self, upload_id: str) -> Tuple[str, str, int]:
+        """
+        Finish an upload and move it into UPLOAD_DIR
+
+        Returns:
+            Tuple of (file path, SHA-256 hex digest, size in bytes)
+        """
+        if await run_in_threadpool(self.get, upload_id) is None:
+            raise FileNotFoundError(upload_id)
+
+        lock = await self._lock(upload_id)
+        try:
+            upload = await run_in_threadpool(self.get, upload_id)
+            if upload is None:
+                raise FileNotFoundError(upload_id)
+            if upload["offset"] != upload["size"]:
+                raise UploadOffsetMismatch(upload["offset"])
+
+            digest = await self._digest_at(upload_id, upload["size"])
+            file_path = _final_path(upload["filename"])
+            await run_in_threadpool(os.replace, self._part_path(upload_id), file_path)
+            await run_in_threadpool(os.remove, self._meta_path(upload_id))
+            self._digests.pop(upload_id, None)
+        finally:
+            os.close(lock)
+
+        return file_path, digest.hexdigest(), upload["size"]
+
+    def sweep(self) -> int:
+        """
+        Delete uploads that have seen no writes for ttl_seconds
+
+        Returns:
+            Number of uploads deleted
+        """
+        self._last_sweep = time.time()
+        cutoff = self._last_sweep - self.ttl_seconds
+        try:
+            names = os.listdir(self.base_dir)
+        except FileNotFoundError:
+            return 0
+
+        removed = 0
+        for upload_id in {os.path.splitext(name)[0] for name in names if name.endswith((".json", ".part"))}:
+            paths = [self._meta_path(upload_id), self._part_path(upload_id)]
+            try:
+                if max(os.path.getmtime(path) for path in paths if os.path.exists(path)) > cutoff:
+                    continue
+                lock = self._try_lock(upload_id) if os.path.exists(paths[0]) else None
+                if lock is None and os.path.exists(paths[0]):
+                    continue  # Being written right now
+                try:
+                    for path in paths:
+                        if os.path.exists(path):
+                            os.remove(path)
+                finally:
+                    if lock is not None:
+                        os.close(lock)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Failed to sweep resumable upload {upload_id}: {str(e)}")
+                continue
+            self._digests.pop(upload_id, None)
+            removed += 1
+        return removed
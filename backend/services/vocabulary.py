@@ -0,0 +1,486 @@
+"""
+Vocabulary Extraction
+Builds a vocabulary deck from a story or book without an LLM in the loop
+
+The pipeline is local and CPU-bound:
+    1. Tokenize each chapter, lemmatize and count lemmas with context
+       (capitalization, preceding article or title, first sentence),
+       chapters in parallel in a process pool (one per process, started
+       with forkserver or spawn so it never copies a threaded worker)
+    2. Merge the counts and drop stopwords and proper nouns
+    3. Rank by in-text salience against corpus frequency: words the text
+       uses much more often than German in general, skipping words a
+       learner at the given level already knows
+Only the top words are sent to the LLM, in one call, for glosses.
+
+Lemmas come from simplemma and corpus frequencies from wordfreq when they
+are installed. Without them, inflected forms are merged with forms seen
+in the same text and ranking falls back to spread across chapters and word
+length, which is rougher but needs no data files.
+"""
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import math
+import multiprocessing
+import os
+import re
+import threading
+
+from config import config
+
+try:
+    import simplemma
+except ImportError:
+    simplemma = None
+
+try:
+    from wordfreq import zipf_frequency
+except ImportError:
+    zipf_frequency = None
+
+# Words, allowing hyphenated compounds, and the punctuation that starts a new sentence
+_TOKEN = re.compile(r"[^\W\d_]+(?:-[^\W\d_]+)*|[.!?…:„“\"»«]")
+_SENTENCE_END = re.compile(r"[.!?…]+[\"“”»«']*(?=\s|$)|\n\s*\n")
+_SENTENCE_ENDS = frozenset('.!?…')
+
+# Abbreviations whose period does not end the sentence
+_ABBREVIATIONS = frozenset({'dr', 'prof', 'st', 'nr', 'bzw', 'ca', 'usw', 'z', 'b', 'u', 'a', 'vgl', 'hr', 'fr'})
+
+STOPWORDS = frozenset("""
+aber alle allem allen aller alles als also am an ander andere anderem anderen anderer anderes ans auch auf aus
+bei beim bin bis bist bloß da dabei dadurch dafür dagegen daher dahin damals damit danach dann daran darauf daraus
+darin darum darüber das dass dasselbe dazu dein deine deinem deinen deiner deines dem demselben den denen denn
+dennoch denselben der derer derselbe derselben des deshalb desselben dessen dich die dies diese dieselbe
+dieselben diesem diesen dieser dieses dir doch dort du durch eben ebenso ein eine einem einen einer eines einig
+einige einigem einigen einiger einiges einmal er es etwa etwas euch euer eure eurem euren eurer eures für gar
+gegen gewesen hab habe haben hat hatte hatten hätte hätten hier hin hinter ich ihm ihn ihnen ihr ihre ihrem ihren
+ihrer ihres im immer in ins irgend ist ja jede jedem jeden jeder jedes jedoch jemand jene jenem jenen jener jenes
+jetzt kann kannst kein keine keinem keinen keiner keines können könnte konnte konnten man manche manchem manchen
+mancher manches mein meine meinem meinen meiner meines mich mir mit muss musste müssen nach nachdem nein nicht
+nichts noch nun nur ob oder ohne schon sehr sein seine seinem seinen seiner seines seit selbst sich sie sind so
+solche solchem solchen solcher solches soll sollte sondern sonst sowie über um und uns unser unsere unserem
+unseren unserer unseres unter viel viele vom von vor wann war waren warst was weg weil weiter welche welchem
+welchen welcher welches wem wen wenn wer werde werden wie wieder will wir wird wirst wo wollen wollte worden
+wurde wurden zu zum zur zwar zwischen ach ah oh na ganz mal wohl
+""".split())
+
+# Words that usually precede a common noun (directly or before an adjective)
+DETERMINERS = frozenset("""
+der die das den dem des ein eine einen einem einer eines kein keine keinen keinem keiner keines
+mein meine meinen meinem meiner meines dein deine deinen deinem deiner deines sein seine seinen seinem seiner
+seines ihr ihre ihren ihrem ihrer ihres unser unsere unseren unserem unserer euer eure euren eurem eurer
+dieser diese diesen diesem dieses jeder jede jeden jedem jedes welcher welche welchen welchem welches
+im am zum zur vom beim ins ans aufs
+""".split())
+
+# Words that precede a name
+TITLES = frozenset({'herr', 'herrn', 'frau', 'fräulein', 'dr', 'prof', 'onkel', 'tante', 'sankt'})
+
+# Zipf frequency (log10 per billion words) above which a word is assumed known at each level
+KNOWN_ZIPF = {'A1': 6.0, 'A2': 5.5, 'B1': 5.0, 'B2': 4.5, 'C1': 4.0, 'C2': 3.5}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# Per-lemma counters, in this order (FIRST_CHAPTER is added when merging chapters)
+COUNT, CAPITALIZED, LOWERCASE, DETERMINED, TITLED, FIRST_SEEN, FIRST_CHAPTER = range(7)
+
+
+@lru_cache(maxsize=200_000)
+def lemmatize(word: str) -> str:
+    """Lemma of a German word (the word itself without simplemma)"""
+    if simplemma is None:
+        return word
+    try:
+        return simplemma.lemmatize(word, lang='de')
+    except Exception:
+        return word
+
+
+@lru_cache(maxsize=200_000)
+def corpus_zipf(word: str) -> Optional[float]:
+    """Zipf frequency of a word in general German, or None without wordfreq"""
+    if zipf_frequency is None:
+        return None
+    return zipf_frequency(word, 'de')
+
+
+def count_chapter(text: str) -> Tuple[Dict[str, List[int]], int]:
+    """
+    Count the content words of one chapter
+
+    Returns:
+        Counters per lemma (see COUNT..FIRST_SEEN; FIRST_SEEN is the offset
+        of the sentence the lemma first appears in) and the number of
+        word tokens, stopwords included
+    """
+    stats: Dict[str, List[int]] = {}
+    tokens = 0
+    sentence_start = 0
+    initial = True
+    previous = previous2 = None
+
+    for match in _TOKEN.finditer(text):
+        token = match.group()
+        if not token[0].isalpha():
+            if token in _SENTENCE_ENDS:
+                if token == '.' and previous in _ABBREVIATIONS:
+                    continue
+                sentence_start = match.end()
+            # Direct speech and colons also start with a capital letter
+            initial = True
+            previous = previous2 = None
+            continue
+
+        tokens += 1
+        lower = token.lower()
+        if lower in STOPWORDS or len(lower) < config.VOCAB_MIN_WORD_LENGTH:
+            previous2, previous, initial = previous, lower, False
+            continue
+
+        capitalized = token[0].isupper()
+        lemma = lemmatize(token).lower()
+        entry = stats.get(lemma)
+        if entry is None:
+            entry = stats[lemma] = [0, 0, 0, 0, 0, sentence_start]
+        entry[COUNT] += 1
+        if not capitalized:
+            entry[LOWERCASE] += 1
+        elif not initial:
+            entry[CAPITALIZED] += 1
+        if previous in DETERMINERS or (previous2 in DETERMINERS and previous not in STOPWORDS):
+            entry[DETERMINED] += 1
+        if previous in TITLES:
+            entry[TITLED] += 1
+
+        previous2, previous, initial = previous, lower, False
+
+    return stats, tokens
+
+
+def _pool_size() -> int:
+    return config.VOCAB_PROCESSES or os.cpu_count() or 1
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """The process pool shared by every task in this process, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Forking an LLM worker would copy its threads and open connections
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=_pool_size(), mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def shutdown_pool() -> None:
+    """Stop the process pool (worker shutdown)"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def count_chapters(chapters: List[str], processes: Optional[int] = None) -> List[Tuple[Dict[str, List[int]], int]]:
+    """Count every chapter, in the shared process pool when there is more than one"""
+    processes = min(processes or _pool_size(), len(chapters))
+    # Prefork pool processes are daemonic and may not start children
+    if processes <= 1 or multiprocessing.current_process().daemon:
+        return [count_chapter(text) for text in chapters]
+    try:
+        return list(_get_pool().map(count_chapter, chapters, chunksize=max(1, len(chapters) // (processes * 4))))
+    except BrokenProcessPool as e:
+        # A pool process died (e.g. out of memory): start a new pool next time
+        print(f"Warning: Vocabulary process pool broke, counting in process: {str(e)}")
+        shutdown_pool()
+        return [count_chapter(text) for text in chapters]
+
+
+def _form_aliases(forms: Iterable[str]) -> Dict[str, str]:
+    # Without a lemmatizer, fold an inflected form into a shorter form of the
+    # same word seen in the text: hunde -> hund, schönen -> schön, geht -> gehen
+    forms = set(forms)
+    aliases = {}
+    for form in sorted(forms, key=len):
+        for ending in ('en', 'em', 'er', 'es', 'st', 'e', 'n', 's', 't'):
+            stem = form[:-len(ending)]
+            if not form.endswith(ending) or len(stem) < 3:
+                continue
+            candidates = (stem, stem + 'e', stem + 'en')
+            target = next((c for c in candidates if c != form and c in forms and aliases.get(c) != form), None)
+            if target:
+                aliases[form] = target
+                break
+
+    resolved = {}
+    for form, target in aliases.items():
+        seen = {form}
+        while target in aliases and target not in seen:
+            seen.add(target)
+            target = aliases[target]
+        resolved[form] = target
+    return resolved
+
+
+def _is_proper_noun(entry: List[int], zipf: Optional[float]) -> bool:
+    if entry[LOWERCASE]:
+        return False
+    if entry[TITLED]:
+        return True
+    # Common nouns come with articles, names mostly do not (names that only
+    # start sentences count too, they are never seen in lowercase either)
+    if entry[DETERMINED]:
+        return False
+    return entry[COUNT] >= 3 or (entry[CAPITALIZED] > 0 and zipf is not None and zipf < 1.5)
+
+
+def rank_vocabulary(
+    counted: List[Tuple[Dict[str, List[int]], int]],
+    level: str = "B1",
+    limit: Optional[int] = None
+) -> List[Dict]:
+    """
+    Merge chapter counts and rank candidate words
+
+    Args:
+        counted: Output of count_chapters
+        level: CEFR level of the learner
+        limit: Number of words to return
+
+    Returns:
+        Words with lemma, count, chapters it appears in, corpus frequency,
+        score and where its first example sentence is, best first
+    """
+    limit = limit or config.VOCAB_DECK_SIZE
+    aliases = {}
+    if simplemma is None:
+        aliases = _form_aliases(lemma for chapter, _ in counted for lemma in chapter)
+
+    stats: Dict[str, List[int]] = {}
+    spread: Counter = Counter()
+    total_tokens = 0
+    for index, (chapter, tokens) in enumerate(counted):
+        total_tokens += tokens
+        seen = set()
+        for lemma, entry in chapter.items():
+            lemma = aliases.get(lemma, lemma)
+            seen.add(lemma)
+            if lemma not in stats:
+                stats[lemma] = list(entry) + [index]
+            else:
+                for field in (COUNT, CAPITALIZED, LOWERCASE, DETERMINED, TITLED):
+                    stats[lemma][field] += entry[field]
+        spread.update(seen)
+
+    known = KNOWN_ZIPF.get(level.upper(), KNOWN_ZIPF['B1'])
+    # A word seen once in a short story counts; in a book it may be noise
+    min_count = 1 if total_tokens < 5000 else 2
+    chapters = max(1, len(counted))
+    ranked = []
+    for lemma, entry in stats.items():
+        count = entry[COUNT]
+        if count < min_count:
+            continue
+        zipf = corpus_zipf(lemma)
+        if zipf is not None and zipf >= known:
+            continue
+        if _is_proper_noun(entry, zipf):
+            continue
+
+        if zipf is not None:
+            # Keyness: how much more often the text uses the word than German does
+            observed = count / max(1, total_tokens) * 1_000_000
+            expected = 10 ** zipf / 1000
+            score = math.log((observed + 1) / (expected + 1)) * math.log1p(count)
+        else:
+            score = math.log1p(count) * (0.5 + spread[lemma] / chapters) * min(len(lemma), 12) / 12
+
+        capitalized = entry[CAPITALIZED] > entry[LOWERCASE]
+        ranked.append({
+            'word': lemma.capitalize() if capitalized else lemma,
+            'lemma': lemma,
+            'count': count,
+            'chapters': spread[lemma],
+            'zipf': zipf,
+            'score': round(score, 4),
+            'chapter_index': entry[FIRST_CHAPTER],
+            'sentence_start': entry[FIRST_SEEN],
+        })
+
+    ranked.sort(key=lambda item: (-item['score'], item['lemma']))
+    return ranked[:limit]
+
+
+def example_sentence(text: str, start: int, max_length: int = 240) -> str:
+    """The sentence starting at an offset, trimmed to max_length"""
+    end = len(text)
+    for match in _SENTENCE_END.finditer(text, start):
+        word = re.search(r"(\w+)\.$", text[max(start, match.start() - 8):match.start() + 1])
+        if not (word and word.group(1).lower() in _ABBREVIATIONS):
+            end = match.end()
+            break
+    sentence = " ".join(text[start:end].split()).lstrip('„“"»« ')
+    if len(sentence) > max_length:
+        sentence = sentence[:max_length].rsplit(' ', 1)[0] + " …"
+    return sentence
+
+
+def extract_vocabulary(chapters: List[str], level: str = "B1", limit: Optional[int] = None) -> List[Dict]:
+    """
+    Top vocabulary of a text split into chapters, with an example sentence each
+
+    Returns:
+        Ranked words (see rank_vocabulary) with an 'example' sentence
+    """
+    chapters = [text for text in chapters if text and text.strip()]
+    if not chapters:
+        return []
+    ranked = rank_vocabulary(count_chapters(chapters), level=level, limit=limit)
+    for item in ranked:
+        item['example'] = example_sentence(chapters[item.pop('chapter_index')], item.pop('sentence_start'))
+    return ranked
+
+
+def apply_glosses(words: List[Dict], glosses: List[Dict]) -> List[Dict]:
+    """
+    Add LLM glosses to ranked words
+
+    Glosses are matched by word (or lemma) only, never by position, since
+    the LLM may skip or reorder words; words without a gloss are kept with
+    an empty definition. Words the LLM marked as names are dropped.
+    """
+    by_word = {str(gloss.get('word', '')).lower(): gloss for gloss in glosses if isinstance(gloss, dict)}
+    glossed = []
+    for item in words:
+        gloss = by_word.get(item['word'].lower()) or by_word.get(item.get('lemma', '').lower()) or {}
+        if gloss.get('skip'):
+            continue
+        glossed.append({**item, 'definition': gloss.get('definition', ''), 'gender': gloss.get('gender')})
+    return glossed
+
+
+# Deck storage (users/{userId}/decks and users/{userId}/vocabulary)
+
+def deck_id(source_type: str, source_id: str) -> str:
+    """Deck ID of a source, so extracting it again updates the same deck"""
+    return f"{source_type}_{source_id}"
+
+
+def word_id(deck: str, word: str) -> str:
+    """Document ID of a word in a deck"""
+    return f"{deck}_{hashlib.sha1(word.lower().encode('utf-8')).hexdigest()[:16]}"
+
+
+def saved_words(db, user_id: str) -> Dict[str, str]:
+    """Words in a user's vocabulary, mapped to their deck ID"""
+    query = db.collection('users').document(user_id).collection('vocabulary').select(['word', 'deckId'])
+    words = {}
+    for snapshot in query.stream():
+        data = snapshot.to_dict() or {}
+        if data.get('word'):
+            words[data['word'].lower()] = data.get('deckId')
+    return words
+
+
+def save_deck(
+    db,
+    user_id: str,
+    source_type: str,
+    source_id: str,
+    name: str,
+    words: Iterable[Dict],
+    target_language: str = "German",
+    native_language: str = "English"
+) -> Dict:
+    """
+    Add words to the deck of a source, creating it if needed
+
+    Words already in the deck keep their review progress: only their
+    definition, context and gender are updated (merged), never srsData.
+
+    Returns:
+        Deck ID, the number of words added and the number updated
+    """
+    from firebase_admin import firestore
+    from services.firebase_service import MAX_BATCH_WRITES
+
+    deck = deck_id(source_type, source_id)
+    user_ref = db.collection('users').document(user_id)
+    deck_ref = user_ref.collection('decks').document(deck)
+    vocabulary_ref = user_ref.collection('vocabulary')
+    now = firestore.SERVER_TIMESTAMP
+
+    cards = {}
+    for item in words:
+        ref = vocabulary_ref.document(word_id(deck, item['word']))
+        cards[ref.id] = (ref, {
+            'word': item['word'].lower(),
+            'definition': item.get('definition', ''),
+            'context': item.get('example', ''),
+            'targetLanguage': target_language,
+            'nativeLanguage': native_language,
+            'gender': item.get('gender'),
+            'deckId': deck,
+            'sourceType': source_type,
+            'sourceId': source_id,
+        })
+    existing = set()
+    if cards:
+        refs = [ref for ref, _ in cards.values()]
+        existing = {snapshot.id for snapshot in db.get_all(refs, field_paths=['word']) if snapshot.exists}
+
+    writes = []
+    for card_id, (ref, card) in cards.items():
+        if card_id in existing:
+            writes.append((ref, card, True))
+            continue
+        writes.append((ref, {
+            'id': card_id,
+            **card,
+            'srsData': {
+                'interval': 1,
+                'repetitions': 0,
+                'easeFactor': 2.5,
+                'nextReview': now,  # Due immediately
+                'lastRating': None,
+            },
+            'createdAt': now,
+            'lastReviewedAt': None,
+            'timesReviewed': 0,
+            'isMastered': False,
+        }, False))
+
+    if not deck_ref.get().exists:
+        deck_ref.set({
+            'id': deck,
+            'name': name,
+            'description': f"Vocabulary extracted from this {source_type}",
+            'sourceType': source_type,
+            'sourceId': source_id,
+            'wordCount': 0,
+            'dueCount': 0,
+            'masteredCount': 0,
+            'createdAt': now,
+            'lastStudiedAt': None,
+        })
+
+    for start in range(0, len(writes), MAX_BATCH_WRITES - 1):
+        batch = db.batch()
+        chunk = writes[start:start + MAX_BATCH_WRITES - 1]
+        for ref, data, merge in chunk:
+            batch.set(ref, data, merge=merge)
+        added = sum(1 for _, _, merge in chunk if not merge)
+        if added:
+            batch.update(deck_ref, {
+                'wordCount': firestore.Increment(added),
+                'dueCount': firestore.Increment(added),
+            })
+        batch.commit()
+
+    return {'deck_id': deck, 'words_added': len(writes) - len(existing), 'words_updated': len(existing)}
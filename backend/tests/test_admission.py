@@ -0,0 +1,233 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import admission
+from services.admission import (
+    AdmissionTimeout, admit, backend_for, current_tenant, llm_tenant, run_as_batch, run_as_tenant
+)
+
+
+def _redis(acquire_results):
+    """Async Redis mock whose acquire script returns the given results in turn"""
+    acquire = AsyncMock(side_effect=acquire_results)
+    release = AsyncMock(return_value="4.25")
+    leave = AsyncMock(return_value=0)
+    scripts = {admission._ACQUIRE: acquire, admission._RELEASE: release, admission._LEAVE: leave}
+    client = MagicMock()
+    client.register_script.side_effect = lambda script: scripts[script]
+    client.leave = leave
+    return client, acquire, release
+
+
+def test_backend_for_groups_models_by_provider():
+    """Test that models share limits per inference backend"""
+    assert backend_for("ollama/gemma3:27b") == backend_for("ollama/llama3.2") == "ollama"
+    assert backend_for("gpt-4o-mini") == "gpt"
+
+
+def test_admit_waits_for_a_free_slot():
+    """Test that a call waits while the backend is saturated and releases its slot after"""
+    client, acquire, release = _redis([-1, -1, 0])
+
+    async def call():
+        async with admit("ollama/llama3.2", 100) as lease:
+            lease.completion_tokens = 200
+        return lease
+
+    with patch('services.admission.get_async_redis', return_value=client), \
+            patch('config.config.ADMISSION_POLL_SECONDS', 0.01):
+        lease = asyncio.run(call())
+
+    assert acquire.await_count == 3
+    release.assert_awaited_once()
+    args = release.await_args.kwargs["args"]
+    assert args[0] == lease.lease_id
+    assert args[1] == "ok"
+
+
+def test_admit_reports_overload_on_backend_errors():
+    """Test that timeouts and server errors cut the concurrency limit"""
+    client, acquire, release = _redis([0])
+
+    async def call():
+        async with admit("ollama/llama3.2", 100):
+            raise TimeoutError("read timeout")
+
+    with patch('services.admission.get_async_redis', return_value=client):
+        with pytest.raises(TimeoutError):
+            asyncio.run(call())
+
+    assert release.await_args.kwargs["args"][1] == "overload"
+
+
+def test_admit_without_usage_leaves_limit_alone():
+    """Test that a response without token usage is released as neutral, not judged per token"""
+    client, acquire, release = _redis([0])
+
+    async def call():
+        async with admit("ollama/llama3.2", 100) as lease:
+            lease.record(SimpleNamespace())
+
+    with patch('services.admission.get_async_redis', return_value=client), \
+            patch('config.config.ADMISSION_TARGET_SECONDS_PER_TOKEN', 0.0):
+        asyncio.run(call())
+
+    assert release.await_args.kwargs["args"][1] == "neutral"
+
+
+def test_admit_times_out_when_saturated():
+    """Test that a call gives up after ADMISSION_TIMEOUT_SECONDS"""
+    client, acquire, release = _redis(lambda **kwargs: -1)
+
+    async def call():
+        async with admit("ollama/llama3.2", 100):
+            pass
+
+    with patch('services.admission.get_async_redis', return_value=client), \
+            patch('config.config.ADMISSION_POLL_SECONDS', 0.01), \
+            patch('config.config.ADMISSION_TIMEOUT_SECONDS', 0.05):
+        with pytest.raises(AdmissionTimeout):
+            asyncio.run(call())
+
+    release.assert_not_awaited()
+    # The call gives up its place in the fair queue
+    client.leave.assert_awaited_once()
+
+
+def test_admit_fails_open_without_redis():
+    """Test that calls still go through when Redis is unavailable"""
+    client = MagicMock()
+    client.register_script.return_value = AsyncMock(side_effect=ConnectionError("refused"))
+    ran = []
+
+    async def call():
+        async with admit("ollama/llama3.2", 100):
+            ran.append(True)
+
+    with patch('services.admission.get_async_redis', return_value=client):
+        asyncio.run(call())
+
+    assert ran == [True]
+
+
+def test_tenant_weight_follows_plan():
+    """Test that calls are attributed to the user and weighted by their plan"""
+    with patch('config.config.LLM_PLAN_WEIGHTS', {"free": 1, "pro": 4}):
+        assert current_tenant()[0] == "shared"
+        with llm_tenant("user-1", "pro"):
+            assert current_tenant() == ("user:user-1", 4.0)
+        with llm_tenant("user-2"):
+            assert current_tenant() == ("user:user-2", 1.0)
+
+
+def test_admit_queues_call_under_its_tenant():
+    """Test that the acquire script gets the tenant and weight of the caller"""
+    client, acquire, release = _redis([0])
+
+    async def call():
+        async with admit("ollama/llama3.2", 100):
+            pass
+
+    with patch('services.admission.get_async_redis', return_value=client):
+        asyncio.run(run_as_tenant(call(), "user-1"))
+
+    args = acquire.await_args.kwargs["args"]
+    assert args[7:9] == ["user:user-1", 1.0]
+
+
+def test_batch_jobs_share_one_low_weight_tenant():
+    """Test that batch calls queue as the batch tenant with LLM_BATCH_WEIGHT"""
+    client, acquire, release = _redis([0])
+
+    async def call():
+        async with admit("ollama/llama3.2", 100):
+            pass
+
+    with patch('services.admission.get_async_redis', return_value=client), \
+            patch('config.config.LLM_BATCH_WEIGHT', 0.5):
+        asyncio.run(run_as_batch(call()))
+
+    assert acquire.await_args.kwargs["args"][7:9] == ["batch", 0.5]
+
+
+@pytest.fixture
+def lua_redis():
+    """In-memory Redis running the real admission scripts; yields a sync client to inspect it"""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+
+    def async_client():
+        return fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+
+    with patch('services.admission.get_async_redis', side_effect=async_client):
+        yield fakeredis.FakeRedis(server=server, decode_responses=True)
+
+
+def _limits(**limits):
+    return patch('config.config.LLM_BACKEND_LIMITS', {"ollama": limits})
+
+
+def test_release_script_applies_aimd(lua_redis):
+    """Test that fast calls raise the limit by 1/limit and overload cuts it once per interval"""
+    async def release(outcome):
+        await admission._release(admission.Lease("ollama", "lease-1", 100), outcome)
+
+    with _limits(initial_concurrency=4, max_concurrency=5, tokens_per_second=0), \
+            patch('config.config.LLM_MIN_CONCURRENCY', 1), \
+            patch('config.config.ADMISSION_DECREASE_FACTOR', 0.5), \
+            patch('config.config.ADMISSION_DECREASE_INTERVAL_SECONDS', 60):
+        asyncio.run(release("ok"))
+        assert float(lua_redis.hget("llm:ollama:admission", "limit")) == 4.25
+        asyncio.run(release("overload"))
+        asyncio.run(release("overload"))
+        # The second slow call was already running when the first cut happened
+        assert float(lua_redis.hget("llm:ollama:admission", "limit")) == 2.125
+        for _ in range(50):
+            asyncio.run(release("ok"))
+        assert float(lua_redis.hget("llm:ollama:admission", "limit")) == 5
+
+
+def test_acquire_script_waits_for_token_bucket(lua_redis):
+    """Test that a free slot is not enough once the token bucket is drained"""
+    async def call(tokens):
+        async with admit("ollama/llama3.2", tokens):
+            pass
+
+    with _limits(initial_concurrency=4, max_concurrency=4, tokens_per_second=10), \
+            patch('config.config.LLM_TOKEN_BURST_SECONDS', 10), \
+            patch('config.config.ADMISSION_POLL_SECONDS', 0.01), \
+            patch('config.config.ADMISSION_TIMEOUT_SECONDS', 0.1):
+        asyncio.run(call(100))
+        assert lua_redis.zcard("llm:ollama:inflight") == 0
+        assert float(lua_redis.hget("llm:ollama:admission", "tokens")) < 1
+        with pytest.raises(AdmissionTimeout):
+            asyncio.run(call(100))
+        # A small call fits once the bucket refilled a little
+        asyncio.run(call(1))
+
+
+def test_waiter_that_gives_up_leaves_the_queue(lua_redis):
+    """Test that a timed out waiter is removed from the fair queue instead of blocking it"""
+    async def scenario():
+        async with admit("ollama/llama3.2", 100):
+            assert lua_redis.zcard("llm:ollama:inflight") == 1
+            with pytest.raises(AdmissionTimeout):
+                async with admit("ollama/llama3.2", 100):
+                    pass
+            return lua_redis.zcard("llm:ollama:queue"), lua_redis.zcard("llm:ollama:heartbeats")
+
+    with _limits(initial_concurrency=1, max_concurrency=1, tokens_per_second=0), \
+            patch('config.config.ADMISSION_POLL_SECONDS', 0.01), \
+            patch('config.config.ADMISSION_TIMEOUT_SECONDS', 0.05):
+        assert asyncio.run(scenario()) == (0, 0)
+
+    assert lua_redis.zcard("llm:ollama:inflight") == 0
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.async_runtime import get_loop, run_async, shutdown
+from services.redis_client import get_async_redis
+
+
+def test_run_async_reuses_one_loop():
+    """Test that every call runs on the same long-lived loop"""
+    async def current_loop():
+        return asyncio.get_running_loop()
+    
+    first = run_async(current_loop())
+    second = run_async(current_loop())
+    
+    assert first is second is get_loop()
+    assert first.is_running()
+
+
+def test_run_async_runs_callers_concurrently():
+    """Test that coroutines from several threads wait concurrently on the shared loop"""
+    async def slow(value):
+        await asyncio.sleep(0.2)
+        return value
+    
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(run_async(slow(i)))) for i in range(10)]
+    
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert sorted(results) == list(range(10))
+    assert time.perf_counter() - started < 1.0
+
+
+def test_run_async_reraises_exceptions():
+    """Test that exceptions from the coroutine reach the caller"""
+    async def fail():
+        raise ValueError("boom")
+    
+    with pytest.raises(ValueError, match="boom"):
+        run_async(fail())
+
+
+def test_shutdown_closes_redis_and_stops_loop():
+    """Test that shutdown closes the loop's Redis client before stopping the loop"""
+    async def client():
+        return get_async_redis()
+    
+    redis = run_async(client())
+    loop = get_loop()
+    with patch.object(redis, 'aclose', new=AsyncMock()) as aclose:
+        shutdown()
+    
+    aclose.assert_awaited_once()
+    for _ in range(100):
+        if not loop.is_running():
+            break
+        time.sleep(0.01)
+    assert not loop.is_running()
+    # The next call starts a fresh loop
+    assert get_loop() is not loop
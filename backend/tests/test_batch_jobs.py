@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import batch_jobs
+from services.queue import BULK_QUEUE
+
+
+def _results(states):
+    """AsyncResult stand-in returning the (state, result) given per job id"""
+    def async_result(job_id):
+        state, result = states[job_id]
+        return SimpleNamespace(state=state, result=result)
+    return async_result
+
+
+def _client(job_ids, types):
+    client = MagicMock()
+    client.get.return_value = json.dumps({'job_ids': job_ids, 'types': types})
+    client.hgetall.return_value = {}
+    return client
+
+
+def test_submit_batch_queues_group_on_bulk_queue():
+    """Test that specs become one group of bulk-queue tasks whose ids are stored"""
+    client = MagicMock()
+    group_result = SimpleNamespace(id='group-1', results=[SimpleNamespace(id='a'), SimpleNamespace(id='b')])
+    specs = [
+        {'type': 'story', 'topic': 'Im Zoo', 'level': 'A2', 'length': 'Short'},
+        {'type': 'concept', 'topic': 'Dativ', 'level': 'A2'},
+    ]
+
+    with patch('services.batch_jobs.group') as mock_group, \
+            patch('services.batch_jobs.get_redis', return_value=client):
+        mock_group.return_value.apply_async.return_value = group_result
+        batch = batch_jobs.submit_batch(specs)
+
+    signatures = mock_group.call_args[0][0]
+    assert [s.task for s in signatures] == ['generate_story_task', 'generate_concept_card_task']
+    assert all(s.options['queue'] == BULK_QUEUE for s in signatures)
+    assert all(s.options['headers'] == {batch_jobs.BATCH_HEADER: True} for s in signatures)
+    assert signatures[0].kwargs['length'] == 'Short'
+    assert batch == {'group_id': 'group-1', 'job_ids': ['a', 'b'], 'total': 2}
+    key, value = client.set.call_args[0]
+    assert key == 'batch:group-1'
+    assert json.loads(value) == {'job_ids': ['a', 'b'], 'types': ['story', 'concept']}
+
+
+def test_batch_status_counts_error_results_as_failed():
+    """Test that aggregate progress counts finished, failed and pending jobs"""
+    client = _client(['a', 'b', 'c'], ['story', 'concept', 'context'])
+    states = {
+        'a': ('SUCCESS', {'title': 'Im Zoo'}),
+        'b': ('SUCCESS', {'error': 'Model returned invalid JSON'}),
+        'c': ('PENDING', None),
+    }
+
+    with patch('services.batch_jobs.get_redis', return_value=client), \
+            patch('services.queue.celery_app.AsyncResult', side_effect=_results(states)):
+        status = batch_jobs.batch_status('group-1', include_results=True)
+
+    assert (status['completed'], status['failed'], status['pending']) == (1, 1, 1)
+    assert status['progress'] == 66.7
+    assert status['done'] is False
+    assert status['jobs'][0]['result'] == {'title': 'Im Zoo'}
+    assert 'result' not in status['jobs'][2]
+
+
+def test_stream_batch_sends_each_result_once():
+    """Test that the stream sends every finished job once and stops when all are done"""
+    client = _client(['a', 'b'], ['story', 'exercises'])
+    b_states = iter([('STARTED', None), ('STARTED', None), ('SUCCESS', {'exercises': []})])
+
+    def async_result(job_id):
+        state, result = ('SUCCESS', {'title': 'Im Zoo'}) if job_id == 'a' else next(b_states)
+        return SimpleNamespace(state=state, result=result)
+
+    async def collect():
+        return [event async for event in batch_jobs.stream_batch('group-1', poll_seconds=0.001)]
+
+    with patch('services.batch_jobs.get_redis', return_value=client), \
+            patch('services.queue.celery_app.AsyncResult', side_effect=async_result):
+        events = asyncio.run(collect())
+
+    job_events = [e for e in events if e.startswith('event: job')]
+    progress = [json.loads(e.split('data: ', 1)[1]) for e in events if e.startswith('event: progress')]
+    assert len(job_events) == 2
+    assert [p['pending'] for p in progress] == [1, 0]
+    assert progress[-1]['done'] is True
+
+
+def test_outcomes_outlive_expired_results():
+    """Test that a job whose Celery result expired still counts as finished"""
+    client = _client(['a', 'b'], ['story', 'concept'])
+    pipe = client.pipeline.return_value.__enter__.return_value
+    task = SimpleNamespace(request=SimpleNamespace(id='b', group='group-1', batch_job=True))
+
+    with patch('services.batch_jobs.get_redis', return_value=client):
+        batch_jobs.record_outcome(task, 'SUCCESS', {'error': 'Model returned invalid JSON'})
+    key, job_id, outcome = pipe.hset.call_args[0]
+    assert (key, job_id) == ('batch:group-1:outcomes', 'b')
+
+    client.hgetall.return_value = {'b': outcome}
+    states = {'a': ('SUCCESS', {'title': 'Im Zoo'}), 'b': ('PENDING', None)}
+    with patch('services.batch_jobs.get_redis', return_value=client), \
+            patch('services.queue.celery_app.AsyncResult', side_effect=_results(states)):
+        status = batch_jobs.batch_status('group-1')
+
+    assert (status['completed'], status['failed'], status['pending']) == (1, 1, 0)
+    assert status['done'] is True
+
+
+def test_record_outcome_ignores_tasks_outside_batches():
+    """Test that only finished batch jobs are recorded"""
+    client = MagicMock()
+    book_task = SimpleNamespace(request=SimpleNamespace(id='c', group='chord-1'))
+    retrying = SimpleNamespace(request=SimpleNamespace(id='d', group='group-1', batch_job=True))
+
+    with patch('services.batch_jobs.get_redis', return_value=client):
+        batch_jobs.record_outcome(book_task, 'SUCCESS', {})
+        batch_jobs.record_outcome(retrying, 'RETRY', None)
+
+    client.pipeline.assert_not_called()
+
+
+def test_stream_batch_ends_when_batch_expires():
+    """Test that the stream stops with an error instead of polling lost jobs forever"""
+    client = _client(['a'], ['story'])
+    client.exists.return_value = 0
+
+    async def collect():
+        return [event async for event in batch_jobs.stream_batch('group-1', poll_seconds=0.001)]
+
+    with patch('services.batch_jobs.get_redis', return_value=client):
+        events = asyncio.run(collect())
+
+    assert len(events) == 1
+    assert events[0].startswith('event: error')
+    assert 'Batch expired' in events[0]
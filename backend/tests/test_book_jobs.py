@@ -0,0 +1,99 @@
+import asyncio
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services.book_jobs import BookCancelled, remove_upload, run_cancellable
+from services.queue import build_adaptation_pipeline, pipeline_task_ids
+
+client = TestClient(app)
+
+
+def test_run_cancellable_aborts_llm_call():
+    """Test that a running coroutine is cancelled once the book's cancel flag is set"""
+    finished = []
+    
+    async def slow_adaptation():
+        await asyncio.sleep(5)
+        finished.append(True)
+    
+    redis = MagicMock()
+    redis.exists = AsyncMock(return_value=1)
+    with patch('services.book_jobs.get_async_redis', return_value=redis):
+        with pytest.raises(BookCancelled):
+            asyncio.run(run_cancellable(slow_adaptation(), "book-1", poll_seconds=0.05))
+    
+    assert not finished
+
+
+def test_pipeline_task_ids_cover_every_chapter():
+    """Test that chapter and finalize task ids are known before the pipeline is sent"""
+    pipeline = build_adaptation_pipeline("user-1", "book-1", [(i, f"Kapitel {i}") for i in range(6)], "A2")
+    
+    ids = pipeline_task_ids(pipeline)
+    
+    assert len(ids) == 7
+    assert len(set(ids)) == 7
+
+
+def test_remove_upload_only_inside_upload_dir(tmp_path):
+    """Test that cleanup never deletes files outside UPLOAD_DIR"""
+    upload = tmp_path / "uploads" / "book.pdf"
+    upload.parent.mkdir()
+    upload.write_bytes(b"%PDF")
+    outside = tmp_path / "book.pdf"
+    outside.write_bytes(b"%PDF")
+    
+    with patch('config.config.UPLOAD_DIR', str(upload.parent)):
+        assert remove_upload(str(outside)) is False
+        assert remove_upload(str(upload)) is True
+    
+    assert outside.exists()
+    assert not upload.exists()
+
+
+def test_cancel_endpoint(tmp_path):
+    """Test that cancelling revokes tasks, reports the new phase and removes the upload"""
+    upload = tmp_path / "book.pdf"
+    upload.write_bytes(b"%PDF")
+    job = {"user_id": "user-1", "file_path": str(upload), "task_ids": ["t1", "t2", "t3"]}
+    db = MagicMock()
+    book_ref = db.collection.return_value.document.return_value.collection.return_value.document.return_value
+    book_ref.set = AsyncMock()
+    
+    with patch('config.config.UPLOAD_DIR', str(tmp_path)), \
+         patch('routes.books.cancel_job', return_value=job) as cancel_job, \
+         patch('routes.books.get_async_firestore_client', return_value=db), \
+         patch('routes.books.report_progress') as report_progress:
+        response = client.post("/api/books/book-1/cancel")
+    
+    assert response.status_code == 200
+    assert response.json()["revoked_tasks"] == 3
+    cancel_job.assert_called_once_with("book-1")
+    book_ref.set.assert_awaited_once_with({"status": "cancelled", "currentProcessingChapter": None}, merge=True)
+    report_progress.assert_called_once_with("book-1", "cancelled")
+    assert not upload.exists()
+
+
+def test_cancel_unknown_book():
+    """Test that cancelling an unknown book returns 404"""
+    with patch('routes.books.cancel_job', return_value=None):
+        response = client.post("/api/books/missing/cancel")
+    
+    assert response.status_code == 404
+
+
+def test_events_for_unknown_book():
+    """Test that streaming an unknown book returns 404 instead of a stream that never ends"""
+    with patch('routes.books.get_progress', new=AsyncMock(return_value=None)), \
+         patch('routes.books.get_job', return_value=None):
+        response = client.get("/api/books/missing/events")
+    
+    assert response.status_code == 404
@@ -0,0 +1,158 @@
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+from celery.exceptions import Retry
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import book_store, firebase_service
+from services.queue import adapt_chapter, build_adaptation_pipeline, celery_app
+
+
+def test_adaptation_pipeline_bounds_parallelism():
+    """Test that chapters are spread over a bounded number of lanes ending in a chord"""
+    chapters = [(i, f"Kapitel {i}") for i in range(10)]
+    
+    with patch('config.config.BOOK_ADAPT_PARALLELISM', 4):
+        pipeline = build_adaptation_pipeline("user-1", "book-1", chapters, "A2")
+    
+    lanes = pipeline.tasks
+    assert len(lanes) == 4
+    
+    # Every chapter is adapted exactly once
+    indices = sorted(task.args[2] for lane in lanes for task in lane.tasks)
+    assert indices == list(range(10))
+    assert pipeline.body.task == 'finalize_book'
+
+
+def test_adaptation_pipeline_small_book():
+    """Test that a book with fewer chapters than lanes gets one lane per chapter"""
+    with patch('config.config.BOOK_ADAPT_PARALLELISM', 4):
+        pipeline = build_adaptation_pipeline("user-1", "book-1", [(0, "Kapitel 1"), (1, "Kapitel 2")], "A2")
+    
+    assert len(pipeline.tasks) == 2
+
+
+def test_save_chapters_batches_writes():
+    """Test that chapters are written in batches of at most 500 and indexed on the book"""
+    db = MagicMock()
+    chunks = [{"title": f"Kapitel {i}", "content": "Es war einmal.", "word_count": 3} for i in range(1200)]
+    
+    with patch('services.firebase_service.time.sleep'):
+        adapted = book_store.save_chapters(db, "user-1", "book-1", chunks, {"status": "adapting"})
+    
+    assert db.batch.return_value.commit.call_count == 3
+    assert db.batch.return_value.set.call_count == 1200
+    assert adapted == []
+    
+    book_fields = db.collection.return_value.document.return_value.collection.return_value \
+        .document.return_value.set.call_args[0][0]
+    assert book_fields["totalChapters"] == 1200
+    assert book_fields["chapterIndex"][0] == {"number": 1, "title": "Kapitel 0", "wordCount": 3}
+    assert "content" not in book_fields["chapterIndex"][0]
+    assert book_fields["status"] == "adapting"
+
+
+def test_adaptation_pipeline_resumes_pending_chapters():
+    """Test that only the given chapters are adapted, keeping their book positions"""
+    with patch('config.config.BOOK_ADAPT_PARALLELISM', 4):
+        pipeline = build_adaptation_pipeline("user-1", "book-1", [(3, "Kapitel 4"), (7, "Kapitel 8")], "A2")
+    
+    indices = sorted(task.args[2] for lane in pipeline.tasks for task in lane.tasks)
+    assert indices == [3, 7]
+
+
+def test_save_chapters_keeps_adapted_chapters():
+    """Test that saving the same chapters again leaves adapted chapters untouched"""
+    db = MagicMock()
+    chunks = [{"title": f"Kapitel {i}", "content": f"Text {i}", "word_count": 2} for i in range(3)]
+    existing = []
+    for i, adapted in enumerate([True, False]):
+        snapshot = MagicMock(id=book_store.chapter_id(i + 1))
+        snapshot.to_dict.return_value = {
+            "number": i + 1,
+            "sourceHash": book_store.source_hash(f"Text {i}"),
+            "isAdapted": adapted,
+        }
+        existing.append(snapshot)
+    chapters = db.collection.return_value.document.return_value.collection.return_value \
+        .document.return_value.collection.return_value
+    chapters.select.return_value.stream.return_value = existing
+    
+    adapted = book_store.save_chapters(db, "user-1", "book-1", chunks)
+    
+    assert adapted == [1]
+    # Only the new third chapter is written
+    assert db.batch.return_value.set.call_count == 1
+    book_fields = db.collection.return_value.document.return_value.collection.return_value \
+        .document.return_value.set.call_args[0][0]
+    assert book_fields["adaptedChapters"] == [1]
+
+
+def test_save_chapters_does_not_index_failed_chapters():
+    """Test that a chapter failing for good raises before the book index is written"""
+    db = MagicMock()
+    db.batch.return_value.commit.side_effect = firebase_service.google_exceptions.InvalidArgument("too big")
+    chunks = [{"title": "Kapitel 1", "content": "Es war einmal.", "word_count": 3}]
+    
+    with patch('services.firebase_service.time.sleep'):
+        with pytest.raises(book_store.ChapterWriteError):
+            book_store.save_chapters(db, "user-1", "book-1", chunks)
+    
+    book = db.collection.return_value.document.return_value.collection.return_value.document.return_value
+    book.set.assert_not_called()
+
+
+def test_adapt_chapter_skips_already_adapted():
+    """Test that a redelivered chapter task does not call the LLM again"""
+    with patch('services.queue.interactive_backlog', return_value=0), \
+            patch('services.book_jobs.is_cancelled', return_value=False), \
+            patch('services.firebase_service.get_firestore_client', return_value=MagicMock()), \
+            patch('services.book_store.is_chapter_adapted', return_value=True), \
+            patch('services.llm.LLMService.adapt_content') as adapt_content:
+        result = adapt_chapter("user-1", "book-1", 0, "Kapitel 1", "A2")
+    
+    assert result == {'status': 'skipped', 'chapter_index': 0}
+    adapt_content.assert_not_called()
+
+
+def test_tasks_routed_by_priority_class():
+    """Test that interactive, bulk and conversion tasks go to separate queues"""
+    router = celery_app.amqp.router
+    
+    assert router.route({}, 'generate_concept_card_task')['queue'].name == 'interactive'
+    assert router.route({}, 'generate_story_task')['queue'].name == 'interactive'
+    assert router.route({}, 'adapt_chapter')['queue'].name == 'bulk'
+    assert router.route({}, 'process_book_upload')['queue'].name == 'conversion'
+
+
+def test_adapt_chapter_yields_to_interactive_backlog():
+    """Test that chapter adaptation is deferred while interactive tasks are waiting"""
+    with patch('services.queue.interactive_backlog', return_value=3), \
+            patch('services.book_jobs.is_cancelled', return_value=False), \
+            patch('services.retries.record_deferral', return_value=1), \
+            patch.object(adapt_chapter, 'retry', side_effect=Retry()) as retry, \
+            patch('services.llm.LLMService.adapt_content') as adapt_content:
+        with pytest.raises(Retry):
+            adapt_chapter("user-1", "book-1", 0, "Kapitel 1", "A2")
+    
+    retry.assert_called_once()
+    adapt_content.assert_not_called()
+
+
+def test_adapt_chapter_runs_once_deferrals_are_used_up():
+    """Test that deferrals have their own budget, apart from error retries"""
+    with patch('services.queue.interactive_backlog', return_value=3), \
+            patch('services.book_jobs.is_cancelled', return_value=False), \
+            patch('config.config.PREEMPT_MAX_DEFERRALS', 40), \
+            patch('services.retries.record_deferral', return_value=41), \
+            patch('services.firebase_service.get_firestore_client', return_value=MagicMock()), \
+            patch('services.book_store.is_chapter_adapted', return_value=True), \
+            patch.object(adapt_chapter, 'retry') as retry:
+        result = adapt_chapter("user-1", "book-1", 0, "Kapitel 1", "A2")
+    
+    assert result == {'status': 'skipped', 'chapter_index': 0}
+    retry.assert_not_called()
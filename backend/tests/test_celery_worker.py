@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from celery_worker import worker_argv
+
+
+def test_conversion_profile_is_memory_capped_prefork():
+    """Test that conversion workers use a small prefork pool with a memory cap"""
+    argv = worker_argv('conversion')
+    
+    assert '--pool=prefork' in argv
+    assert '--queues=conversion' in argv
+    assert any(arg.startswith('--max-memory-per-child=') for arg in argv)
+
+
+def test_llm_profile_uses_threads_with_overrides():
+    """Test that LLM workers use a thread pool and accept queue/concurrency overrides"""
+    argv = worker_argv('llm', queues=['bulk'], concurrency=16)
+    
+    assert '--pool=threads' in argv
+    assert '--queues=bulk' in argv
+    assert '--concurrency=16' in argv
+    assert not any(arg.startswith('--max-memory-per-child=') for arg in argv)
+
+
+def test_unknown_profile():
+    """Test that an unknown profile is rejected"""
+    with pytest.raises(ValueError):
+        worker_argv('gpu')
@@ -0,0 +1,94 @@
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.chunker import StreamingChunker
+
+
+def _spans(text, target, **kwargs):
+    return list(StreamingChunker(target, **kwargs).iter_spans(text.splitlines(keepends=True)))
+
+
+def test_spans_are_offsets_into_source():
+    """Test that spans slice the original text instead of copying it"""
+    filler = "Wort " * 60
+    text = f"Kapitel 1\n{filler}\n\nKapitel 2\n  {filler}\n"
+    
+    spans = _spans(text, 1500)
+    
+    assert [s.title for s in spans] == ["Kapitel 1", "Kapitel 2"]
+    for span in spans:
+        content = text[span.start:span.end]
+        assert content == content.strip()
+        assert len(content.split()) == span.word_count == 60
+
+
+def test_front_matter_dropped_when_chapters_exist():
+    """Test that text before the first chapter marker is ignored"""
+    text = "Impressum " * 80 + "\n\nChapter 1\n" + "Text " * 80
+    
+    spans = _spans(text, 1500)
+    
+    assert len(spans) == 1
+    assert "Impressum" not in text[spans[0].start:spans[0].end]
+
+
+def test_oversized_paragraph_split_at_sentences():
+    """Test that a huge paragraph is never cut mid-sentence"""
+    sentence = "Der Hund läuft z.B. am 3. Mai schnell durch den großen Park. "
+    text = sentence * 100  # one paragraph, ~1100 words
+    
+    spans = _spans(text, 120)
+    
+    assert len(spans) > 1
+    for span in spans:
+        content = text[span.start:span.end]
+        assert content.startswith("Der Hund")
+        assert content.endswith("Park.")
+        assert span.word_count <= 120
+
+
+def test_small_chunks_filtered():
+    """Test that chunks under the minimum word count are dropped"""
+    text = "Chapter 1\nshort\n\nChapter 2\n" + "Wort " * 60
+    
+    spans = _spans(text, 1500)
+    
+    assert [s.title for s in spans] == ["Chapter 2"]
+
+
+def test_token_budget_is_a_hard_limit():
+    """Test that token-budget chunks never exceed the budget, even for run-on sentences"""
+    from services.chunker import TokenBudget
+    
+    budget = TokenBudget(tokens=100, count_tokens=lambda text: len(text) // 4 + 1, key="test")
+    # Long compounds cost more tokens than words; one run-on sentence has no boundary
+    chapter = "Donaudampfschifffahrtsgesellschaftskapitän " * 150
+    text = "Kapitel 1\n" + chapter + "\n\nKapitel 2\n" + "Haus. " * 60 + "\n"
+    
+    spans = list(StreamingChunker.for_token_budget(budget, min_word_count=0).iter_spans(
+        text.splitlines(keepends=True)
+    ))
+    
+    assert len(spans) > 2
+    for span in spans:
+        assert span.size <= budget.tokens
+        assert budget.count_tokens(text[span.start:span.end]) <= budget.tokens * 1.1
+
+
+def test_adaptation_token_budget_leaves_room_for_prompt_and_output():
+    """Test that the chunk budget fits the context window together with prompt and output"""
+    from unittest.mock import patch
+    from config import config
+    from services.llm import LLMService
+    
+    with patch.object(LLMService, 'get_context_window', return_value=8192), \
+         patch.object(LLMService, 'count_tokens', side_effect=lambda text, model=None: len(text) // 4):
+        budget = LLMService.adaptation_token_budget("ollama/test", "A2", "German")
+    
+    system_tokens = len(LLMService._adapt_system_prompt("A2", "German")) // 4
+    expected_output = budget.tokens * config.ADAPT_OUTPUT_RATIO + config.ADAPT_OUTPUT_OVERHEAD_TOKENS
+    assert system_tokens + budget.tokens + expected_output <= 8192
+    assert budget.tokens <= config.CHUNK_MAX_TOKENS
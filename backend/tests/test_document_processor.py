@@ -83,3 +83,60 @@ This is chapter 2 content. {content_filler}
         processor = DocumentProcessor()
         with pytest.raises(ValueError):
             processor.process_document("test.txt")
+
+    @patch('services.document_processor.DocumentConverter')
+    def test_conversion_cache_skips_reconversion(self, mock_converter_cls, tmp_path):
+        """Test that a re-upload with the same content hash reuses the cached conversion"""
+        mock_converter = MagicMock()
+        mock_converter_cls.return_value = mock_converter
+        
+        mock_result = MagicMock()
+        mock_result.document.export_to_markdown.return_value = "Cached PDF content " * 10
+        mock_result.document.title = "Cached"
+        mock_result.document.author = "Author"
+        mock_result.document.pages = [1]
+        mock_converter.convert.return_value = mock_result
+        
+        with patch('config.config.CONVERSION_CACHE_DIR', str(tmp_path)):
+            first = DocumentProcessor().process_document("book.pdf", content_hash="abc123")
+            second = DocumentProcessor().process_document("book.pdf", content_hash="abc123")
+        
+        assert mock_converter.convert.call_count == 1
+        assert second["text"] == first["text"]
+        assert first["cache_hit"] is False
+        assert second["cache_hit"] is True
+
+    def test_chunk_document_cache(self, tmp_path):
+        """Test that chunk boundaries are cached per content hash and target size"""
+        text = ("Satz " * 60 + "\n\n") * 4
+        
+        with patch('config.config.CONVERSION_CACHE_DIR', str(tmp_path)):
+            processor = DocumentProcessor()
+            chunks = processor.chunk_document(text, content_hash="abc123", target_word_count=100)
+            
+            with patch.object(DocumentProcessor, 'chunk_spans') as mock_chunk:
+                cached = processor.chunk_document(text, content_hash="abc123", target_word_count=100)
+                mock_chunk.assert_not_called()
+                
+                # A different target size is chunked again
+                processor.chunk_document(text, content_hash="abc123", target_word_count=50)
+                mock_chunk.assert_called_once()
+        
+        assert len(chunks) > 1
+        assert cached == chunks
+
+    @patch('services.document_processor.DocumentConverter')
+    def test_resident_processor_reused_and_recycled(self, mock_converter_cls):
+        """Test that workers reuse one processor and rebuild it after the document limit"""
+        import services.document_processor as dp
+        
+        with patch('config.config.CONVERTER_MAX_DOCUMENTS', 2), \
+             patch('config.config.CONVERTER_MAX_RSS_GROWTH_MB', 0):
+            first = dp.preload_document_processor()
+            assert dp.get_document_processor() is first
+            
+            dp.record_document_processed()
+            assert dp.get_document_processor() is first
+            
+            dp.record_document_processed()
+            assert dp.get_document_processor() is not first
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import firebase_service
+
+
+def test_async_client_shared_per_event_loop():
+    """Test that requests on one event loop share a client and another loop gets its own"""
+    async def two_lookups():
+        return firebase_service.get_async_firestore_client(), firebase_service.get_async_firestore_client()
+
+    with patch('services.firebase_service.initialize_firebase', return_value=MagicMock()), \
+            patch('services.firebase_service.google_firestore.AsyncClient', side_effect=lambda **kwargs: MagicMock()) as client_class, \
+            patch('services.firebase_service._async_db', None):
+        first, again = asyncio.run(two_lookups())
+        other, _ = asyncio.run(two_lookups())
+
+    assert first is again
+    assert other is not first
+    assert client_class.call_count == 2
+
+
+def test_get_document_awaits_async_client():
+    """Test that document helpers use the async client instead of blocking calls"""
+    db = MagicMock()
+    doc_ref = db.collection.return_value.document.return_value
+    snapshot = MagicMock(exists=True, id="story-1")
+    snapshot.to_dict.return_value = {"title": "Im Zoo"}
+    doc_ref.get = AsyncMock(return_value=snapshot)
+    doc_ref.update = AsyncMock()
+
+    async def run():
+        document = await firebase_service.get_document("stories", "story-1")
+        updated = await firebase_service.update_document("stories", "story-1", {"isRead": True})
+        return document, updated
+
+    with patch('services.firebase_service.get_async_firestore_client', return_value=db):
+        document, updated = asyncio.run(run())
+
+    assert document == {"id": "story-1", "title": "Im Zoo"}
+    assert updated is True
+    doc_ref.update.assert_awaited_once_with({"isRead": True})
+
+
+def test_bulk_writer_commits_in_batches():
+    """Test that buffered writes are committed in batches of at most the batch size, the rest on exit"""
+    db = MagicMock()
+
+    with patch('services.firebase_service.time.sleep'):
+        with firebase_service.BulkWriter(db, batch_size=500, flush_seconds=3600) as writer:
+            for i in range(1200):
+                writer.set(db.collection("texts").document(str(i)), {"title": f"Story {i}"})
+            assert db.batch.return_value.commit.call_count == 2
+
+    assert db.batch.return_value.commit.call_count == 3
+    assert db.batch.return_value.set.call_count == 1200
+    assert writer.report()["writes"] == 1200
+    assert writer.report()["batches"] == 3
+
+
+def test_bulk_writer_retries_with_new_batch():
+    """Test that a failed commit is retried with a fresh batch and contention slows the writer"""
+    db = MagicMock()
+    failing, succeeding = MagicMock(), MagicMock()
+    failing.commit.side_effect = firebase_service.google_exceptions.Aborted("contention")
+    db.batch.side_effect = [failing, succeeding]
+
+    with patch('services.firebase_service.time.sleep') as sleep:
+        writer = firebase_service.BulkWriter(db, max_writes_per_second=100, flush_seconds=3600)
+        writer.update(MagicMock(), {"status": "approved"})
+        stats = writer.close()
+
+    succeeding.update.assert_called_once()
+    assert stats["writes"] == 1
+    assert stats["retries"] == 1
+    assert sleep.call_count == 1
+    # Halved by the contention error, then grown by 1.5x after the successful commit
+    assert writer._rate == 75
+
+
+def test_bulk_writer_counts_failed_batches():
+    """Test that a batch failing for good is counted and writing continues"""
+    db = MagicMock()
+    db.batch.return_value.commit.side_effect = firebase_service.google_exceptions.InvalidArgument("too big")
+
+    with patch('services.firebase_service.time.sleep'):
+        writer = firebase_service.BulkWriter(db, flush_seconds=3600)
+        writer.set(MagicMock(), {"title": "Story"})
+        stats = writer.close()
+
+    assert stats["failed"] == 1
+    assert stats["writes"] == 0
+    assert db.batch.return_value.commit.call_count == 1
+
+
+def test_bulk_writer_bisects_batch_with_bad_write():
+    """Test that one invalid document fails alone and the rest of its batch is written"""
+    db = MagicMock()
+    batches = []
+
+    def new_batch():
+        batch = MagicMock()
+
+        def commit():
+            if any(call.args[0].path == "texts/bad" for call in batch.set.call_args_list):
+                raise firebase_service.google_exceptions.InvalidArgument("too big")
+
+        batch.commit.side_effect = commit
+        batches.append(batch)
+        return batch
+
+    db.batch.side_effect = new_batch
+    refs = [MagicMock(path=f"texts/{i}") for i in range(7)] + [MagicMock(path="texts/bad")]
+
+    with patch('services.firebase_service.time.sleep'):
+        writer = firebase_service.BulkWriter(db, flush_seconds=3600)
+        for ref in refs:
+            writer.set(ref, {"title": "Story"})
+        stats = writer.close()
+
+    assert stats["writes"] == 7
+    assert stats["failed"] == 1
+    assert stats["failed_refs"] == ["texts/bad"]
+    # 8 -> 4 + 4 -> 2 + 2 -> 1 + 1
+    assert len(batches) == 7
+    assert writer.summary().endswith("; failed: texts/bad")
+
+
+def test_verify_token_cached_until_exp():
+    """Test that a verified token is answered from memory and verified again after its exp"""
+    claims = {"uid": "user-1", "exp": 1_000_100}
+
+    with patch('services.firebase_service.auth.verify_id_token', return_value=claims) as verify, \
+            patch('services.firebase_service.time.time', return_value=1_000_000) as now:
+        firebase_service.clear_token_cache()
+        first = asyncio.run(firebase_service.verify_token("token-a"))
+        second = asyncio.run(firebase_service.verify_token("token-a"))
+        assert verify.call_count == 1
+        now.return_value = 1_000_100
+        asyncio.run(firebase_service.verify_token("token-a"))
+
+    assert first == second == claims
+    assert verify.call_count == 2
+    firebase_service.clear_token_cache()
+
+
+def test_verify_token_does_not_cache_invalid_tokens():
+    """Test that a rejected token is verified again on every request"""
+    with patch('services.firebase_service.auth.verify_id_token', side_effect=ValueError("bad signature")) as verify:
+        firebase_service.clear_token_cache()
+        assert asyncio.run(firebase_service.verify_token("forged")) is None
+        assert asyncio.run(firebase_service.verify_token("forged")) is None
+
+    assert verify.call_count == 2
+
+
+def test_refresh_signing_keys_bypasses_http_cache():
+    """Test that the key refresh goes through the SDK's cached session with no-cache"""
+    request = MagicMock(return_value=MagicMock(status=200))
+
+    with patch('services.firebase_service.initialize_firebase', return_value=MagicMock()), \
+            patch('services.firebase_service.auth._get_client') as get_client:
+        get_client.return_value._token_verifier.request = request
+        assert firebase_service.refresh_signing_keys() is True
+
+    url = request.call_args[0][0]
+    assert url == firebase_service._token_gen.ID_TOKEN_CERT_URI
+    assert request.call_args.kwargs["headers"] == {"Cache-Control": "no-cache"}
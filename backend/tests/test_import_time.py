@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous for slow CI machines; importing eagerly took 7s+ (litellm, Firebase credential discovery)
+IMPORT_BUDGET_SECONDS = 3.0
+
+# Loaded on first use, never at import
+LAZY_MODULES = ["litellm", "docling"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+import firebase_admin
+print(json.dumps({{
+    "seconds": elapsed,
+    "loaded": [name for name in {lazy!r} if name in sys.modules],
+    "firebase_apps": len(firebase_admin._apps),
+}}))
+"""
+
+
+def _import_in_fresh_process(module):
+    """Import a module in a new interpreter, so modules already imported by the tests don't count"""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, lazy=LAZY_MODULES)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, timeout=60, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_api_import_is_lazy_and_within_budget():
+    """Test that importing the API loads no LLM, Docling or Firebase app and stays within budget"""
+    result = _import_in_fresh_process("main")
+
+    assert result["loaded"] == []
+    assert result["firebase_apps"] == 0
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS
+
+
+def test_worker_import_is_lazy():
+    """Test that importing the Celery app (worker boot) defers LiteLLM, Docling and Firebase"""
+    result = _import_in_fresh_process("services.queue")
+
+    assert result["loaded"] == []
+    assert result["firebase_apps"] == 0
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,96 @@
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.jobs import claim_result, job_key, submit_job
+
+
+@pytest.fixture
+def redis_client():
+    """In-memory Redis that runs the Lua scripts"""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    client = fakeredis.FakeRedis(decode_responses=True)
+    with patch('services.jobs.get_redis', return_value=client):
+        yield client
+
+
+def _task(state="STARTED", result=None):
+    task = MagicMock()
+    task.name = "generate_concept_card_task"
+    task.AsyncResult.return_value.state = state
+    task.AsyncResult.return_value.result = result
+    return task
+
+
+def test_job_key_ignores_case_and_spacing():
+    """Test that trivially different requests map to the same job"""
+    a = job_key("generate_concept_card_task", {"topic": "Dativ  Präpositionen", "level": "A2", "model": None})
+    b = job_key("generate_concept_card_task", {"topic": "dativ präpositionen ", "level": "a2", "model": None})
+    c = job_key("generate_exercises_task", {"topic": "Dativ Präpositionen", "level": "A2", "model": None})
+
+    assert a == b
+    assert a != c
+
+
+def test_submit_job_enqueues_new_job(redis_client):
+    """Test that the first request enqueues the task under the reserved id, not marked shared"""
+    task = _task()
+
+    job_id, reused = submit_job(task, topic="Dativ", level="A2")
+
+    assert reused is False
+    task.apply_async.assert_called_once_with(kwargs={"topic": "Dativ", "level": "A2"}, task_id=job_id)
+    assert not redis_client.exists(f"job:{job_id}:dedup")
+    # Its only requester may delete the result
+    assert claim_result(job_id) is True
+
+
+def test_submit_job_reuses_running_job(redis_client):
+    """Test that an identical request gets the existing task id, which is then shared"""
+    task = _task(state="STARTED")
+
+    first, _ = submit_job(task, topic="Dativ", level="A2")
+    job_id, reused = submit_job(task, topic="dativ", level="A2")
+
+    assert (job_id, reused) == (first, True)
+    assert task.apply_async.call_count == 1
+    assert claim_result(first) is False
+
+
+def test_consumed_job_is_not_handed_out(redis_client):
+    """Test that once the only requester consumed a result, the next request submits anew"""
+    task = _task(state="SUCCESS", result={"title": "Dativ"})
+
+    first, _ = submit_job(task, topic="Dativ", level="A2")
+    assert claim_result(first) is True
+    job_id, reused = submit_job(task, topic="Dativ", level="A2")
+
+    assert reused is False
+    assert job_id != first
+    assert task.apply_async.call_count == 2
+
+
+def test_submit_job_retries_failed_job_once(redis_client):
+    """Test that a failed job is replaced by one request, and the next one reuses the replacement"""
+    task = _task(state="SUCCESS", result={"error": "LLM unavailable"})
+    failed, _ = submit_job(task, topic="Dativ", level="A2")
+
+    retried, reused = submit_job(task, topic="Dativ", level="A2")
+    assert reused is False
+    assert retried != failed
+
+    # A request that still saw the failed id loses the swap and reuses the retry
+    task.AsyncResult.side_effect = lambda job_id: MagicMock(
+        state="SUCCESS", result={"error": "LLM unavailable"} if job_id == failed else {"title": "Dativ"}
+    )
+    with patch.object(redis_client, 'get', side_effect=[failed, retried]):
+        job_id, reused = submit_job(task, topic="Dativ", level="A2")
+
+    assert (job_id, reused) == (retried, True)
+    assert task.apply_async.call_count == 2
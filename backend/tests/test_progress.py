@@ -0,0 +1,48 @@
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.progress import decode_progress, progress_key, report_progress
+
+
+def test_decode_progress_estimates_eta_while_adapting():
+    """Test that adaptation progress and ETA come from the chapter counters"""
+    raw = {
+        "phase": "adapting",
+        "chapters_total": "10",
+        "chapters_adapted": "4",
+        "chapters_failed": "1",
+        "adapt_started_at": "1000.0",
+    }
+    
+    event = decode_progress(raw, now=1100.0)
+    
+    assert event["chapters_adapted"] == 4
+    assert event["progress"] == 55.0  # 10% before adapting, then 90% * 5/10
+    assert event["eta_seconds"] == 100  # 20s per chapter, 5 chapters left
+
+
+def test_report_progress_updates_snapshot_and_publishes():
+    """Test that a progress update is stored and the full snapshot is published"""
+    client = MagicMock()
+    pipe = client.pipeline.return_value.__enter__.return_value
+    pipe.execute.return_value = [1, 5, True, {"phase": "adapting", "chapters_total": "10", "chapters_adapted": "5"}]
+    
+    with patch('services.progress.get_redis', return_value=client):
+        event = report_progress("book-1", increment={"chapters_adapted": 1})
+    
+    pipe.hincrby.assert_called_once_with(progress_key("book-1"), "chapters_adapted", 1)
+    channel, payload = client.publish.call_args[0]
+    assert channel == progress_key("book-1")
+    assert json.loads(payload) == event
+    assert event["progress"] == 55.0
+
+
+def test_report_progress_never_fails_the_task():
+    """Test that Redis errors are swallowed"""
+    with patch('services.progress.get_redis', side_effect=ConnectionError("down")):
+        assert report_progress("book-1", "converting") is None
@@ -0,0 +1,55 @@
+import os
+import sys
+from unittest.mock import patch
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import result_codec
+from services.queue import celery_app, get_task_status
+
+
+def test_small_results_are_not_compressed():
+    """Test that small results round-trip without compression"""
+    result = {"status": "SUCCESS", "result": {"title": "Der Hund", "words": ["der", "Hund"]}}
+
+    payload = result_codec.dumps(result)
+
+    assert payload[:1] == b'M'
+    assert result_codec.loads(payload) == result
+
+
+def test_large_results_are_compressed():
+    """Test that results above the threshold are compressed and still decode"""
+    result = {"status": "SUCCESS", "result": {"story": "Es war einmal ein Hund. " * 500}}
+
+    with patch('config.config.RESULT_COMPRESS_THRESHOLD_BYTES', 1024):
+        payload = result_codec.dumps(result)
+
+    assert payload[:1] == b'm'
+    assert len(payload) < 1024
+    assert result_codec.loads(payload) == result
+
+
+def test_json_payloads_readable_without_msgpack():
+    """Test that workers without msgpack write JSON that any worker can read"""
+    result = {"status": "SUCCESS", "result": "Kapitel " * 400}
+
+    with patch.object(result_codec, 'msgpack', None):
+        payload = result_codec.dumps(result)
+        assert payload[:1] == b'j'
+        assert result_codec.loads(payload) == result
+
+
+def test_get_task_status_consume_forgets_result():
+    """Test that consuming a finished result deletes it from the backend"""
+    with patch.object(celery_app, 'AsyncResult') as async_result, \
+            patch('services.queue.claim_result', return_value=True):
+        task = async_result.return_value
+        task.state = 'SUCCESS'
+        task.result = {"story": "Es war einmal."}
+
+        status = get_task_status("job-1", consume=True)
+
+    assert status == {"task_id": "job-1", "status": "SUCCESS", "result": {"story": "Es war einmal."}}
+    task.forget.assert_called_once()
@@ -0,0 +1,126 @@
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+from celery.exceptions import Retry
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.retries import PERMANENT, TRANSIENT, backoff_seconds, classify_error, requeue_dead_letter, retry_or_dead_letter
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def _wrapped(error):
+    """Error as raised by LLMService.chat_completion"""
+    try:
+        raise Exception("LLM completion failed") from error
+    except Exception as e:
+        return e
+
+
+def _task():
+    task = MagicMock()
+    task.name = "generate_concept_card_task"
+    task.request.id = "task-1"
+    task.request.args = []
+    task.request.kwargs = {"topic": "Dativ", "level": "A2"}
+    task.retry.side_effect = Retry()
+    return task
+
+
+def test_classify_error_by_cause():
+    """Test that timeouts and server errors are retried but bad requests are not"""
+    assert classify_error(_wrapped(ProviderError(503))) == TRANSIENT
+    assert classify_error(_wrapped(ProviderError(429))) == TRANSIENT
+    assert classify_error(_wrapped(TimeoutError("read timeout"))) == TRANSIENT
+    assert classify_error(_wrapped(ProviderError(400))) == PERMANENT
+    assert classify_error(ValueError("Unexpected response format")) == PERMANENT
+
+
+def test_backoff_grows_and_is_capped():
+    """Test that the retry delay doubles per attempt, with jitter, up to the cap"""
+    with patch('config.config.TASK_RETRY_BASE_DELAY_SECONDS', 5), \
+            patch('config.config.TASK_RETRY_MAX_DELAY_SECONDS', 60):
+        assert 2.5 <= backoff_seconds(0) <= 5
+        assert 10 <= backoff_seconds(2) <= 20
+        assert 30 <= backoff_seconds(10) <= 60
+
+
+def test_transient_error_is_retried():
+    """Test that a transient error schedules a retry instead of failing"""
+    task = _task()
+
+    with patch('services.retries._record_failure', return_value=1), \
+            patch('services.retries.dead_letter') as dead_letter:
+        with pytest.raises(Retry):
+            retry_or_dead_letter(task, _wrapped(ProviderError(503)))
+
+    assert task.retry.call_args.kwargs["countdown"] > 0
+    dead_letter.assert_not_called()
+
+
+def test_permanent_or_exhausted_errors_are_dead_lettered():
+    """Test that bad requests and errors out of retries go to the dead-letter queue"""
+    task = _task()
+
+    with patch('config.config.TASK_MAX_RETRIES', 3), \
+            patch('services.retries._record_failure', return_value=4), \
+            patch('services.retries.dead_letter') as dead_letter:
+        retry_or_dead_letter(task, _wrapped(ProviderError(400)))
+        retry_or_dead_letter(task, _wrapped(ProviderError(503)))
+
+    task.retry.assert_not_called()
+    assert [c.args[2] for c in dead_letter.call_args_list] == [PERMANENT, TRANSIENT]
+
+
+def test_requeue_dead_letter_resubmits_task():
+    """Test that a requeued task is sent again with its original arguments"""
+    client = MagicMock()
+    client.get.return_value = json.dumps({
+        "task_id": "task-1", "task": "generate_concept_card_task",
+        "args": [], "kwargs": {"topic": "Dativ", "level": "A2"},
+    })
+    client.pipeline.return_value.__enter__.return_value.execute.return_value = [1, 1]
+
+    with patch('services.retries.get_redis', return_value=client), \
+            patch('services.queue.celery_app.send_task') as send_task:
+        send_task.return_value.id = "task-2"
+        assert requeue_dead_letter("task-1") == "task-2"
+
+    send_task.assert_called_once_with(
+        "generate_concept_card_task", args=[], kwargs={"topic": "Dativ", "level": "A2"}
+    )
+
+
+def test_requeue_chapter_rejoins_its_book():
+    """Test that a dead chapter is re-run with a finalize step and registered for cancel"""
+    client = MagicMock()
+    client.get.return_value = json.dumps({
+        "task_id": "task-1", "task": "adapt_chapter",
+        "args": ["user-1", "book-1", 3, "Kapitel 4", "A2", None, "German"], "kwargs": {},
+    })
+    client.pipeline.return_value.__enter__.return_value.execute.return_value = [1, 1]
+    pipeline = MagicMock()
+
+    with patch('services.retries.get_redis', return_value=client), \
+            patch('services.book_jobs.is_cancelled', return_value=False), \
+            patch('services.book_jobs.get_job', return_value={"user_id": "user-1", "task_ids": []}), \
+            patch('services.book_jobs.add_tasks') as add_tasks, \
+            patch('services.progress.report_progress'), \
+            patch('services.queue.build_adaptation_pipeline', return_value=pipeline) as build, \
+            patch('services.queue.pipeline_task_ids', return_value=["chapter-2", "finalize-2"]), \
+            patch('services.queue.celery_app.send_task') as send_task:
+        assert requeue_dead_letter("task-1") == "chapter-2"
+
+    build.assert_called_once_with("user-1", "book-1", [(3, "Kapitel 4")], "A2", None, "German")
+    add_tasks.assert_called_once_with("book-1", ["chapter-2", "finalize-2"])
+    pipeline.apply_async.assert_called_once()
+    send_task.assert_not_called()
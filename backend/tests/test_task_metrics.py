@@ -0,0 +1,105 @@
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import task_metrics
+from scripts.autoscale_controller import inspect_workers, recommend
+
+
+def _histogram(**buckets):
+    counts = {bound: 0 for bound in task_metrics.BUCKETS}
+    counts['+Inf'] = 0
+    for bound, count in buckets.items():
+        counts[float(bound[1:].replace('_', '.'))] = count
+    total = sum(buckets.values())
+    return {'buckets': counts, 'sum': 0.0, 'count': total}
+
+
+def test_record_start_observes_wait_since_enqueue():
+    """Test that the wait is measured from the enqueue stamp to task start"""
+    client = MagicMock()
+    pipe = client.pipeline.return_value.__enter__.return_value
+    task = SimpleNamespace(request=SimpleNamespace(
+        enqueued_at=1000.0, eta=None, delivery_info={'routing_key': 'bulk'}
+    ))
+
+    with patch('services.task_metrics.get_redis', return_value=client), \
+            patch('services.task_metrics.time.time', return_value=1004.0):
+        task_metrics.record_start(task)
+
+    pipe.hincrby.assert_any_call("metrics:hist:wait:bulk", "5", 1)
+    pipe.hincrbyfloat.assert_any_call("metrics:hist:wait:bulk", "sum", 4.0)
+
+
+def test_render_prometheus_cumulative_buckets():
+    """Test that histograms are exposed with cumulative buckets"""
+    snapshot = {
+        'queues': {'bulk': {
+            'depth': 7, 'started': 3, 'busy_seconds': 90.0,
+            'wait': _histogram(b1=2, b60=1),
+        }},
+        'tasks': {'adapt_chapter': {
+            'runtime': _histogram(b30=3),
+            'outcomes': {'succeeded': 2, 'failed': 0, 'retried': 1, 'dead_lettered': 0},
+        }},
+    }
+
+    text = task_metrics.render_prometheus(snapshot)
+
+    assert 'celery_queue_depth{queue="bulk"} 7' in text
+    assert 'celery_task_wait_seconds_bucket{queue="bulk",le="1"} 2' in text
+    assert 'celery_task_wait_seconds_bucket{queue="bulk",le="+Inf"} 3' in text
+    assert 'celery_task_outcomes_total{task="adapt_chapter",outcome="retried"} 1' in text
+
+
+def test_recommend_scales_with_backlog_and_wait():
+    """Test that a growing backlog with slow starts asks for more workers"""
+    previous = {'depth': 0, 'started': 0, 'busy_seconds': 0.0, 'wait': _histogram()}
+    current = {'depth': 400, 'started': 60, 'busy_seconds': 1800.0, 'wait': _histogram(b120=60)}
+
+    busy = recommend('bulk', previous, current, elapsed=60, workers=1, slots=32,
+                     target_wait=10, drain_seconds=300, utilization=0.7, min_workers=1, max_workers=10)
+    idle = recommend('bulk', current, {**current, 'depth': 0, 'started': 60, 'busy_seconds': 1800.0},
+                     elapsed=60, workers=4, slots=32,
+                     target_wait=10, drain_seconds=300, utilization=0.7, min_workers=1, max_workers=10)
+
+    # 1 task/s x 30s = 30 busy slots, plus 400 x 30s / 300s = 40 to drain
+    assert busy['desired'] == 4
+    assert busy['action'] == 'scale_up'
+    assert idle['desired'] == 1
+    assert idle['action'] == 'scale_down'
+
+
+def test_recommend_caps_llm_queues_at_admission_limit():
+    """Test that workers past the admission limit are not recommended, however long the wait"""
+    previous = {'depth': 0, 'started': 0, 'busy_seconds': 0.0, 'wait': _histogram()}
+    current = {'depth': 400, 'started': 60, 'busy_seconds': 1800.0, 'wait': _histogram(b120=60)}
+
+    capped = recommend('interactive', previous, current, elapsed=60, workers=1, slots=16,
+                       target_wait=10, drain_seconds=300, utilization=0.7, min_workers=1, max_workers=10,
+                       max_slots=16)
+
+    # Run time is mostly admission wait: a second worker would only queue behind the first
+    assert capped['desired'] == 1
+    assert capped['action'] == 'hold'
+
+
+def test_inspect_workers_reads_pool_size():
+    """Test that slots come from the pool size the workers report"""
+    stats = {
+        'interactive@a': {'pool': {'max-concurrency': 16}},
+        'interactive-bulk@b': {'pool': {'max-concurrency': 16}},
+        'conversion@c': {'pool': {'max-concurrency': 1}},
+    }
+
+    with patch('scripts.autoscale_controller.celery_app') as app:
+        app.control.inspect.return_value.stats.return_value = stats
+        workers = inspect_workers()
+
+    assert workers['interactive'] == {'workers': 2, 'slots': 16}
+    assert workers['conversion'] == {'workers': 1, 'slots': 1}
+    assert workers['bulk'] == {'workers': 1, 'slots': 16}
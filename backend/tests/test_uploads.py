@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services.uploads import ResumableUploadStore, UploadInProgress
+
+client = TestClient(app)
+
+FORM = {"title": "Test", "level": "A2", "user_id": "user-1"}
+
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    with patch('config.config.UPLOAD_DIR', str(tmp_path)), \
+         patch('routes.books.report_progress'), \
+         patch('routes.books.register_job') as register_job, \
+         patch('routes.books.process_book_upload') as mock_task:
+        mock_task.apply_async.side_effect = lambda kwargs, task_id: MagicMock(id=task_id)
+        yield tmp_path, mock_task, register_job
+
+
+def test_upload_streams_hashes_and_renames(upload_dir):
+    """Test that an upload is stored in one pass with its content hash"""
+    tmp_path, mock_task, register_job = upload_dir
+    data = b"%PDF-1.4 " + os.urandom(3 * 1024 * 1024)
+    
+    response = client.post("/api/books/upload", data=FORM, files={"file": ("book.pdf", data)})
+    
+    assert response.status_code == 200
+    assert response.json()["content_hash"] == hashlib.sha256(data).hexdigest()
+    
+    kwargs = mock_task.apply_async.call_args.kwargs["kwargs"]
+    with open(kwargs["file_path"], "rb") as f:
+        assert f.read() == data
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".partial")]
+
+
+def test_job_registered_before_task_is_published(upload_dir):
+    """Test that the pre-assigned task id is registered for /cancel before the task is sent"""
+    tmp_path, mock_task, register_job = upload_dir
+    calls = []
+    register_job.side_effect = lambda *args: calls.append("register")
+    mock_task.apply_async.side_effect = lambda kwargs, task_id: calls.append("publish") or MagicMock(id=task_id)
+    
+    response = client.post("/api/books/upload", data=FORM, files={"file": ("book.pdf", b"%PDF-1.4 book")})
+    
+    body = response.json()
+    sent = mock_task.apply_async.call_args.kwargs
+    assert calls == ["register", "publish"]
+    register_job.assert_called_once_with(body["book_id"], "user-1", sent["kwargs"]["file_path"], [body["task_id"]])
+    assert sent["task_id"] == body["task_id"]
+
+
+def test_upload_too_large_leaves_nothing_behind(upload_dir):
+    """Test that oversized uploads are rejected with 413 and no partial file"""
+    tmp_path, mock_task, register_job = upload_dir
+    
+    with patch('config.config.MAX_UPLOAD_SIZE', 1024):
+        response = client.post("/api/books/upload", data=FORM, files={"file": ("book.pdf", b"x" * 4096)})
+    
+    assert response.status_code == 413
+    assert os.listdir(tmp_path) == []
+    mock_task.apply_async.assert_not_called()
+
+
+def test_resumable_upload_continues_from_offset(upload_dir):
+    """Test that a resumable upload can pick up where a dropped request stopped"""
+    tmp_path, mock_task, register_job = upload_dir
+    data = b"%PDF-1.4 " + os.urandom(5000)
+    
+    upload = client.post("/api/books/uploads", json={"filename": "book.pdf", "size": len(data)}).json()
+    upload_id = upload["upload_id"]
+    
+    first = client.patch(f"/api/books/uploads/{upload_id}", content=data[:2000], headers={"Upload-Offset": "0"})
+    assert first.json()["offset"] == 2000
+    
+    # A retried chunk at a stale offset is rejected
+    stale = client.patch(f"/api/books/uploads/{upload_id}", content=data[:2000], headers={"Upload-Offset": "0"})
+    assert stale.status_code == 409
+    
+    offset = client.get(f"/api/books/uploads/{upload_id}").json()["offset"]
+    client.patch(f"/api/books/uploads/{upload_id}", content=data[offset:], headers={"Upload-Offset": str(offset)})
+    
+    response = client.post(f"/api/books/uploads/{upload_id}/complete", data=FORM)
+    
+    assert response.status_code == 200
+    assert response.json()["content_hash"] == hashlib.sha256(data).hexdigest()
+    with open(mock_task.apply_async.call_args.kwargs["kwargs"]["file_path"], "rb") as f:
+        assert f.read() == data
+
+
+def test_resumable_upload_rejects_concurrent_writer(upload_dir):
+    """Test that a second writer is turned away while one holds the upload, and the hash stays incremental"""
+    tmp_path, mock_task, register_job = upload_dir
+    store = ResumableUploadStore()
+    data = b"%PDF-1.4 " + os.urandom(3000)
+
+    async def chunks(payload):
+        yield payload
+
+    async def run():
+        upload = store.create("book.pdf", len(data))
+        lock = store._try_lock(upload["upload_id"])
+        try:
+            with pytest.raises(UploadInProgress):
+                await store.append(upload["upload_id"], 0, chunks(data[:1000]))
+        finally:
+            os.close(lock)
+        await store.append(upload["upload_id"], 0, chunks(data[:1000]))
+        await store.append(upload["upload_id"], 1000, chunks(data[1000:]))
+        return await store.complete(upload["upload_id"])
+
+    with patch('services.uploads._hash_prefix') as hash_prefix:
+        file_path, content_hash, size = asyncio.run(run())
+
+    # The running digest covers every chunk, so the file is never read back
+    hash_prefix.assert_not_called()
+    assert content_hash == hashlib.sha256(data).hexdigest()
+    assert size == len(data)
+    with open(file_path, "rb") as f:
+        assert f.read() == data
+
+
+def test_resumable_upload_rebuilds_hash_in_new_process(upload_dir):
+    """Test that a store which did not see the first chunks still hashes the whole file"""
+    data = os.urandom(4000)
+
+    async def chunks(payload):
+        yield payload
+
+    async def run():
+        first = ResumableUploadStore()
+        upload = first.create("book.epub", len(data))
+        await first.append(upload["upload_id"], 0, chunks(data[:2500]))
+        second = ResumableUploadStore()
+        await second.append(upload["upload_id"], 2500, chunks(data[2500:]))
+        return await second.complete(upload["upload_id"])
+
+    _, content_hash, _ = asyncio.run(run())
+
+    assert content_hash == hashlib.sha256(data).hexdigest()
+
+
+def test_sweep_removes_abandoned_uploads(upload_dir):
+    """Test that uploads idle past the TTL are deleted and recent ones kept"""
+    store = ResumableUploadStore(ttl_seconds=60)
+    old = store.create("old.pdf", 100)["upload_id"]
+    fresh = store.create("fresh.pdf", 100)["upload_id"]
+    stale = os.path.getmtime(store._part_path(old)) - 3600
+    for path in (store._meta_path(old), store._part_path(old)):
+        os.utime(path, (stale, stale))
+
+    assert store.sweep() == 1
+    assert store.get(old) is None
+    assert store.get(fresh) is not None
@@ -0,0 +1,132 @@
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import vocabulary
+from services.queue import extract_vocabulary
+
+STORY = (
+    "Herr Müller ging mit seinem Hund durch den dunklen Wald. Der Hund bellte laut. "
+    "Anna wartete am Waldrand. Anna hatte Angst vor dem Gewitter. "
+    "Dr. Weber rief: „Komm schnell nach Hause!“ Anna lachte."
+)
+
+
+def test_count_chapter_tracks_context():
+    """Test that counts record articles, titles and where each word first appears"""
+    stats, tokens = vocabulary.count_chapter(STORY)
+
+    assert tokens == 33
+    assert "der" not in stats and "mit" not in stats
+    assert stats["hund"][vocabulary.DETERMINED] == 2
+    assert stats["müller"][vocabulary.TITLED] == 1
+    # The period after "Dr" does not end the sentence
+    assert stats["weber"][vocabulary.TITLED] == 1
+    assert vocabulary.example_sentence(STORY, stats["schnell"][vocabulary.FIRST_SEEN]) == \
+        "Dr. Weber rief: „Komm schnell nach Hause!“"
+
+
+def test_rank_vocabulary_drops_names_and_known_words():
+    """Test that names and words a learner at the level knows are left out, rarer words first"""
+    zipf = {"wald": 4.5, "hund": 4.8, "gewitter": 3.2, "ging": 5.6, "lachte": 4.0}
+
+    with patch('services.vocabulary.corpus_zipf', side_effect=lambda word: zipf.get(word, 2.0)):
+        words = vocabulary.extract_vocabulary([STORY], level="A2")
+
+    lemmas = [item["lemma"] for item in words]
+    assert "müller" not in lemmas and "weber" not in lemmas and "anna" not in lemmas
+    assert "ging" not in lemmas
+    assert lemmas.index("gewitter") < lemmas.index("lachte")
+    assert words[lemmas.index("gewitter")]["example"] == "Anna hatte Angst vor dem Gewitter."
+
+
+def test_count_chapters_in_process_pool():
+    """Test that counting chapters in a process pool gives the same result as in process"""
+    chapters = [STORY, STORY.upper(), "Ein neues Kapitel beginnt im Winter."]
+
+    assert vocabulary.count_chapters(chapters, processes=2) == vocabulary.count_chapters(chapters, processes=1)
+
+
+def test_count_chapters_reuses_one_pool_without_fork():
+    """Test that tasks share one process pool, started without forking the worker"""
+    chapters = [STORY, "Ein neues Kapitel beginnt im Winter."]
+    vocabulary.shutdown_pool()
+    try:
+        vocabulary.count_chapters(chapters, processes=2)
+        pool = vocabulary._pool
+        vocabulary.count_chapters(chapters, processes=2)
+
+        assert vocabulary._pool is pool
+        assert pool._mp_context.get_start_method() in ('forkserver', 'spawn')
+    finally:
+        vocabulary.shutdown_pool()
+    assert vocabulary._pool is None
+
+
+def test_apply_glosses_matches_by_word_only():
+    """Test that a gloss the LLM left out is not taken from a neighbouring word"""
+    words = [{"word": "Gewitter", "lemma": "gewitter"}, {"word": "bellen", "lemma": "bellen"}]
+    glosses = [{"word": "bellen", "definition": "to bark"}, {"word": "Unwetter", "definition": "storm"}]
+
+    glossed = vocabulary.apply_glosses(words, glosses)
+
+    assert [(item["word"], item["definition"]) for item in glossed] == [("Gewitter", ""), ("bellen", "to bark")]
+
+
+def test_forms_merge_without_lemmatizer():
+    """Test that inflected forms fold into a form seen in the same text"""
+    aliases = vocabulary._form_aliases(["hund", "hunde", "hunden", "dunkel", "gehen", "geht", "wald"])
+
+    assert aliases == {"hunde": "hund", "hunden": "hund", "geht": "gehen"}
+
+
+def test_extract_vocabulary_task_saves_glossed_deck():
+    """Test that only new words are glossed, in one call, and names the LLM flags are dropped"""
+    db = MagicMock()
+    db.collection.return_value.document.return_value.collection.return_value.document.return_value \
+        .get.return_value.to_dict.return_value = {"title": "Im Wald", "content": STORY}
+    glosses = [{"word": "Gewitter", "definition": "thunderstorm", "gender": "n"}, {"word": "Waldrand", "skip": True}]
+
+    with patch('services.firebase_service.get_firestore_client', return_value=db), \
+            patch('services.vocabulary.saved_words', return_value={"hund": "deck-1"}), \
+            patch('services.llm.LLMService.gloss_vocabulary', new=AsyncMock(return_value=glosses)) as gloss, \
+            patch('services.vocabulary.save_deck', return_value={"deck_id": "story_s1", "words_added": 1}) as save_deck:
+        result = extract_vocabulary("user-1", "s1", "story", level="A2")
+
+    assert gloss.await_count == 1
+    sent = [item["word"].lower() for item in gloss.await_args.kwargs["words"]]
+    assert "hund" not in sent and "gewitter" in sent
+    saved = save_deck.call_args.kwargs["words"]
+    gewitter = next(item for item in saved if item["word"] == "Gewitter")
+    assert (gewitter["definition"], gewitter["gender"]) == ("thunderstorm", "n")
+    assert all(item["word"] != "Waldrand" for item in saved)
+    assert save_deck.call_args.kwargs["name"] == "Vocabulary: Im Wald"
+    assert result["status"] == "success"
+
+
+def test_save_deck_keeps_review_progress_of_existing_words():
+    """Test that words already in the deck are merged without srsData and not counted again"""
+    db = MagicMock()
+    vocabulary_ref = db.collection.return_value.document.return_value.collection.return_value
+    vocabulary_ref.document.side_effect = lambda card_id: MagicMock(id=card_id)
+    known = vocabulary.word_id("story_s1", "Gewitter")
+    db.get_all.return_value = [MagicMock(id=known, exists=True)]
+    batch = db.batch.return_value
+
+    with patch('firebase_admin.firestore.Increment', side_effect=lambda n: n):
+        result = vocabulary.save_deck(db, "user-1", "story", "s1", "Vocabulary: Im Wald", [
+            {"word": "Gewitter", "definition": "thunderstorm", "example": "Anna hatte Angst vor dem Gewitter."},
+            {"word": "bellen", "definition": "to bark"},
+        ])
+
+    writes = {call.args[0].id: (call.args[1], call.kwargs["merge"]) for call in batch.set.call_args_list}
+    updated, merge = writes[known]
+    assert merge is True
+    assert "srsData" not in updated and updated["definition"] == "thunderstorm"
+    added, merge = writes[vocabulary.word_id("story_s1", "bellen")]
+    assert merge is False and added["srsData"]["repetitions"] == 0
+    assert batch.update.call_args[0][1] == {"wordCount": 1, "dueCount": 1}
+    assert (result["words_added"], result["words_updated"]) == (1, 1)
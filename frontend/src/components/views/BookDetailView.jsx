@@ -4,6 +4,7 @@ import { Loader2, ChevronLeft, Book, CheckCircle, Lock, Unlock, PlayCircle, Rota
 import { doc, getDoc, collection, onSnapshot, setDoc, serverTimestamp } from 'firebase/firestore';
 import { db } from '../../firebase';
 import { useAuth } from '../../contexts/AuthContext';
+import { subscribeToBookProgress } from '../../services/api/books';
 
 export default function BookDetailView() {
     const { id } = useParams();
@@ -13,6 +14,7 @@ export default function BookDetailView() {
     const [book, setBook] = useState(null);
     const [progress, setProgress] = useState({ completedChapters: [], currentChapter: 1 });
     const [loading, setLoading] = useState(true);
+    const [liveProgress, setLiveProgress] = useState(null);
 
     useEffect(() => {
         if (!currentUser || !id) return;
@@ -54,6 +56,14 @@ export default function BookDetailView() {
         };
     }, [currentUser, id, navigate]);
 
+    // Live processing progress is pushed by the backend, so the banner does
+    // not depend on Firestore writes for every adapted chapter
+    const isProcessing = book?.status === 'adapting' || Boolean(book?.currentProcessingChapter);
+    useEffect(() => {
+        if (!id || !isProcessing) return;
+        return subscribeToBookProgress(id, setLiveProgress);
+    }, [id, isProcessing]);
+
     const handleChapterClick = (chapter) => {
         // Allow clicking if it's the current chapter or already completed (or if we want to allow peeking)
         // For MVP, let's unlock everything for testing, or enforce order.
@@ -80,6 +90,32 @@ export default function BookDetailView() {
 
     if (!book) return <div>Book not found</div>;
 
+    // Backend-processed books keep chapter content in a subcollection and only
+    // a lightweight index (number, title, word count) on the book document
+    const chapters = book.chapterIndex || book.chapters || [];
+    const adaptedChapters = book.adaptedChapters || [];
+    const processingChapter = book.chapterIndex
+        ? (book.status === 'adapting' ? Math.min(adaptedChapters.length + 1, book.totalChapters) : null)
+        : book.currentProcessingChapter;
+
+    // Prefer live progress events; fall back to the Firestore fields
+    let banner = null;
+    if (liveProgress && !['ready', 'failed', 'cancelled'].includes(liveProgress.phase)) {
+        const eta = liveProgress.eta_seconds != null ? ` · about ${Math.ceil(liveProgress.eta_seconds / 60)} min left` : '';
+        banner = {
+            label: liveProgress.phase === 'adapting'
+                ? `Processing Chapter ${Math.min(liveProgress.chapters_adapted + 1, liveProgress.chapters_total)} of ${liveProgress.chapters_total}...`
+                : `${liveProgress.phase.charAt(0).toUpperCase()}${liveProgress.phase.slice(1)}...`,
+            detail: `${Math.round(liveProgress.progress)}% Complete${eta}`,
+        };
+    } else if (processingChapter) {
+        const done = book.chapterIndex ? adaptedChapters.length : processingChapter;
+        banner = {
+            label: `Processing Chapter ${processingChapter} of ${book.totalChapters}...`,
+            detail: `${Math.round((done / book.totalChapters) * 100)}% Complete`,
+        };
+    }
+
     return (
         <div className="max-w-4xl mx-auto p-6">
             <button
@@ -97,7 +133,7 @@ export default function BookDetailView() {
                             <span className="bg-white/20 backdrop-blur-md px-3 py-1 rounded-full text-xs font-bold border border-white/30">
                                 {book.level}
                             </span>
-                            <span className="text-indigo-100 text-sm">{book.chapters?.length || 0} Chapters</span>
+                            <span className="text-indigo-100 text-sm">{chapters.length} Chapters</span>
                         </div>
                         <h1 className="text-3xl md:text-4xl font-bold mb-2">{book.title}</h1>
                         <p className="text-indigo-100 max-w-xl">{book.description}</p>
@@ -105,16 +141,16 @@ export default function BookDetailView() {
                 </div>
 
                 {/* Processing Banner - Show if book is being processed */}
-                {book.currentProcessingChapter && (
+                {banner && (
                     <div className="bg-indigo-600 text-white px-8 py-3 flex items-center justify-between">
                         <div className="flex items-center gap-3">
                             <Loader2 size={20} className="animate-spin" />
                             <span className="font-medium">
-                                Processing Chapter {book.currentProcessingChapter} of {book.totalChapters}...
+                                {banner.label}
                             </span>
                         </div>
                         <span className="text-indigo-200 text-sm">
-                            {Math.round((book.currentProcessingChapter / book.totalChapters) * 100)}% Complete
+                            {banner.detail}
                         </span>
                     </div>
                 )}
@@ -123,18 +159,20 @@ export default function BookDetailView() {
                     <div className="flex justify-between items-center mb-6">
                         <h3 className="text-xl font-bold text-slate-800 dark:text-white">Chapters</h3>
                         <div className="text-sm text-slate-500 dark:text-slate-400">
-                            {progress.completedChapters?.length || 0} / {book.chapters?.length || 0} Completed
+                            {progress.completedChapters?.length || 0} / {chapters.length} Completed
                         </div>
                     </div>
 
                     <div className="space-y-3">
-                        {book.chapters?.map((chapter, index) => {
+                        {chapters.map((chapter, index) => {
                             const isCompleted = progress.completedChapters?.includes(chapter.id || chapter.number);
                             const isCurrent = chapter.number === progress.currentChapter;
                             const isLocked = !isCompleted && !isCurrent && false; // Temporarily disabled lock
 
                             // Check if this chapter is still being adapted (if book is adapted but chapter isn't marked)
-                            const isOptimizing = book.isAdapted && !chapter.isAdapted;
+                            const isOptimizing = book.chapterIndex
+                                ? book.status === 'adapting' && !adaptedChapters.includes(chapter.number)
+                                : book.isAdapted && !chapter.isAdapted;
 
                             return (
                                 <div
@@ -162,7 +200,7 @@ export default function BookDetailView() {
                                             )}
                                         </h4>
                                         <p className="text-xs text-slate-500 dark:text-slate-400">
-                                            {chapter.content.split(' ').length} words
+                                            {chapter.wordCount ?? chapter.content.split(' ').length} words
                                         </p>
                                     </div>
 
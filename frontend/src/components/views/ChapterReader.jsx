@@ -7,6 +7,7 @@ import { useAuth } from '../../contexts/AuthContext';
 import { translateWord } from '../../services/translation';
 import { simplifyStory, fetchModels, explainText } from '../../services/ollama';
 import { useTTS } from '../../hooks/useTTS';
+import { chapterDocId } from '../../services/db/books';
 
 export default function ChapterReader() {
     const { bookId, chapterId } = useParams();
@@ -41,6 +42,7 @@ export default function ChapterReader() {
 
         setLoading(true);
         const bookRef = doc(db, 'users', currentUser.uid, 'books', bookId);
+        let unsubChapter = null;
 
         const unsubscribe = onSnapshot(bookRef, (docSnapshot) => {
             if (docSnapshot.exists()) {
@@ -48,7 +50,21 @@ export default function ChapterReader() {
                 setBook(bookData);
 
                 // Find chapter
-                if (bookData.chapters) {
+                if (bookData.chapterIndex) {
+                    // Chapter content lives in its own document; listen to just that one
+                    if (!unsubChapter) {
+                        const chapterRef = doc(bookRef, 'chapters', chapterDocId(chapterId));
+                        unsubChapter = onSnapshot(chapterRef, (chapterSnapshot) => {
+                            if (chapterSnapshot.exists()) {
+                                setChapter({ id: chapterSnapshot.data().number, ...chapterSnapshot.data() });
+                            } else {
+                                console.error("Chapter not found");
+                            }
+                            setLoading(false);
+                        });
+                    }
+                    return;
+                } else if (bookData.chapters) {
                     const foundChapter = bookData.chapters.find(c =>
                         String(c.id) === String(chapterId) || String(c.number) === String(chapterId)
                     );
@@ -66,7 +82,10 @@ export default function ChapterReader() {
             setLoading(false);
         });
 
-        return () => unsubscribe();
+        return () => {
+            unsubscribe();
+            if (unsubChapter) unsubChapter();
+        };
     }, [currentUser, bookId, chapterId, navigate]);
 
     useEffect(() => {
@@ -206,7 +225,7 @@ export default function ChapterReader() {
             }, { merge: true });
 
             // 2. Find next chapter
-            const nextChapter = book.chapters.find(c => c.number === chapter.number + 1);
+            const nextChapter = (book.chapterIndex || book.chapters).find(c => c.number === chapter.number + 1);
 
             if (nextChapter) {
                 // Move to next chapter
@@ -3,7 +3,7 @@
  * Handles book upload and processing status
  */
 
-import { uploadFile, get } from './client';
+import { uploadFile, get, post, API_BASE_URL } from './client';
 
 /**
  * Upload a book for processing
@@ -37,6 +37,29 @@ export async function getBookProcessingStatus(bookId) {
     }
 }
 
+/**
+ * Subscribe to live book processing progress (Server-Sent Events)
+ * Each event has phase, pages_total, chapters_total, chapters_adapted,
+ * progress (percent) and eta_seconds. The stream closes after a terminal
+ * phase (ready, failed, cancelled).
+ * @param {string} bookId - Book ID
+ * @param {function} onProgress - Called with each progress event
+ * @returns {function} Unsubscribe function
+ */
+export function subscribeToBookProgress(bookId, onProgress) {
+    const source = new EventSource(`${API_BASE_URL}/books/${bookId}/events`);
+
+    source.addEventListener('progress', (event) => {
+        const progress = JSON.parse(event.data);
+        onProgress(progress);
+        if (['ready', 'failed', 'cancelled'].includes(progress.phase)) {
+            source.close();
+        }
+    });
+
+    return () => source.close();
+}
+
 /**
  * Cancel book processing
  */
@@ -53,5 +76,6 @@ export async function cancelBookProcessing(bookId) {
 export default {
     uploadBook,
     getBookProcessingStatus,
+    subscribeToBookProgress,
     cancelBookProcessing,
 };
@@ -6,7 +6,7 @@
 import { auth } from '../../firebase';
 
 // API base URL - configured via Vite proxy in development
-const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || '/api';
+export const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || '/api';
 
 /**
  * Get authentication token from Firebase
@@ -5,7 +5,7 @@ const MAX_RETRIES = 60; // 60 seconds timeout
 
 const pollJob = async (jobId) => {
     for (let i = 0; i < MAX_RETRIES; i++) {
-        const status = await api.get(`/grammar/status/${jobId}`);
+        const status = await api.get(`/grammar/status/${jobId}?consume=true`);
 
         if (status.status === 'SUCCESS') {
             return status.result;
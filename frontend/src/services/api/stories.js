@@ -10,7 +10,7 @@ const MAX_RETRIES = 300; // 300 seconds timeout (5 minutes)
 
 const pollJob = async (jobId) => {
     for (let i = 0; i < MAX_RETRIES; i++) {
-        const status = await api.get(`/stories/status/${jobId}`);
+        const status = await api.get(`/stories/status/${jobId}?consume=true`);
 
         if (status.status === 'SUCCESS') {
             return status.result;
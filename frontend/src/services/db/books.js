@@ -11,7 +11,8 @@ import {
     where,
     orderBy,
     limit,
-    serverTimestamp
+    serverTimestamp,
+    writeBatch
 } from 'firebase/firestore';
 
 /**
@@ -109,6 +110,35 @@ export const updatePrivateBook = async (userId, bookId, updates) => {
     }
 };
 
+/**
+ * Document ID of a chapter in the chapters subcollection
+ * Zero-padded so IDs sort in reading order
+ * @param {number} chapterNumber - 1-based chapter number
+ * @returns {string} Chapter document ID
+ */
+export const chapterDocId = (chapterNumber) => String(chapterNumber).padStart(5, '0');
+
+/**
+ * Get all chapters of a book
+ * Books processed by the backend store chapters in a subcollection and only
+ * keep a lightweight `chapterIndex` on the book; older books keep them inline.
+ * @param {string} userId - User ID
+ * @param {object} book - Book object
+ * @returns {Promise<Array>} Chapters in reading order
+ */
+export const getBookChapters = async (userId, book) => {
+    try {
+        if (!book.chapterIndex) return book.chapters || [];
+
+        const chaptersRef = collection(db, 'users', userId, 'books', book.id, 'chapters');
+        const snapshot = await getDocs(query(chaptersRef, orderBy('number')));
+        return snapshot.docs.map(doc => ({ id: doc.id, ...doc.data() }));
+    } catch (error) {
+        console.error('Error fetching book chapters:', error);
+        throw error;
+    }
+};
+
 /**
  * Update a specific chapter in a book
  * @param {string} userId - User ID
@@ -122,6 +152,13 @@ export const updateBookChapter = async (userId, bookId, chapterIndex, chapterDat
         const book = await getPrivateBook(userId, bookId);
         if (!book) throw new Error('Book not found');
 
+        if (book.chapterIndex) {
+            // Chapter documents: only the one chapter is written
+            const chapterRef = doc(db, 'users', userId, 'books', bookId, 'chapters', chapterDocId(chapterIndex + 1));
+            await updateDoc(chapterRef, chapterData);
+            return;
+        }
+
         const chapters = [...book.chapters];
         chapters[chapterIndex] = {
             ...chapters[chapterIndex],
@@ -146,6 +183,18 @@ export const getBookProcessingStatus = async (userId, bookId) => {
         const book = await getPrivateBook(userId, bookId);
         if (!book) return null;
 
+        if (book.chapterIndex) {
+            const adapted = book.adaptedChapters?.length || 0;
+            return {
+                isProcessing: book.status === 'adapting',
+                currentChapter: book.status === 'adapting' ? Math.min(adapted + 1, book.totalChapters) : null,
+                totalChapters: book.totalChapters,
+                progress: book.status === 'adapting' && book.totalChapters
+                    ? (adapted / book.totalChapters) * 100
+                    : 100
+            };
+        }
+
         return {
             isProcessing: book.currentProcessingChapter !== null,
             currentChapter: book.currentProcessingChapter,
@@ -169,6 +218,15 @@ export const getBookProcessingStatus = async (userId, bookId) => {
 export const deletePrivateBook = async (userId, bookId) => {
     try {
         const bookRef = doc(db, 'users', userId, 'books', bookId);
+
+        // Deleting a document does not delete its subcollections
+        const chapters = await getDocs(collection(bookRef, 'chapters'));
+        for (let i = 0; i < chapters.docs.length; i += 500) {
+            const batch = writeBatch(db);
+            chapters.docs.slice(i, i + 500).forEach(chapter => batch.delete(chapter.ref));
+            await batch.commit();
+        }
+
         await deleteDoc(bookRef);
     } catch (error) {
         console.error('Error deleting private book:', error);